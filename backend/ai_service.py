@@ -1,89 +1,100 @@
-from PIL import Image
-import numpy as np
-from sklearn.cluster import KMeans
-from collections import Counter
-import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from cache import LRUCache, DiskCache, TieredCache
+from metrics import IMAGE_STAGE_SECONDS
+import asyncio
+import hashlib
+import os
+import threading
 
-def rgb_to_hex(rgb):
-    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+# The imaging stack (PIL, NumPy, scikit-learn) lives in image_analysis and is
+# imported lazily, normally only inside the pool's worker processes.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+# Bump when the analysis output changes, so on-disk results from older code are not served
+ANALYSIS_CACHE_VERSION = 1
 
-def analyze_image_colors(image_bytes: bytes, num_colors=5):
+# Results keyed by artwork content; set ARTWORK_CACHE_DIR to keep them across restarts
+ARTWORK_CACHE_DIR = os.getenv("ARTWORK_CACHE_DIR")
+artwork_cache = TieredCache(
+    LRUCache(
+        maxsize=int(os.getenv("ARTWORK_CACHE_SIZE", 512)),
+        ttl_seconds=float(os.getenv("ARTWORK_CACHE_TTL_SECONDS", 0)) or None,
+    ),
+    DiskCache(ARTWORK_CACHE_DIR, max_bytes=int(os.getenv("ARTWORK_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+    if ARTWORK_CACHE_DIR else None,
+)
+
+def analyze_image_colors(image_bytes: bytes, num_colors=5, timings: Optional[dict] = None):
     """
     Analyzes an image to find dominant colors.
     Returns a list of hex codes and their estimated percentage.
+    Loads the imaging stack on first call.
+    """
+    from image_analysis import analyze_image_colors as analyze
+    return analyze(image_bytes, num_colors, timings)
+
+def _analyze_in_worker(image_bytes: bytes, num_colors: int):
+    # Metrics live in the parent process: send the stage timings back with the result
+    timings = {}
+    return analyze_image_colors(image_bytes, num_colors, timings), timings
+
+def _observe_stages(timings: dict):
+    for stage, seconds in timings.items():
+        IMAGE_STAGE_SECONDS.observe(seconds, stage)
+
+def analyze_image_colors_inline(image_bytes: bytes, num_colors=5):
+    """
+    Analyze in the calling thread, skipping the pool and the cache, with
+    stage metrics recorded. For profiled requests, so the profile sees the work.
+    """
+    result, timings = _analyze_in_worker(image_bytes, num_colors)
+    _observe_stages(timings)
+    return result
+
+def load_analysis_engine():
+    # Pool worker initializer: import the imaging stack while the worker starts
+    import image_analysis  # noqa: F401
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _analysis_pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, initializer=load_analysis_engine)
+    return _executor
+
+def artwork_cache_key(image_bytes: bytes, num_colors=5) -> str:
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest}-{num_colors}-v{ANALYSIS_CACHE_VERSION}"
+
+def _cached_analysis(image_bytes: bytes, num_colors: int):
+    key = artwork_cache_key(image_bytes, num_colors)
+    return key, artwork_cache.get(key)
+
+async def analyze_image_colors_async(image_bytes: bytes, num_colors=5):
+    """
+    Run analyze_image_colors in the worker process pool, keeping the event
+    loop free. Results are cached by content, so re-uploading the same
+    artwork returns without decoding it again.
     """
-    try:
-        # Open image
-        image = Image.open(io.BytesIO(image_bytes))
-        image = image.convert('RGB')
-        
-        # Resize for faster processing (max 150x150)
-        image.thumbnail((150, 150))
-        
-        # Convert to numpy array
-        image_array = np.array(image)
-        
-        # Check for transparency (Alpha channel) heuristics before converting
-        has_transparency = False
-        try:
-            original = Image.open(io.BytesIO(image_bytes))
-            if original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info):
-                # Simple check if there are any transparent pixels
-                alpha = np.array(original.convert('RGBA'))[:, :, 3]
-                if np.min(alpha) < 255:
-                    has_transparency = True
-        except Exception:
-            pass
+    # Hashing large proofs and disk lookups happen off the event loop too
+    key, result = await asyncio.to_thread(_cached_analysis, image_bytes, num_colors)
+    if result is not None:
+        return result
 
-        # Reshape to list of pixels
-        pixels = image_array.reshape(-1, 3)
-        
-        # Use KMeans to find clusters
-        clf = KMeans(n_clusters=num_colors, random_state=42, n_init=10)
-        labels = clf.fit_predict(pixels)
-        
-        # Count labels to find most common
-        counts = Counter(labels)
-        total_pixels = len(pixels)
-        
-        # Get centers (colors)
-        centers = clf.cluster_centers_
-        
-        # Detect heuristics for Matte/Glossy based on contrast/variance (very basic heuristic)
-        variance = np.var(pixels)
-        surface_finish = "Glossy/High Contrast" if variance > 3000 else "Matte/Low Contrast"
-        
-        ordered_colors = []
-        for i, count in counts.most_common(num_colors):
-            color = centers[i]
-            hex_code = rgb_to_hex(color)
-            percentage = (count / total_pixels) * 100
-            ordered_colors.append({
-                "hex": hex_code,
-                "percentage": round(percentage, 1),
-                "rgb": [int(c) for c in color]
-            })
-            
-        suggested_outer_material = "PET" if surface_finish == "Glossy/High Contrast" else "BOPP"
-        if has_transparency:
-            suggested_inner_material = "LDPE/CPP (Clear)"
-        else:
-            suggested_inner_material = "MET_PET / AL_FOIL"
+    loop = asyncio.get_running_loop()
+    result, timings = await loop.run_in_executor(_analysis_pool(), _analyze_in_worker, image_bytes, num_colors)
+    _observe_stages(timings)
+    if "error" not in result:
+        await asyncio.to_thread(artwork_cache.set, key, result)
+    return result
 
-        return {
-            "colors": ordered_colors,
-            "total_colors_detected": len(ordered_colors),
-            "primary_color": ordered_colors[0]['hex'] if ordered_colors else None,
-            "has_transparency": has_transparency,
-            "surface_finish_heuristic": surface_finish,
-            "suggested_materials": {
-                "outer": suggested_outer_material,
-                "inner_barrier": suggested_inner_material
-            }
-        }
-        
-    except Exception as e:
-        import traceback
-        print(f"Error analyzing image: {e}")
-        traceback.print_exc()
-        return {"error": str(e)}
+def shutdown_analysis_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
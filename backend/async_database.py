@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING
+from models import PricingContext
+from pricing_history import PricingHistory
+from metrics import instrument_methods
+from database import (
+    db, Database, MongoDatabase, mongo_connection_settings, DELETED_QUOTATION_PROJECTION, QUOTATION_PROJECTION,
+    STATS_ID, RECENT_QUOTATIONS, _bulk_operations, _counter_updates, _id_block, _id_block_request, _keyset_query,
+    _new_quotations, _page_fields, _page_result, _pricing_context_from_docs, _projection, _rollup_id, _search_filter,
+    _stats_summary, _timeseries_periods, _timeseries_result, _with_client_terms,
+)
+
+class AsyncDatabase:
+    """
+    Non-blocking counterpart of Database for the async FastAPI handlers,
+    built on PyMongo's native asyncio client. Index creation, seeding and the
+    rare writes (pricing updates, one-time backfills) stay with the sync
+    MongoDatabase, whose update documents the hot paths share. In-process
+    state (pricing context, client-name index, one-time init flags) is shared
+    with it, so sync and async callers always see the same snapshot.
+    """
+    def __init__(self, shared: MongoDatabase):
+        self.shared = shared
+        self._client: Optional[AsyncMongoClient] = None
+
+    @property
+    def db(self):
+        # Created on first use so it binds to the running event loop
+        if self._client is None:
+            mongo_uri, options = mongo_connection_settings()
+            self._client = AsyncMongoClient(mongo_uri, **options)
+        return self._client.nexus_packaging
+
+    async def connect(self):
+        # Seed defaults and create indexes through the sync client, off the event loop
+        await asyncio.to_thread(self.shared.connect)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def get_pricing_context(self) -> PricingContext:
+        # Same revalidation as Database.get_pricing_context: the version alone
+        # once the snapshot is due, the rates and config only if it moved
+        context = self.shared.loaded_pricing_context
+        if context is None:
+            version_doc = await self.db.counters.find_one({"_id": "pricing_context"})
+            context = self.shared.pricing_context_snapshot()
+            if context is None or (version_doc.get("seq", 0) if version_doc else 0) != context.version:
+                context = await self._load_pricing_context(version_doc)
+            self.shared.install_pricing_context(context)
+        return context
+
+    async def _load_pricing_context(self, version_doc: Optional[dict]) -> PricingContext:
+        # version_doc is read first, before the documents it versions
+        return _pricing_context_from_docs(
+            rates_doc=await self.db.rates.find_one({"_id": "current"}),
+            config_doc=await self.db.config.find_one({"_id": "current"}),
+            version_doc=version_doc,
+        )
+
+    async def get_rates(self) -> Dict[str, float]:
+        return dict((await self.get_pricing_context()).rates)
+
+    async def pricing_history(self) -> PricingHistory:
+        # The shared as-of index, caught up with entries appended since it last was
+        last_version = self.shared.pricing_history_snapshot().last_version
+        cursor = self.db.pricing_history.find({"_id": {"$gt": last_version}}, {"_id": 0}).sort("_id", ASCENDING)
+        return self.shared.extend_pricing_history(await cursor.to_list(None))
+
+    async def get_pricing_history(self) -> List[dict]:
+        return (await self.pricing_history()).entries()
+
+    async def get_pricing_context_as_of(self, timestamp: str) -> PricingContext:
+        return (await self.pricing_history()).as_of(timestamp)
+
+    async def get_config(self) -> Dict[str, float]:
+        return dict((await self.get_pricing_context()).config)
+
+    # Rare writes go through the sync implementation, under its lock
+
+    async def update_rates(self, rates: Dict[str, float]):
+        return await asyncio.to_thread(self.shared.update_rates, rates)
+
+    async def update_config(self, config: Dict[str, float]):
+        return await asyncio.to_thread(self.shared.update_config, config)
+
+    async def _ensure_initialized(self):
+        if not self.shared.initialized:
+            # One-time setup (id counter, stats and rollups of an older database): the sync path, off the event loop
+            await asyncio.to_thread(self.shared.ensure_initialized)
+
+    async def _allocate_ids(self, count: int = 1) -> range:
+        # Callers have run _ensure_initialized
+        return _id_block(await self.db.counters.find_one_and_update(**_id_block_request(count)), count)
+
+    async def save_quotation(self, requirements: dict, breakdown: dict, client_name: str = "Unknown"):
+        return (await self.save_quotations([(requirements, breakdown, client_name)]))[0]
+
+    async def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        if not quotations:
+            return []
+        
+        await self._ensure_initialized()
+        new_quotes = _new_quotations(await self._allocate_ids(len(quotations)), quotations)
+        
+        await self.db.quotations.insert_many(_with_client_terms(new_quotes))
+        await self._update_counters(*_counter_updates(new_quotes))
+        self.shared.track_saved_client_names(new_quotes)
+        return new_quotes
+
+    async def get_quotations(self, fields: Optional[List[str]] = None) -> List[dict]:
+        return await self.iter_quotations(fields=fields).to_list(None)
+
+    def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                        limit: Optional[int] = None, descending: bool = False, batch_size: int = 500):
+        """Async cursor with the same ordering and keyset semantics as Database.iter_quotations."""
+        cursor = self.db.quotations.find(_keyset_query(after, descending), _projection(fields))
+        cursor = cursor.sort("id", DESCENDING if descending else ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor.batch_size(batch_size)
+
+    async def get_quotations_page(self, limit: int, after: Optional[int] = None,
+                                  fields: Optional[List[str]] = None, descending: bool = False) -> dict:
+        cursor = self.iter_quotations(fields=_page_fields(fields), after=after, limit=limit + 1, descending=descending)
+        return _page_result(await cursor.to_list(None), limit)
+
+    async def delete_quotation(self, quotation_id: int) -> bool:
+        await self._ensure_initialized()
+        deleted = await self.db.quotations.find_one_and_delete({"id": quotation_id}, projection=DELETED_QUOTATION_PROJECTION)
+        if deleted is None:
+            return False
+        await self._update_counters(*_counter_updates([deleted], sign=-1))
+        self.shared.track_deleted_client_name(deleted)
+        return True
+
+    async def _update_counters(self, stats_update: dict, rollup_updates: list):
+        await self.db.stats.update_one({"_id": STATS_ID}, stats_update, upsert=True)
+        await self.db.rollups.bulk_write(_bulk_operations(rollup_updates), ordered=False)
+
+    async def search_quotations(self, query: str = "", material: Optional[str] = None,
+                                date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[dict]:
+        filter_doc = _search_filter(query, material, date_from, date_to, min_price, max_price)
+        return await self.db.quotations.find(filter_doc, QUOTATION_PROJECTION).sort("id", ASCENDING).to_list(None)
+
+    async def suggest_client_names(self, prefix: str, limit: int = 10) -> List[str]:
+        client_names = self.shared.client_name_index()
+        if client_names.is_stale():
+            cursor = await self.db.quotations.aggregate([{"$group": {"_id": "$client_name", "count": {"$sum": 1}}}])
+            counts = await cursor.to_list(None)
+            client_names.load({doc["_id"]: doc["count"] for doc in counts if isinstance(doc["_id"], str)})
+        return client_names.prefix(prefix, limit)
+
+    async def get_stats(self) -> dict:
+        await self._ensure_initialized()
+        doc = await self.db.stats.find_one({"_id": STATS_ID}) or {}
+        recent = []
+        if doc.get("total_quotations", 0) > 0:
+            # Recent quotations (last 5) via the date index
+            cursor = self.db.quotations.find({}, QUOTATION_PROJECTION).sort("date", DESCENDING).limit(RECENT_QUOTATIONS)
+            recent = await cursor.to_list(None)
+        return _stats_summary(doc, recent)
+
+    async def get_timeseries(self, granularity: str = "month", date_from: Optional[date] = None,
+                             date_to: Optional[date] = None) -> dict:
+        periods = _timeseries_periods(granularity, date_from, date_to)
+        await self._ensure_initialized()
+        cursor = self.db.rollups.find({"_id": {
+            "$gte": _rollup_id(granularity, periods[0]), "$lte": _rollup_id(granularity, periods[-1]),
+        }})
+        return _timeseries_result(granularity, periods, await cursor.to_list(None))
+
+# The sync backend behind ThreadedAsyncDatabase is timed already
+instrument_methods(AsyncDatabase, backend=AsyncDatabase.__name__, exclude=Database.UNTIMED_METHODS)
+
+class ThreadedAsyncDatabase:
+    """
+    Async facade for backends without a native asyncio driver (SQLite,
+    in-memory): each call runs the sync method in a worker thread.
+    """
+    def __init__(self, shared: Database):
+        self.shared = shared
+
+    async def connect(self):
+        await asyncio.to_thread(self.shared.connect)
+
+    async def close(self):
+        await asyncio.to_thread(self.shared.close)
+
+    async def get_pricing_context(self) -> PricingContext:
+        return self.shared.loaded_pricing_context or await asyncio.to_thread(self.shared.get_pricing_context)
+
+    async def get_rates(self) -> Dict[str, float]:
+        return await asyncio.to_thread(self.shared.get_rates)
+
+    async def get_pricing_history(self) -> List[dict]:
+        return await asyncio.to_thread(self.shared.get_pricing_history)
+
+    async def get_pricing_context_as_of(self, timestamp: str) -> PricingContext:
+        return await asyncio.to_thread(self.shared.get_pricing_context_as_of, timestamp)
+
+    async def update_rates(self, rates: Dict[str, float]):
+        return await asyncio.to_thread(self.shared.update_rates, rates)
+
+    async def get_config(self) -> Dict[str, float]:
+        return await asyncio.to_thread(self.shared.get_config)
+
+    async def update_config(self, config: Dict[str, float]):
+        return await asyncio.to_thread(self.shared.update_config, config)
+
+    async def save_quotation(self, requirements: dict, breakdown: dict, client_name: str = "Unknown"):
+        return await asyncio.to_thread(self.shared.save_quotation, requirements, breakdown, client_name)
+
+    async def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        return await asyncio.to_thread(self.shared.save_quotations, quotations)
+
+    async def get_quotations(self, fields: Optional[List[str]] = None) -> List[dict]:
+        return await asyncio.to_thread(self.shared.get_quotations, fields)
+
+    async def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                              limit: Optional[int] = None, descending: bool = False,
+                              batch_size: int = 500) -> AsyncIterator[dict]:
+        documents = self.shared.iter_quotations(fields=fields, after=after, limit=limit,
+                                                descending=descending, batch_size=batch_size)
+        while True:
+            # One thread hop per batch rather than per document
+            batch = await asyncio.to_thread(list, itertools.islice(documents, batch_size))
+            if not batch:
+                return
+            for document in batch:
+                yield document
+
+    async def get_quotations_page(self, limit: int, after: Optional[int] = None,
+                                  fields: Optional[List[str]] = None, descending: bool = False) -> dict:
+        return await asyncio.to_thread(self.shared.get_quotations_page, limit, after, fields, descending)
+
+    async def delete_quotation(self, quotation_id: int) -> bool:
+        return await asyncio.to_thread(self.shared.delete_quotation, quotation_id)
+
+    async def search_quotations(self, query: str = "", material: Optional[str] = None,
+                                date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[dict]:
+        return await asyncio.to_thread(
+            self.shared.search_quotations, query, material, date_from, date_to, min_price, max_price
+        )
+
+    async def suggest_client_names(self, prefix: str, limit: int = 10) -> List[str]:
+        return await asyncio.to_thread(self.shared.suggest_client_names, prefix, limit)
+
+    async def get_stats(self) -> dict:
+        return await asyncio.to_thread(self.shared.get_stats)
+
+    async def get_timeseries(self, granularity: str = "month", date_from: Optional[date] = None,
+                             date_to: Optional[date] = None) -> dict:
+        return await asyncio.to_thread(self.shared.get_timeseries, granularity, date_from, date_to)
+
+def create_async_database(shared: Database):
+    """Native asyncio access for Mongo; a thread-backed facade for the other backends."""
+    if isinstance(shared, MongoDatabase):
+        return AsyncDatabase(shared)
+    return ThreadedAsyncDatabase(shared)
+
+adb = create_async_database(db)
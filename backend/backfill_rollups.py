@@ -0,0 +1,31 @@
+"""
+Rebuild the dashboard time-series rollups from the stored quotations.
+Backends build them by themselves the first time an older database is used,
+so this is for a planned backfill ahead of a deploy, or after quotations
+were fixed by hand. From the backend directory:
+
+    python -m backfill_rollups                    # STORAGE_BACKEND (default mongo)
+    python -m backfill_rollups --backend sqlite   # SQLITE_PATH (default nexus_packaging.db)
+"""
+import argparse
+import sys
+import time
+
+from database import STORAGE_BACKENDS, create_database
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, help="Storage backend (default STORAGE_BACKEND)")
+    args = parser.parse_args(argv)
+
+    database = create_database(args.backend)
+    started = time.perf_counter()
+    try:
+        buckets = database.rebuild_rollups()
+    finally:
+        database.close()
+    print(f"Rebuilt {buckets} rollup buckets in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Deterministic synthetic workloads for the benchmark suite."""
+import io
+import random
+from typing import List
+
+MATERIALS = ["PET", "BOPP", "MET_PET", "MET_BOPP", "LDPE", "CPP", "AL_FOIL", "NYLON", "PAPER"]
+POUCH_TYPES = ["CENTER_SEAL", "THREE_SIDE_SEAL", "STAND_UP_POUCH", "STAND_UP_ZIPPER", "SIDE_GUSSET"]
+THICKNESSES = [7, 9, 12, 20, 25, 30, 40, 50, 60, 80, 100]
+
+def requirement_specs(count: int, seed: int = 42) -> List[dict]:
+    """Realistic ProductRequirements payloads: 2-4 layer laminates, mixed quantities and overrides."""
+    rng = random.Random(seed)
+    specs = []
+    for _ in range(count):
+        spec = {
+            "pouch_type": rng.choice(POUCH_TYPES),
+            "width_mm": rng.randint(60, 400),
+            "height_mm": rng.randint(80, 500),
+            "gusset_mm": rng.choice([0, 0, 30, 40, 60]),
+            "film_structure": {
+                "layers": [
+                    {"material": rng.choice(MATERIALS), "thickness_micron": rng.choice(THICKNESSES)}
+                    for _ in range(rng.randint(2, 4))
+                ]
+            },
+            "number_of_colors": rng.randint(0, 9),
+            "cylinder_cost_per_unit": rng.choice([3000, 3500, 4500]),
+            "margin_percent": rng.choice([10, 15, 20, 25, 30]),
+        }
+        if rng.random() < 0.5:
+            spec["quantity_pieces"] = rng.randint(10, 500) * 1000
+        else:
+            spec["quantity_kg"] = rng.randint(100, 5000)
+        if rng.random() < 0.2:
+            spec["wastage_percent"] = rng.choice([3, 5, 8])
+        specs.append(spec)
+    return specs
+
+def client_names(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    prefixes = ["Acme", "Bharat", "Sunrise", "Global", "Green", "Royal", "Metro", "Prime", "Star", "Classic"]
+    suffixes = ["Foods", "Snacks", "Spices", "Dairy", "Pharma", "Agro", "Beverages", "Home Care", "Pet Care", "Bakery"]
+    return [f"{rng.choice(prefixes)} {rng.choice(suffixes)} {i}" for i in range(count)]
+
+def artwork_jpeg(megapixels: float, seed: int = 3) -> bytes:
+    """Flat-colour blocks with print-like noise, encoded as a JPEG of about `megapixels` MP."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    palette = rng.integers(0, 256, (6, 3))
+    blocks = rng.integers(0, len(palette), (height // 64 + 1, width // 64 + 1))
+    image = palette[blocks.repeat(64, axis=0).repeat(64, axis=1)[:height, :width]]
+    image = (image + rng.integers(-12, 13, image.shape)).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
@@ -0,0 +1,29 @@
+"""
+mongomock as the MongoDB server for the benchmarks and tests, so the Mongo
+backend runs without one. mongomock's bulk builder predates the sort option
+current PyMongo passes with each update and replace, and rejects the whole
+bulk_write with a TypeError; it is patched here to drop that option (never
+set by this app) rather than worked around in MongoDatabase.
+"""
+import functools
+
+import mongomock
+from mongomock.collection import BulkOperationBuilder
+
+def _ignore_sort(add):
+    @functools.wraps(add)
+    def wrapper(self, *args, sort=None, **kwargs):
+        if sort is not None:
+            raise NotImplementedError("mongomock can't sort bulk updates")
+        return add(self, *args, **kwargs)
+    wrapper.ignores_sort = True
+    return wrapper
+
+def _patch_bulk_builder():
+    for name in ("add_update", "add_replace"):
+        add = getattr(BulkOperationBuilder, name)
+        if not getattr(add, "ignores_sort", False):
+            setattr(BulkOperationBuilder, name, _ignore_sort(add))
+
+_patch_bulk_builder()
+MongoClient = mongomock.MongoClient
@@ -0,0 +1,195 @@
+"""
+Benchmark suite for the pricing, analytics and image hot paths.
+
+Runs offline against the in-memory storage backend by default (--backend
+sqlite or mongomock to measure those instead), so no server is needed.
+From the backend directory:
+
+    python -m benchmarks.run                              # report, compare with baseline.json if present
+    python -m benchmarks.run --save-baseline              # record the current numbers as the baseline
+    python -m benchmarks.run --sizes 1000,10000,100000 --suites database
+
+Exits with status 1 when any benchmark's p50 is slower than the baseline by
+more than --tolerance.
+"""
+import argparse
+import itertools
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.data import artwork_jpeg, client_names, requirement_specs
+from benchmarks.timing import find_regressions, load_baseline, measure, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SUITES = ("pricing", "database", "image")
+BACKENDS = ("memory", "sqlite", "mongomock")
+SEED_CHUNK = 10_000
+
+def _select_backend(backend: str):
+    # Must run before anything imports database: the global db is built at import
+    if backend == "mongomock":
+        import pymongo
+        from benchmarks.mongomock_client import MongoClient
+        pymongo.MongoClient = MongoClient
+        os.environ["STORAGE_BACKEND"] = "mongo"
+    else:
+        os.environ["STORAGE_BACKEND"] = "memory"  # The pricing suite only needs rates
+
+def _empty_store(backend: str, workdir: str, size: int):
+    from database import MongoDatabase
+    from memory_database import MemoryDatabase
+    from sqlite_database import SQLiteDatabase
+
+    if backend == "sqlite":
+        return SQLiteDatabase(os.path.join(workdir, f"bench_{size}.db"))
+    if backend == "mongomock":
+        return MongoDatabase()  # Every mongomock client starts empty
+    return MemoryDatabase()
+
+def bench_pricing(args) -> dict:
+    from calculations import CostCalculator
+    from database import db
+    from models import ProductRequirements
+
+    requirements = [ProductRequirements(**spec) for spec in requirement_specs(args.batch_size)]
+    context = db.get_pricing_context()
+    specs = itertools.cycle(requirements)
+    ladder_quantities = list(range(10_000, 1_010_000, 10_000))
+
+    return {
+        # An explicit context bypasses the result cache: this is the full calculation
+        "cost.single": measure(lambda: CostCalculator.calculate_cost(next(specs), context=context), repeat=2000),
+        "cost.single.cached": measure(lambda: CostCalculator.calculate_cost(requirements[0]), repeat=2000),
+        f"cost.batch.{args.batch_size}": measure(
+            lambda: CostCalculator.calculate_cost_batch(requirements, context=context), repeat=50, items=args.batch_size
+        ),
+        f"cost.ladder.{len(ladder_quantities)}": measure(
+            lambda: CostCalculator.calculate_price_ladder(requirements[0], ladder_quantities, context=context),
+            repeat=200, items=len(ladder_quantities),
+        ),
+    }
+
+def _seed_quotations(store, size: int):
+    from calculations import CostCalculator
+    from models import ProductRequirements
+
+    requirements = [ProductRequirements(**spec) for spec in requirement_specs(1000, seed=size)]
+    breakdowns = CostCalculator.calculate_cost_batch(requirements)
+    templates = [(req.model_dump(), bd.model_dump()) for req, bd in zip(requirements, breakdowns)]
+    names = client_names(max(size // 20, 10))
+
+    for start in range(0, size, SEED_CHUNK):
+        chunk = range(start, min(start + SEED_CHUNK, size))
+        store.save_quotations([(*templates[i % len(templates)], names[i % len(names)]) for i in chunk])
+
+def bench_database(args) -> dict:
+    import simulation
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="nexus_bench_") as workdir:
+        for size in args.sizes:
+            store = _empty_store(args.backend, workdir, size)
+            started = time.perf_counter()
+            _seed_quotations(store, size)
+            print(f"  seeded {size:,} quotations ({args.backend}) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+            results[f"stats.get.{size}"] = measure(store.get_stats, repeat=200)
+            results[f"stats.rebuild.{size}"] = measure(store.rebuild_stats, repeat=10, warmup=1)
+            results[f"search.client.{size}"] = measure(lambda: store.search_quotations("acme snacks"), repeat=50)
+            results[f"search.material_price.{size}"] = measure(
+                lambda: store.search_quotations(material="AL_FOIL", min_price=1000, max_price=5000), repeat=50
+            )
+            results[f"quotations.page.{size}"] = measure(
+                lambda: store.get_quotations_page(100, after=size // 2, fields=["id", "client_name", "breakdown"]),
+                repeat=200,
+            )
+            results[f"clients.suggest.{size}"] = measure(lambda: store.suggest_client_names("gl"), repeat=200)
+
+            simulation.db = store
+            # A fresh simulator each run loads the portfolio columns from the store; warm runs reuse them
+            results[f"simulation.cold.{size}"] = measure(
+                lambda: simulation.PortfolioSimulator().simulate({"AL_FOIL": 12}, limit=10), repeat=5, warmup=1
+            )
+            warm = simulation.PortfolioSimulator()
+            results[f"simulation.warm.{size}"] = measure(lambda: warm.simulate({"AL_FOIL": 12}, limit=10), repeat=20)
+            store.close()
+    return results
+
+def bench_image(args) -> dict:
+    from ai_service import analyze_image_colors
+
+    results = {}
+    for megapixels in args.image_sizes:
+        artwork = artwork_jpeg(megapixels)
+        results[f"image.analyze.{megapixels:g}mp"] = measure(lambda: analyze_image_colors(artwork), repeat=30)
+    return results
+
+def _parse_numbers(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+def _print_results(results: dict, baseline: dict):
+    print(f"{'benchmark':<36}{'runs':>6}{'p50 ms':>12}{'p99 ms':>12}{'per sec':>14}{'vs base':>10}")
+    for name, r in results.items():
+        base = baseline.get(name) if baseline else None
+        change = f"{(r['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f}%" if base and base["p50_ms"] else ""
+        print(f"{name:<36}{r['runs']:>6}{r['p50_ms']:>12.3f}{r['p99_ms']:>12.3f}{r['throughput_per_s']:>14,.1f}{change:>10}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--backend", default="memory", choices=BACKENDS, help="Storage backend for the database suite")
+    parser.add_argument("--sizes", default="1000,10000", help="Stored quotation counts for the database suite")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Requirements per batch cost call")
+    parser.add_argument("--image-sizes", default="1,12,24", help="Artwork resolutions in megapixels")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown as a fraction")
+    args = parser.parse_args(argv)
+
+    suites = _parse_numbers(args.suites, str)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    args.sizes = _parse_numbers(args.sizes, int)
+    args.image_sizes = _parse_numbers(args.image_sizes, float)
+
+    _select_backend(args.backend)
+    runners = {"pricing": bench_pricing, "database": bench_database, "image": bench_image}
+    results = {}
+    for suite in suites:
+        print(f"running {suite}...", file=sys.stderr)
+        results.update(runners[suite](args))
+
+    baseline = load_baseline(args.baseline)
+    _print_results(results, baseline)
+
+    if args.save_baseline:
+        meta = {
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        }
+        save_baseline(args.baseline, results, meta)
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (p50 more than {args.tolerance:.0%} slower than baseline):")
+        for name, base_ms, now_ms in regressions:
+            print(f"  {name}: {base_ms:.3f} ms -> {now_ms:.3f} ms")
+        return 1
+    print(f"\nno regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
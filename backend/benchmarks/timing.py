@@ -0,0 +1,66 @@
+"""Timing and baseline comparison helpers for the benchmark suite."""
+import json
+import math
+import time
+from typing import Callable, Dict, Optional
+
+def _percentile(sorted_samples: list, percent: float) -> float:
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(percent / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+def measure(fn: Callable[[], object], repeat: int = 50, warmup: int = 3,
+            max_seconds: float = 5.0, items: int = 1) -> dict:
+    """
+    Call `fn` up to `repeat` times (at least 5, stopping early once
+    `max_seconds` is spent) and summarise the latencies. `items` is how many
+    units one call processes, for throughput of batch operations.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < repeat and (len(samples) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+
+    samples.sort()
+    mean_ms = sum(samples) / len(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(_percentile(samples, 50), 4),
+        "p99_ms": round(_percentile(samples, 99), 4),
+        "mean_ms": round(mean_ms, 4),
+        "throughput_per_s": round(items * 1000 / mean_ms, 1) if mean_ms else None,
+    }
+
+def load_baseline(path: str) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path) as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return None
+
+def save_baseline(path: str, results: Dict[str, dict], meta: dict):
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def find_regressions(results: Dict[str, dict], baseline: Dict[str, dict],
+                     tolerance: float, noise_floor_ms: float = 0.05) -> list:
+    """
+    Benchmarks whose p50 is more than `tolerance` (a fraction) slower than the
+    baseline. Differences under `noise_floor_ms` are ignored: sub-0.1 ms
+    timings jitter more than any threshold worth setting.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        limit = base["p50_ms"] * (1 + tolerance)
+        if result["p50_ms"] > limit and result["p50_ms"] - base["p50_ms"] > noise_floor_ms:
+            regressions.append((name, base["p50_ms"], result["p50_ms"]))
+    return regressions
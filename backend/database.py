@@ -1,183 +1,1182 @@
+import logging
 import os
-from typing import Dict, List, Any
-from pymongo import MongoClient
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, UpdateOne, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import certifi
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from enum import Enum
 from dotenv import load_dotenv
+from models import PricingContext, PouchType
+from search_index import ClientNameIndex
+from pricing_history import PricingHistory, PRICING_HISTORY_START, pricing_history_entry
+from metrics import MONGO_COMMAND_FAILURES, MONGO_COMMAND_SECONDS, capture_sink, instrument_methods
 
 load_dotenv()
 
-class Database:
+logger = logging.getLogger(__name__)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Feeds mongo_command_* metrics from PyMongo's own per-command timings.
+    Inside a profiled request each command is also traced with its collection.
+    """
     def __init__(self):
-        # Default to local MongoDB if MONGODB_URI is not set in environment
-        mongo_uri = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/")
-        
-        # Use certifi for secure TLS connection to MongoDB Atlas
-        tls_ca_file = certifi.where() if "mongodb+srv" in mongo_uri else None
-        
-        self.client = MongoClient(mongo_uri, tlsCAFile=tls_ca_file)
-        self.db = self.client.nexus_packaging
-        
-        # Initialize default rates if empty
-        if self.db.rates.count_documents({}) == 0:
-            default_rates = {
-                "PET": 110,
-                "BOPP": 130,
-                "MET_PET": 120,
-                "MET_BOPP": 140,
-                "LDPE": 105,
-                "CPP": 115,
-                "AL_FOIL": 400,
-                "NYLON": 250,
-                "PAPER": 80,
-            }
-            self.db.rates.insert_one({"_id": "current", "rates": default_rates})
-            
-        # Initialize default global configs if empty
-        if self.db.config.count_documents({}) == 0:
-            default_config = {
-                "wastage_percent": 5.0,
-                "labor_cost_per_kg": 8.0,
-                "machine_usage_cost_per_kg": 15.0
+        # (request_id, connection_id) -> collection, only for commands being traced
+        self._traced: Dict[tuple, str] = {}
+
+    def started(self, event):
+        if capture_sink() is not None:
+            key = "collection" if event.command_name == "getMore" else event.command_name
+            collection = event.command.get(key)
+            self._traced[(event.request_id, event.connection_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name)
+        self._trace(event, ok=True)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(event.command_name)
+        self._trace(event, ok=False)
+
+    def _trace(self, event, ok: bool):
+        if not self._traced:
+            return
+        collection = self._traced.pop((event.request_id, event.connection_id), None)
+        sink = capture_sink()
+        if collection is not None and sink is not None:
+            sink.append(("mongo_command_trace", (event.command_name, collection, ok), event.duration_micros / 1e6))
+
+MONGO_COMMAND_LISTENER = MongoCommandMetrics()
+
+def mongo_connection_settings() -> Tuple[str, dict]:
+    """URI and client options shared by the sync and async clients."""
+    # Default to local MongoDB if MONGODB_URI is not set in environment
+    mongo_uri = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/")
+    
+    # Use certifi for secure TLS connection to MongoDB Atlas
+    tls_ca_file = certifi.where() if "mongodb+srv" in mongo_uri else None
+    
+    options = {
+        "tlsCAFile": tls_ca_file,
+        # Pool sizing: keep a few warm connections (TLS handshakes to Atlas are
+        # slow) and bound the total so small instances aren't overrun
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", 5)),
+        "maxIdleTimeMS": int(os.environ.get("MONGO_MAX_IDLE_MS", 60_000)),
+        "waitQueueTimeoutMS": int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10_000)),
+        "event_listeners": [MONGO_COMMAND_LISTENER],
+    }
+    return mongo_uri, options
+
+STORAGE_BACKENDS = ("mongo", "sqlite", "memory")
+
+DEFAULT_RATES = {
+    "PET": 110,
+    "BOPP": 130,
+    "MET_PET": 120,
+    "MET_BOPP": 140,
+    "LDPE": 105,
+    "CPP": 115,
+    "AL_FOIL": 400,
+    "NYLON": 250,
+    "PAPER": 80,
+}
+
+DEFAULT_CONFIG = {
+    "wastage_percent": 5.0,
+    "labor_cost_per_kg": 8.0,
+    "machine_usage_cost_per_kg": 15.0
+}
+
+STATS_ID = "dashboard"
+# IndexOptionsConflict, IndexKeySpecsConflict: an index of that name exists with other options
+INDEX_CONFLICT_CODES = (85, 86)
+# How long a worker prices from its rates/config snapshot before checking the
+# stored pricing version again (0: on every call), so updates made through
+# another worker or process are picked up
+PRICING_REVALIDATE_SECONDS = float(os.environ.get("PRICING_REVALIDATE_SECONDS", 1.0))
+RECENT_QUOTATIONS = 5
+
+# Dashboard cost_distribution key -> CostBreakdown field
+COST_COMPONENT_FIELDS = {
+    "material": "material_cost_per_kg",
+    "ink": "ink_cost_per_kg",
+    "printing": "printing_cost_per_kg",
+    "lamination": "lamination_cost_per_kg",
+    "pouching": "pouching_cost_per_kg",
+    "overhead": "overhead_cost_per_kg",
+    "cylinder": "cylinder_cost_amortized_per_kg",
+}
+
+def _stat_key(name: str) -> str:
+    # Mongo field names can't contain '.' or start with '$' (custom material names might)
+    return str(name).replace(".", "\uff0e").replace("$", "\uff04")
+
+def _unstat_key(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def _stats_increments(quote: dict, sign: int = 1) -> Dict[str, float]:
+    """$inc document that adds (sign=1) or removes (sign=-1) one quotation from the dashboard stats."""
+    bd = quote.get("breakdown", {})
+    req = quote.get("requirements", {})
+    
+    inc: Dict[str, float] = {
+        "total_quotations": sign,
+        "sum_margin": sign * bd.get("margin_percent", 0),
+        "sum_revenue": sign * bd.get("selling_price_per_1000", 0),
+        "sum_cost_per_kg": sign * bd.get("total_cost_per_kg", 0),
+    }
+    for component, field in COST_COMPONENT_FIELDS.items():
+        inc[f"cost_components.{component}"] = sign * bd.get(field, 0)
+    
+    pt = req.get("pouch_type", "UNKNOWN")
+    inc[f"pouch_type_usage.{_stat_key(getattr(pt, 'value', pt))}"] = sign
+    
+    for layer in req.get("film_structure", {}).get("layers", []):
+        key = f"material_usage.{_stat_key(layer.get('material', 'UNKNOWN'))}"
+        inc[key] = inc.get(key, 0) + sign
+    return inc
+
+# Fields needed to rebuild the stats document
+STATS_PROJECTION = {
+    "_id": 0,
+    "requirements.pouch_type": 1,
+    "requirements.film_structure.layers.material": 1,
+    "breakdown.margin_percent": 1,
+    "breakdown.selling_price_per_1000": 1,
+    "breakdown.total_cost_per_kg": 1,
+    **{f"breakdown.{field}": 1 for field in COST_COMPONENT_FIELDS.values()},
+}
+
+def _pricing_context_from_docs(rates_doc: Optional[dict], config_doc: Optional[dict],
+                               version_doc: Optional[dict]) -> PricingContext:
+    return PricingContext.build(
+        version=version_doc.get("seq", 0) if version_doc else 0,
+        rates=rates_doc.get("rates", {}) if rates_doc else {},
+        config=config_doc.get("config", {}) if config_doc else {},
+    )
+
+def _apply_increments(doc: dict, inc: Dict[str, float]):
+    # $inc semantics on an in-memory stats document
+    for key, value in inc.items():
+        parent, _, child = key.partition(".")
+        target = doc.setdefault(parent, {}) if child else doc
+        target[child or parent] = target.get(child or parent, 0) + value
+
+def _accumulate_stats(doc: dict, quote: dict):
+    _apply_increments(doc, _stats_increments(quote))
+
+def _combined_stats_increments(quotes: List[dict], sign: int = 1) -> Dict[str, float]:
+    inc: Dict[str, float] = {}
+    for quote in quotes:
+        for key, value in _stats_increments(quote, sign).items():
+            inc[key] = inc.get(key, 0) + value
+    return inc
+
+def _stats_summary(doc: dict, recent: List[dict]) -> dict:
+    """Dashboard payload from the stats document and the newest quotations."""
+    total = doc.get("total_quotations", 0)
+    
+    if total <= 0:
+        return {
+            "total_quotations": 0,
+            "avg_margin": 0,
+            "total_revenue": 0,
+            "avg_cost_per_kg": 0,
+            "popular_pouch_type": "N/A",
+            "popular_material": "N/A",
+            "material_usage": {},
+            "pouch_type_usage": {},
+            "recent_quotations": [],
+            "cost_distribution": {
+                "material": 0, "ink": 0, "printing": 0,
+                "lamination": 0, "pouching": 0, "overhead": 0, "cylinder": 0
             }
-            self.db.config.insert_one({"_id": "current", "config": default_config})
+        }
+    
+    # Histograms keep zero-count keys after deletes; hide them
+    material_counts = {_unstat_key(k): v for k, v in doc.get("material_usage", {}).items() if v > 0}
+    pouch_counts = {_unstat_key(k): v for k, v in doc.get("pouch_type_usage", {}).items() if v > 0}
+    
+    # Average cost components
+    cost_components = doc.get("cost_components", {})
+    avg_cost_dist = {k: round(cost_components.get(k, 0) / total, 2) for k in COST_COMPONENT_FIELDS}
+    
+    popular_pouch = max(pouch_counts, key=pouch_counts.get) if pouch_counts else "N/A"
+    popular_material = max(material_counts, key=material_counts.get) if material_counts else "N/A"
+    
+    return {
+        "total_quotations": total,
+        "avg_margin": round(doc.get("sum_margin", 0) / total, 1),
+        "total_revenue": round(doc.get("sum_revenue", 0), 2),
+        "avg_cost_per_kg": round(doc.get("sum_cost_per_kg", 0) / total, 2),
+        "popular_pouch_type": popular_pouch.replace("_", " "),
+        "popular_material": popular_material,
+        "material_usage": material_counts,
+        "pouch_type_usage": pouch_counts,
+        "recent_quotations": recent,
+        "cost_distribution": avg_cost_dist
+    }
 
-    def get_rates(self) -> Dict[str, float]:
-        doc = self.db.rates.find_one({"_id": "current"})
-        return doc.get("rates", {}) if doc else {}
+# Dashboard time series: one rollup bucket per day, week (from Monday) and
+# month, holding the stats increments of the quotations dated in it
+ROLLUP_GRANULARITIES = ("day", "week", "month")
+# Range returned when the request gives no date_from, counted back from date_to
+DEFAULT_TIMESERIES_PERIODS = {"day": 30, "week": 26, "month": 12}
+MAX_TIMESERIES_POINTS = 5000
 
-    def update_rates(self, rates: Dict[str, float]):
-        current_rates = self.get_rates()
-        current_rates.update(rates)
-        self.db.rates.update_one({"_id": "current"}, {"$set": {"rates": current_rates}}, upsert=True)
-        return current_rates
+# Fields needed to rebuild the rollup buckets
+ROLLUP_PROJECTION = {**STATS_PROJECTION, "date": 1}
 
-    def get_config(self) -> Dict[str, float]:
-        doc = self.db.config.find_one({"_id": "current"})
-        return doc.get("config", {}) if doc else {}
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
 
-    def update_config(self, config: Dict[str, float]):
-        current_config = self.get_config()
-        current_config.update(config)
-        self.db.config.update_one({"_id": "current"}, {"$set": {"config": current_config}}, upsert=True)
-        return current_config
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=7 if granularity == "week" else 1)
 
-    def save_quotation(self, requirements: dict, breakdown: dict, client_name: str = "Unknown"):
-        # Generate ID based on current max
-        last_quote = self.db.quotations.find_one(sort=[("id", -1)])
-        max_id = last_quote["id"] if last_quote and "id" in last_quote else 0
-        
-        new_quote = {
-            "id": max_id + 1,
-            "date": datetime.now().isoformat(),
+def _rollup_id(granularity: str, start: date) -> str:
+    # ISO dates sort as strings, so a date range is one _id range per granularity
+    return f"{granularity}:{start.isoformat()}"
+
+def _rollup_labels(rollup_id: str) -> dict:
+    granularity, _, period = rollup_id.partition(":")
+    return {"granularity": granularity, "period": period}
+
+def _rollup_increments(quotes: List[dict], sign: int = 1) -> Dict[str, Dict[str, float]]:
+    """_stats_increments of the quotes, combined per rollup bucket id (three buckets per quotation date)."""
+    buckets: Dict[str, Dict[str, float]] = {}
+    for quote in quotes:
+        day = date.fromisoformat(quote["date"][:10])
+        inc = _stats_increments(quote, sign)
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = buckets.setdefault(_rollup_id(granularity, _period_start(day, granularity)), {})
+            for key, value in inc.items():
+                bucket[key] = bucket.get(key, 0) + value
+    return buckets
+
+def _apply_rollup_increments(rollups: Dict[str, dict], buckets: Dict[str, Dict[str, float]]):
+    # $inc with upsert on in-memory rollup documents keyed by id
+    for rollup_id, inc in buckets.items():
+        _apply_increments(rollups.setdefault(rollup_id, {"_id": rollup_id, **_rollup_labels(rollup_id)}), inc)
+
+def _rollup_updates(quotes: List[dict], sign: int = 1) -> List[Tuple[dict, dict]]:
+    """(filter, update) upserts applying the quotes to their rollup buckets."""
+    return [
+        ({"_id": rollup_id}, {"$inc": inc, "$setOnInsert": _rollup_labels(rollup_id)})
+        for rollup_id, inc in _rollup_increments(quotes, sign).items()
+    ]
+
+def _bulk_operations(upserts: List[Tuple[dict, dict]], operation=UpdateOne) -> list:
+    return [operation(filter_doc, doc, upsert=True) for filter_doc, doc in upserts]
+
+def _bulk_upsert(collection, upserts: List[Tuple[dict, dict]], operation=UpdateOne):
+    """(filter, update or replacement) upserts in one unordered bulk_write."""
+    if upserts:
+        collection.bulk_write(_bulk_operations(upserts, operation), ordered=False)
+
+# Mongo write documents shared by MongoDatabase and AsyncDatabase, so the
+# sync and async write paths are built in one place
+
+# A deleted quotation is returned with what it takes to remove it from the counters
+DELETED_QUOTATION_PROJECTION = {"_id": 0, "date": 1, "client_name": 1, "requirements": 1, "breakdown": 1}
+
+def _counter_updates(quotes: List[dict], sign: int = 1) -> Tuple[dict, list]:
+    """Stats update and rollup upserts adding (sign=1) or removing (sign=-1) quotes."""
+    return {"$inc": _combined_stats_increments(quotes, sign)}, _rollup_updates(quotes, sign)
+
+def _id_block_request(count: int) -> dict:
+    # find_one_and_update arguments reserving `count` ids with one atomic $inc
+    return {
+        "filter": {"_id": "quotation_id"},
+        "update": {"$inc": {"seq": count}},
+        "upsert": True,
+        "return_document": ReturnDocument.AFTER,
+    }
+
+def _id_block(counter_doc: dict, count: int) -> range:
+    return range(counter_doc["seq"] - count + 1, counter_doc["seq"] + 1)
+
+def _timeseries_periods(granularity: str, date_from: Optional[date], date_to: Optional[date]) -> List[date]:
+    """Start dates of the periods overlapping date_from..date_to (both inclusive)."""
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(ROLLUP_GRANULARITIES)}")
+    last = _period_start(date_to or date.today(), granularity)
+    if date_from is None:
+        first = last
+        for _ in range(DEFAULT_TIMESERIES_PERIODS[granularity] - 1):
+            first = _period_start(first - timedelta(days=1), granularity)
+    else:
+        first = _period_start(date_from, granularity)
+    if first > last:
+        raise ValueError("date_from must be on or before date_to")
+
+    periods = [first]
+    while periods[-1] < last:
+        if len(periods) >= MAX_TIMESERIES_POINTS:
+            raise ValueError(f"At most {MAX_TIMESERIES_POINTS} periods per request; use a coarser granularity")
+        periods.append(_next_period(periods[-1], granularity))
+    return periods
+
+def _rollup_summary(doc: dict) -> dict:
+    count = doc.get("total_quotations", 0)
+    materials = {_unstat_key(k): v for k, v in doc.get("material_usage", {}).items() if v > 0}
+    layers = sum(materials.values())
+    return {
+        "quotations": count,
+        "revenue": round(doc.get("sum_revenue", 0), 2),
+        "avg_margin": round(doc.get("sum_margin", 0) / count, 1) if count > 0 else 0,
+        "avg_cost_per_kg": round(doc.get("sum_cost_per_kg", 0) / count, 2) if count > 0 else 0,
+        # Share of layers using each material, in percent
+        "material_mix": {material: round(100 * n / layers, 1) for material, n in materials.items()},
+    }
+
+def _timeseries_result(granularity: str, periods: List[date], docs: List[dict]) -> dict:
+    """Dashboard payload: one point per period (empty periods included) and totals over the range."""
+    by_id = {doc["_id"]: doc for doc in docs}
+    totals: Dict[str, Any] = {}
+    points = []
+    for start in periods:
+        doc = by_id.get(_rollup_id(granularity, start), {})
+        for key, value in doc.items():
+            if isinstance(value, dict):
+                _apply_increments(totals, {f"{key}.{child}": n for child, n in value.items()})
+            elif key not in ("_id", "granularity", "period"):
+                _apply_increments(totals, {key: value})
+        points.append({"period": start.isoformat(), **_rollup_summary(doc)})
+    return {
+        "granularity": granularity,
+        "date_from": periods[0].isoformat(),
+        "date_to": (_next_period(periods[-1], granularity) - timedelta(days=1)).isoformat(),
+        "points": points,
+        "totals": _rollup_summary(totals),
+    }
+
+def _new_quotations(ids: range, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+    now = datetime.now().isoformat()
+    return [
+        {
+            "id": quote_id,
+            "date": now,
             "client_name": client_name,
             "requirements": requirements,
             "breakdown": breakdown
         }
+        for quote_id, (requirements, breakdown, client_name) in zip(ids, quotations)
+    ]
+
+# Mongo quotations also store the lower-cased words of their client name, so
+# a client search is an anchored prefix match on a multikey index. Reads
+# project the field away.
+CLIENT_TERMS_FIELD = "client_terms"
+QUOTATION_PROJECTION = {"_id": 0, CLIENT_TERMS_FIELD: 0}
+
+def _client_terms(text: Any) -> List[str]:
+    """Distinct lower-cased words of a client name or search query."""
+    return sorted(set(re.findall(r"\w+", str(text).lower())))
+
+def _with_client_terms(quotes: List[dict]) -> List[dict]:
+    """Copies of new quotations as Mongo stores them."""
+    return [{**quote, CLIENT_TERMS_FIELD: _client_terms(quote["client_name"])} for quote in quotes]
+
+def _projection(fields: Optional[List[str]]) -> dict:
+    if fields:
+        return {"_id": 0, **{field: 1 for field in fields}}
+    return dict(QUOTATION_PROJECTION)
+
+def _clone(value: Any) -> Any:
+    # Copy of a JSON-like document; much cheaper than copy.deepcopy
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, Enum):
+        return value.value  # Stored as Mongo would: enums from model_dump() become plain values
+    return value
+
+def _copy_path(source: dict, target: dict, path: List[str]):
+    head, rest = path[0], path[1:]
+    if head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = _clone(value)
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(head, {}), rest)
+    elif isinstance(value, list):
+        # Like Mongo, project through arrays of subdocuments element-wise
+        items = [item for item in value if isinstance(item, dict)]
+        projected = target.setdefault(head, [{} for _ in items])
+        for item, out in zip(items, projected):
+            _copy_path(item, out, rest)
+
+def _project_document(doc: dict, fields: Optional[List[str]]) -> dict:
+    """Mongo-style inclusion projection of dotted fields, for backends that store plain documents."""
+    if not fields:
+        return _clone(doc)
+    result: dict = {}
+    for field in fields:
+        _copy_path(doc, result, field.split("."))
+    return result
+
+def _pricing_columns(quotes: List[dict], requirement_fields: List[str]) -> dict:
+    """Database.pricing_columns from quotation documents, skipping those without a pouch type."""
+    quotes = [quote for quote in quotes if quote.get("requirements", {}).get("pouch_type") is not None]
+    requirements = [quote["requirements"] for quote in quotes]
+    layers = [
+        (quote["id"], layer)
+        for quote, req in zip(quotes, requirements)
+        for layer in req.get("film_structure", {}).get("layers", [])
+    ]
+    return {
+        "id": [quote.get("id") for quote in quotes],
+        "client_name": [quote.get("client_name") for quote in quotes],
+        "date": [quote.get("date") for quote in quotes],
+        "selling_price_per_1000": [quote.get("breakdown", {}).get("selling_price_per_1000") for quote in quotes],
+        "requirements": {field: [req.get(field) for req in requirements] for field in requirement_fields},
+        "layer_id": [quote_id for quote_id, _ in layers],
+        "layer_material": [layer.get("material") for _, layer in layers],
+        "layer_thickness": [layer.get("thickness_micron") for _, layer in layers],
+    }
+
+def _pricing_fields(requirement_fields: List[str]) -> List[str]:
+    # The dotted fields _pricing_columns reads
+    return [
+        "id", "client_name", "date", "breakdown.selling_price_per_1000",
+        *(f"requirements.{field}" for field in requirement_fields), "requirements.film_structure.layers",
+    ]
+
+def _keyset_query(after: Optional[int], descending: bool) -> dict:
+    if after is None:
+        return {}
+    return {"id": {"$lt": after} if descending else {"$gt": after}}
+
+def _page_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    # The cursor needs the id even when the caller projects it away
+    if fields and "id" not in fields:
+        return ["id", *fields]
+    return fields
+
+def _page_result(items: List[dict], limit: int) -> dict:
+    # items holds up to limit + 1 documents; the extra one only signals another page
+    has_more = len(items) > limit
+    items = items[:limit]
+    return {
+        "items": items,
+        "limit": limit,
+        "next_cursor": items[-1]["id"] if has_more else None,
+    }
+
+def _create_search_indexes(quotations):
+    # Client words, pouch type, layer material and price filters
+    quotations.create_index([(CLIENT_TERMS_FIELD, ASCENDING)])
+    quotations.create_index([("requirements.pouch_type", ASCENDING)])
+    quotations.create_index([("requirements.film_structure.layers.material", ASCENDING), ("date", DESCENDING)])
+    quotations.create_index([("breakdown.selling_price_per_1000", ASCENDING)])
+
+def _search_filter(query: str = "", material: Optional[str] = None,
+                   date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   min_price: Optional[float] = None, max_price: Optional[float] = None) -> dict:
+    """
+    Quotations whose client name has a word starting with each word of the
+    query (case-insensitive), or whose pouch type contains the query, plus
+    optional filters. Every condition is an index range: a client word is an
+    anchored regex on client_terms, so Mongo never scans the collection.
+    """
+    conditions: List[dict] = []
+    if query:
+        terms = _client_terms(query)
+        alternatives = [{"$and": [{CLIENT_TERMS_FIELD: {"$regex": "^" + re.escape(term)}} for term in terms]}] if terms else []
+        pouch_types = _search_pouch_types(query)
+        if pouch_types:
+            alternatives.append({"requirements.pouch_type": {"$in": pouch_types}})
+        if not alternatives:
+            return {"_id": {"$in": []}}  # Nothing to match on: no word characters, no pouch type
+        conditions.append(alternatives[0] if len(alternatives) == 1 else {"$or": alternatives})
+    if material:
+        conditions.append({"requirements.film_structure.layers.material": material})
+    if date_from or date_to:
+        # Dates are stored as ISO strings, so they compare lexicographically; date_to is inclusive
+        date_range = {}
+        if date_from:
+            date_range["$gte"] = date_from.isoformat()
+        if date_to:
+            date_range["$lt"] = (date_to + timedelta(days=1)).isoformat()
+        conditions.append({"date": date_range})
+    if min_price is not None or max_price is not None:
+        price_range = {}
+        if min_price is not None:
+            price_range["$gte"] = min_price
+        if max_price is not None:
+            price_range["$lte"] = max_price
+        conditions.append({"breakdown.selling_price_per_1000": price_range})
+    
+    return {"$and": conditions} if conditions else {}
+
+def _search_pouch_types(query: str) -> List[str]:
+    # Pouch types are a closed enum: resolve the substring up front
+    query_lower = query.lower()
+    return [pt.value for pt in PouchType if query_lower in pt.value.lower()]
+
+def _client_terms_match(query_terms: List[str], client_terms: List[str]) -> bool:
+    # Each query word starts some word of the client name
+    return bool(query_terms) and all(any(term.startswith(q) for term in client_terms) for q in query_terms)
+
+def _search_matcher(query: str = "", material: Optional[str] = None,
+                    date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    min_price: Optional[float] = None, max_price: Optional[float] = None) -> Callable[[dict], bool]:
+    """The _search_filter conditions as a predicate over plain documents."""
+    query_terms = _client_terms(query)
+    pouch_types = set(_search_pouch_types(query)) if query else set()
+    date_start = date_from.isoformat() if date_from else None
+    date_end = (date_to + timedelta(days=1)).isoformat() if date_to else None
+
+    def matches(quote: dict) -> bool:
+        req = quote.get("requirements", {})
+        if query and not _client_terms_match(query_terms, _client_terms(quote.get("client_name", ""))) \
+                and req.get("pouch_type") not in pouch_types:
+            return False
+        if material and not any(layer.get("material") == material
+                                for layer in req.get("film_structure", {}).get("layers", [])):
+            return False
+        quote_date = quote.get("date", "")
+        if (date_start and quote_date < date_start) or (date_end and quote_date >= date_end):
+            return False
+        if min_price is not None or max_price is not None:
+            price = quote.get("breakdown", {}).get("selling_price_per_1000")
+            if price is None or (min_price is not None and price < min_price) \
+                    or (max_price is not None and price > max_price):
+                return False
+        return True
+
+    return matches
+
+class Database(ABC):
+    """
+    Storage interface behind the API. Backends implement quotation storage,
+    search, the dashboard stats document and its per-period rollup buckets.
+    The pricing context (rates and config snapshot), typeahead index and
+    paging are shared here.
+    Backends connect lazily, on first use, so importing this module is cheap.
+    """
+    # In-memory snapshot reads on every pricing call: not worth a metric
+    UNTIMED_METHODS = (
+        "get_pricing_context", "pricing_context_snapshot", "install_pricing_context", "advance_pricing_context",
+        "pricing_history_snapshot", "extend_pricing_history",
+        "client_name_index", "track_saved_client_names", "track_deleted_client_name",
+    )
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every backend's public methods report to db_method_duration_seconds
+        instrument_methods(cls, backend=cls.__name__, exclude=cls.UNTIMED_METHODS)
+
+    def __init__(self):
+        self._client_names = ClientNameIndex(ttl_seconds=float(os.environ.get("CLIENT_INDEX_TTL_SECONDS", 300)))
         
-        self.db.quotations.insert_one(new_quote)
-        new_quote.pop("_id", None)  # Remove MongoDB ObjectId before returning
-        
-        return new_quote
+        # Pricing snapshot, loaded on first use and swapped whole on every update
+        self._pricing_context: Optional[PricingContext] = None
+        self._pricing_checked_at = float("-inf")  # time.monotonic() of the last version check
+        self._context_lock = threading.RLock()
+        # As-of index over the append-only pricing log, caught up on use
+        self._pricing_history = PricingHistory()
+        self._history_lock = threading.Lock()
+
+    def connect(self):
+        """Open the connection and create indexes/seed data now instead of on first use."""
+
+    def close(self):
+        pass
+
+    # Backend primitives
+
+    @abstractmethod
+    def _read_pricing_state(self) -> Tuple[Dict[str, float], Dict[str, float], int]:
+        """Stored (rates, config, pricing version). The version is read first, so a
+        concurrent update can only make it look older than the rates, never newer."""
+
+    @abstractmethod
+    def _read_pricing_version(self) -> int:
+        """The stored pricing version alone: the cheap revalidation read."""
+
+    @abstractmethod
+    def _write_rates(self, rates: Dict[str, float]):
+        pass
+
+    @abstractmethod
+    def _write_config(self, config: Dict[str, float]):
+        pass
+
+    @abstractmethod
+    def _next_pricing_version(self) -> int:
+        """Atomically increment and return the stored pricing version."""
+
+    @abstractmethod
+    def _append_pricing_history(self, entry: dict):
+        """Add a pricing_history_entry to the log. Entries are never changed or removed."""
+
+    @abstractmethod
+    def _read_pricing_history(self, after_version: int) -> List[dict]:
+        """Log entries with a version above after_version, oldest first."""
+
+    @abstractmethod
+    def _client_name_counts(self) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def _stats_document(self) -> dict:
+        """The incrementally maintained stats document (see _stats_increments)."""
+
+    @abstractmethod
+    def _recent_quotations(self, count: int) -> List[dict]:
+        """The newest `count` quotations by date, newest first."""
+
+    # Pricing context
+
+    def get_pricing_context(self) -> PricingContext:
+        """
+        The rates/config snapshot. Once it is PRICING_REVALIDATE_SECONDS old
+        the stored version is read again, and the snapshot reloaded only if
+        another worker has moved it on.
+        """
+        context = self.loaded_pricing_context
+        if context is None:
+            with self._context_lock:
+                context = self.loaded_pricing_context
+                if context is None:
+                    context = self.pricing_context_snapshot()
+                    if context is None or self._read_pricing_version() != context.version:
+                        context = self._load_pricing_context()
+                    self.install_pricing_context(context)
+        return context
+
+    def refresh_pricing_context(self) -> PricingContext:
+        """Reload from storage now, whatever the stored version."""
+        with self._context_lock:
+            self.install_pricing_context(self._load_pricing_context())
+            return self._pricing_context
+
+    def _load_pricing_context(self) -> PricingContext:
+        rates, config, version = self._read_pricing_state()
+        return PricingContext.build(version=version, rates=rates, config=config)
 
-    def get_quotations(self):
-        # Fetch all quotations and omit _id
-        return [q for q in self.db.quotations.find({}, {"_id": 0})]
+    def pricing_context_snapshot(self) -> Optional[PricingContext]:
+        """The last snapshot installed, however old, or None before the first load. Never reads storage."""
+        return self._pricing_context
 
+    @property
+    def loaded_pricing_context(self) -> Optional[PricingContext]:
+        # The snapshot while it needs no revalidation, without touching storage
+        if time.monotonic() - self._pricing_checked_at < PRICING_REVALIDATE_SECONDS:
+            return self._pricing_context
+        return None
+
+    def install_pricing_context(self, context: PricingContext):
+        # Also used by AsyncDatabase, which shares this process-wide snapshot
+        self._pricing_context = context
+        self._pricing_checked_at = time.monotonic()
+
+    def _swap_pricing_context(self, rates: Dict[str, float], config: Dict[str, float]) -> PricingContext:
+        # Caller holds _context_lock. The version is stored so it stays
+        # monotonic across restarts and workers.
+        version = self._next_pricing_version()
+        self._append_pricing_history(pricing_history_entry(version, rates, config))
+        self.install_pricing_context(PricingContext.build(version=version, rates=rates, config=config))
+        return self._pricing_context
+
+    # Pricing history
+
+    def pricing_history(self) -> PricingHistory:
+        """
+        The as-of index, first caught up with entries other workers appended.
+        Its newest entry is the current pricing: see advance_pricing_context.
+        """
+        with self._history_lock:
+            return self.extend_pricing_history(self._read_pricing_history(self._pricing_history.last_version))
+
+    def pricing_history_snapshot(self) -> PricingHistory:
+        """The shared as-of index as last caught up, without reading storage."""
+        return self._pricing_history
+
+    def extend_pricing_history(self, entries: List[dict]) -> PricingHistory:
+        """Add log entries read elsewhere (AsyncDatabase) to the shared index and advance the snapshot to them."""
+        self._pricing_history.extend(entries)
+        self.advance_pricing_context(self._pricing_history)
+        return self._pricing_history
+
+    def advance_pricing_context(self, history: PricingHistory):
+        # The log and the snapshot come from one read: a history entry newer
+        # than the snapshot is installed as it, so history.latest() and
+        # get_pricing_context() agree without a second trip to storage
+        latest = history.latest()
+        if latest is None:
+            return
+        with self._context_lock:
+            if self._pricing_context is None or self._pricing_context.version < latest.version:
+                self.install_pricing_context(latest)
+
+    def get_pricing_history(self) -> List[dict]:
+        return self.pricing_history().entries()
+
+    def get_pricing_context_as_of(self, timestamp: str) -> PricingContext:
+        """The rates and config in force at timestamp (ISO format, as quotation dates)."""
+        return self.pricing_history().as_of(timestamp)
+
+    def get_rates(self) -> Dict[str, float]:
+        # Copy so callers can't mutate the shared snapshot
+        return dict(self.get_pricing_context().rates)
+
+    def update_rates(self, rates: Dict[str, float]):
+        with self._context_lock:
+            # Merge into what is stored now, not this worker's snapshot
+            context = self.refresh_pricing_context()
+            current_rates = dict(context.rates)
+            current_rates.update(rates)
+            self._write_rates(current_rates)
+            self._swap_pricing_context(rates=current_rates, config=context.config)
+        return dict(current_rates)
+
+    def get_config(self) -> Dict[str, float]:
+        return dict(self.get_pricing_context().config)
+
+    def update_config(self, config: Dict[str, float]):
+        with self._context_lock:
+            context = self.refresh_pricing_context()
+            current_config = dict(context.config)
+            current_config.update(config)
+            self._write_config(current_config)
+            self._swap_pricing_context(rates=context.rates, config=current_config)
+        return dict(current_config)
+
+    # Quotations
+
+    def save_quotation(self, requirements: dict, breakdown: dict, client_name: str = "Unknown"):
+        return self.save_quotations([(requirements, breakdown, client_name)])[0]
+
+    @abstractmethod
+    def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        """
+        Save many (requirements, breakdown, client_name) quotations with
+        consecutive ids, updating the stats document. Returns the new documents.
+        """
+
+    def get_quotations(self, fields: Optional[List[str]] = None):
+        # Fetch all quotations and omit _id; optionally only the given (dotted) fields
+        return list(self.iter_quotations(fields=fields))
+
+    def pricing_columns(self, requirement_fields: List[str]) -> dict:
+        """
+        Every quotation with a pouch type, in id order, as columns for batch
+        repricing: lists "id", "client_name", "date" and
+        "selling_price_per_1000", "requirements" mapping each of
+        requirement_fields to a list (None where unset), and the film layers
+        flattened outside in as "layer_id" (the quotation id),
+        "layer_material" and "layer_thickness". Backends read only these
+        fields.
+        """
+        return _pricing_columns(list(self.iter_quotations(fields=_pricing_fields(requirement_fields))), requirement_fields)
+
+    @abstractmethod
+    def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                        limit: Optional[int] = None, descending: bool = False,
+                        batch_size: int = 500) -> Iterator[dict]:
+        """
+        Quotations in id order (ids are allocated in date order).
+        `after` is a keyset cursor: the last id the caller has already seen.
+        Documents are produced in batches, so memory stays flat.
+        """
+
+    def get_quotations_page(self, limit: int, after: Optional[int] = None,
+                            fields: Optional[List[str]] = None, descending: bool = False) -> dict:
+        items = self.iter_quotations(fields=_page_fields(fields), after=after, limit=limit + 1, descending=descending)
+        return _page_result(list(items), limit)
+
+    @abstractmethod
+    def quotations_fingerprint(self) -> tuple:
+        """Cheap change marker for caches built over the whole quotation collection."""
+
+    @abstractmethod
     def delete_quotation(self, quotation_id: int) -> bool:
-        result = self.db.quotations.delete_one({"id": quotation_id})
-        return result.deleted_count > 0
-
-    def search_quotations(self, query: str) -> List[dict]:
-        quotations = self.get_quotations()
-        if not query:
-            return quotations
-        query_lower = query.lower()
-        return [
-            q for q in quotations
-            if query_lower in q.get("client_name", "").lower()
-            or query_lower in q.get("requirements", {}).get("pouch_type", "").lower()
-        ]
+        pass
+
+    def search_quotations(self, query: str = "", material: Optional[str] = None,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None,
+                          min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[dict]:
+        """Quotations matching every given filter (see _search_filter), in id order."""
+        return list(self.iter_search_quotations(query, material, date_from, date_to, min_price, max_price))
+
+    @abstractmethod
+    def iter_search_quotations(self, query: str = "", material: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               min_price: Optional[float] = None, max_price: Optional[float] = None,
+                               batch_size: int = 500) -> Iterator[dict]:
+        """search_quotations produced in batches, like iter_quotations, for exports of any size."""
+
+    def suggest_client_names(self, prefix: str, limit: int = 10) -> List[str]:
+        if self._client_names.is_stale():
+            self._client_names.load(self._client_name_counts())
+        return self._client_names.prefix(prefix, limit)
+
+    def client_name_index(self) -> ClientNameIndex:
+        """The in-process client-name index behind suggest_client_names, shared with AsyncDatabase."""
+        return self._client_names
+
+    def track_saved_client_names(self, quotes: List[dict]):
+        # Keep a loaded index current; a stale one is rebuilt on next use anyway
+        if not self._client_names.is_stale():
+            for quote in quotes:
+                self._client_names.add(quote["client_name"])
+
+    def track_deleted_client_name(self, quote: dict):
+        if not self._client_names.is_stale():
+            self._client_names.remove(quote.get("client_name", "Unknown"))
+
+    # Dashboard
+
+    @abstractmethod
+    def rebuild_stats(self) -> dict:
+        """Recompute the stats document from scratch (e.g. after a manual data fix)."""
 
     def get_stats(self) -> dict:
-        quotations = self.get_quotations()
-        total = len(quotations)
-        
-        if total == 0:
-            return {
-                "total_quotations": 0,
-                "avg_margin": 0,
-                "total_revenue": 0,
-                "avg_cost_per_kg": 0,
-                "popular_pouch_type": "N/A",
-                "popular_material": "N/A",
-                "material_usage": {},
-                "pouch_type_usage": {},
-                "recent_quotations": [],
-                "cost_distribution": {
-                    "material": 0, "ink": 0, "printing": 0,
-                    "lamination": 0, "pouching": 0, "overhead": 0, "cylinder": 0
-                }
-            }
-        
-        margins = []
-        revenues = []
-        costs_per_kg = []
-        material_counts: Dict[str, int] = {}
-        pouch_counts: Dict[str, int] = {}
+        doc = self._stats_document()
+        recent = self._recent_quotations(RECENT_QUOTATIONS) if doc.get("total_quotations", 0) > 0 else []
+        return _stats_summary(doc, recent)
+
+    # Dashboard time series
+
+    @abstractmethod
+    def _rollup_documents(self, first_id: str, last_id: str) -> List[dict]:
+        """Rollup buckets with first_id <= _id <= last_id (see _rollup_increments)."""
+
+    @abstractmethod
+    def rebuild_rollups(self) -> int:
+        """Recompute every rollup bucket from the stored quotations; returns the bucket count."""
+
+    def get_timeseries(self, granularity: str = "month", date_from: Optional[date] = None,
+                       date_to: Optional[date] = None) -> dict:
+        """
+        Revenue, margin, cost/kg and material mix per day, week or month over
+        date_from..date_to, read from one rollup bucket per period.
+        """
+        periods = _timeseries_periods(granularity, date_from, date_to)
+        docs = self._rollup_documents(_rollup_id(granularity, periods[0]), _rollup_id(granularity, periods[-1]))
+        return _timeseries_result(granularity, periods, docs)
+
+class MongoDatabase(Database):
+    """MongoDB storage, the default backend. AsyncDatabase shares its in-process state."""
+    # Once-per-process setup, a flag check on every write after the first
+    UNTIMED_METHODS = Database.UNTIMED_METHODS + ("ensure_initialized", "ensure_id_counter", "ensure_stats", "ensure_rollups")
+
+    def __init__(self):
+        super().__init__()
+        self._client: Optional[MongoClient] = None
+        self._db = None
+        self._connect_lock = threading.Lock()
+        self._stats_ready = False
+        self._rollups_ready = False
+        self._id_counter_ready = False
+
+    @property
+    def initialized(self) -> bool:
+        """Whether ensure_initialized has nothing left to do in this process."""
+        return self._id_counter_ready and self._stats_ready and self._rollups_ready
+
+    def ensure_initialized(self):
+        """The once-per-process setup writes depend on: ensure_id_counter, ensure_stats and ensure_rollups."""
+        self.ensure_id_counter()
+        self.ensure_stats()
+        self.ensure_rollups()
+
+    @property
+    def client(self) -> MongoClient:
+        self.connect()
+        return self._client
+
+    @property
+    def db(self):
+        self.connect()
+        return self._db
+
+    def connect(self):
+        if self._db is not None:
+            return
+        with self._connect_lock:
+            if self._db is not None:
+                return
+            mongo_uri, options = mongo_connection_settings()
+            client = MongoClient(mongo_uri, **options)
+            self._initialize(client.nexus_packaging)
+            self._client, self._db = client, client.nexus_packaging
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = self._db = None
+
+    def _initialize(self, database):
+        # Initialize default rates if empty
+        if database.rates.count_documents({}) == 0:
+            database.rates.insert_one({"_id": "current", "rates": dict(DEFAULT_RATES)})
+            
+        # Initialize default global configs if empty
+        if database.config.count_documents({}) == 0:
+            database.config.insert_one({"_id": "current", "config": dict(DEFAULT_CONFIG)})
         
-        cost_components = {
-            "material": 0.0, "ink": 0.0, "printing": 0.0,
-            "lamination": 0.0, "pouching": 0.0, "overhead": 0.0, "cylinder": 0.0
-        }
+        # Start the pricing log with what is in force now, if it is empty
+        if database.pricing_history.count_documents({}) == 0:
+            context = _pricing_context_from_docs(
+                rates_doc=database.rates.find_one({"_id": "current"}),
+                config_doc=database.config.find_one({"_id": "current"}),
+                version_doc=database.counters.find_one({"_id": "pricing_context"}),
+            )
+            entry = pricing_history_entry(context.version, context.rates, context.config, PRICING_HISTORY_START)
+            try:
+                database.pricing_history.insert_one({"_id": context.version, **entry})
+            except DuplicateKeyError:
+                pass  # Another worker seeded it first
         
-        for q in quotations:
-            bd = q.get("breakdown", {})
-            req = q.get("requirements", {})
-            
-            margins.append(bd.get("margin_percent", 0))
-            revenues.append(bd.get("selling_price_per_1000", 0))
-            costs_per_kg.append(bd.get("total_cost_per_kg", 0))
-            
-            # Pouch type tracking
-            pt = req.get("pouch_type", "UNKNOWN")
-            pouch_counts[pt] = pouch_counts.get(pt, 0) + 1
-            
-            # Material tracking
-            layers = req.get("film_structure", {}).get("layers", [])
-            for layer in layers:
-                mat = layer.get("material", "UNKNOWN")
-                material_counts[mat] = material_counts.get(mat, 0) + 1
-            
-            # Cost component accumulation
-            cost_components["material"] += bd.get("material_cost_per_kg", 0)
-            cost_components["ink"] += bd.get("ink_cost_per_kg", 0)
-            cost_components["printing"] += bd.get("printing_cost_per_kg", 0)
-            cost_components["lamination"] += bd.get("lamination_cost_per_kg", 0)
-            cost_components["pouching"] += bd.get("pouching_cost_per_kg", 0)
-            cost_components["overhead"] += bd.get("overhead_cost_per_kg", 0)
-            cost_components["cylinder"] += bd.get("cylinder_cost_amortized_per_kg", 0)
+        # Recent quotations on the dashboard are read newest-first by date;
+        # listings page through the collection by id
+        database.quotations.create_index([("date", DESCENDING)])
+        self._ensure_unique_id_index(database)
+        # Typeahead counts group by client name
+        database.quotations.create_index([("client_name", ASCENDING)])
+        _create_search_indexes(database.quotations)
+        self._backfill_client_terms(database)
+
+    @staticmethod
+    def _backfill_client_terms(database, batch_size: int = 1000):
+        # Quotations saved before client_terms existed; the index makes the check cheap
+        if database.quotations.find_one({CLIENT_TERMS_FIELD: {"$exists": False}}, {"_id": 1}) is None:
+            return
+        updates = []
+        for quote in database.quotations.find({CLIENT_TERMS_FIELD: {"$exists": False}}, {"_id": 1, "client_name": 1}):
+            terms = _client_terms(quote.get("client_name", ""))
+            updates.append(UpdateOne({"_id": quote["_id"]}, {"$set": {CLIENT_TERMS_FIELD: terms}}))
+            if len(updates) >= batch_size:
+                database.quotations.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            database.quotations.bulk_write(updates, ordered=False)
+
+    def _read_pricing_state(self) -> Tuple[Dict[str, float], Dict[str, float], int]:
+        version_doc = self.db.counters.find_one({"_id": "pricing_context"})
+        context = _pricing_context_from_docs(
+            rates_doc=self.db.rates.find_one({"_id": "current"}),
+            config_doc=self.db.config.find_one({"_id": "current"}),
+            version_doc=version_doc,
+        )
+        return context.rates, context.config, context.version
+
+    def _read_pricing_version(self) -> int:
+        version_doc = self.db.counters.find_one({"_id": "pricing_context"}, projection={"seq": 1})
+        return version_doc.get("seq", 0) if version_doc else 0
+
+    def _write_rates(self, rates: Dict[str, float]):
+        self.db.rates.update_one({"_id": "current"}, {"$set": {"rates": rates}}, upsert=True)
+
+    def _write_config(self, config: Dict[str, float]):
+        self.db.config.update_one({"_id": "current"}, {"$set": {"config": config}}, upsert=True)
+
+    def _next_pricing_version(self) -> int:
+        version_doc = self.db.counters.find_one_and_update(
+            {"_id": "pricing_context"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return version_doc["seq"]
+
+    def _append_pricing_history(self, entry: dict):
+        # Keyed by version, which the atomic counter makes unique
+        self.db.pricing_history.insert_one({"_id": entry["version"], **entry})
+
+    def _read_pricing_history(self, after_version: int) -> List[dict]:
+        cursor = self.db.pricing_history.find({"_id": {"$gt": after_version}}, {"_id": 0}).sort("_id", ASCENDING)
+        return list(cursor)
+
+    def _ensure_unique_id_index(self, database):
+        try:
+            database.quotations.create_index([("id", ASCENDING)], unique=True)
+        except OperationFailure as e:
+            if e.code == 11000:
+                # Duplicate ids from the old max+1 allocation; leave the data alone
+                logger.warning("Quotation ids are not unique, unique index not created: %s", e)
+                return
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+            # A plain id index from an older version: upgrade it in place
+            database.quotations.drop_index("id_1")
+            database.quotations.create_index([("id", ASCENDING)], unique=True)
+
+    def _allocate_ids(self, count: int = 1) -> range:
+        """
+        Reserve a block of `count` consecutive quotation ids with one atomic
+        $inc, so concurrent savers never get the same id.
+        """
+        self.ensure_id_counter()
+        return _id_block(self.db.counters.find_one_and_update(**_id_block_request(count)), count)
+
+    def ensure_id_counter(self):
+        # Once per process: move the counter past any ids allocated before it existed
+        if self._id_counter_ready:
+            return
+        last_quote = self.db.quotations.find_one(sort=[("id", -1)], projection={"_id": 0, "id": 1})
+        max_id = last_quote.get("id", 0) if last_quote else 0
+        try:
+            self.db.counters.update_one({"_id": "quotation_id"}, {"$max": {"seq": max_id}}, upsert=True)
+        except DuplicateKeyError:
+            self.db.counters.update_one({"_id": "quotation_id"}, {"$max": {"seq": max_id}})
+        self._id_counter_ready = True
+
+    def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        # One id block, one insert_many and one stats update
+        if not quotations:
+            return []
         
-        # Average cost components
-        avg_cost_dist = {k: round(v / total, 2) for k, v in cost_components.items()}
+        self.ensure_stats()
+        self.ensure_rollups()
+        new_quotes = _new_quotations(self._allocate_ids(len(quotations)), quotations)
         
-        popular_pouch = max(pouch_counts, key=pouch_counts.get) if pouch_counts else "N/A"
-        popular_material = max(material_counts, key=material_counts.get) if material_counts else "N/A"
+        # Copies get the ObjectId and client_terms; the quotes returned stay as saved
+        self.db.quotations.insert_many(_with_client_terms(new_quotes))
+        self._update_counters(*_counter_updates(new_quotes))
         
-        # Recent quotations (last 5)
-        recent = sorted(quotations, key=lambda x: x.get("date", ""), reverse=True)[:5]
+        self.track_saved_client_names(new_quotes)
         
-        return {
-            "total_quotations": total,
-            "avg_margin": round(sum(margins) / total, 1),
-            "total_revenue": round(sum(revenues), 2),
-            "avg_cost_per_kg": round(sum(costs_per_kg) / total, 2),
-            "popular_pouch_type": popular_pouch.replace("_", " "),
-            "popular_material": popular_material,
-            "material_usage": material_counts,
-            "pouch_type_usage": pouch_counts,
-            "recent_quotations": recent,
-            "cost_distribution": avg_cost_dist
-        }
+        return new_quotes
+
+    def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                        limit: Optional[int] = None, descending: bool = False, batch_size: int = 500):
+        # A Mongo cursor: documents are yielded as Mongo returns them
+        cursor = self.db.quotations.find(_keyset_query(after, descending), _projection(fields))
+        cursor = cursor.sort("id", DESCENDING if descending else ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor.batch_size(batch_size)
+
+    def pricing_columns(self, requirement_fields: List[str]) -> dict:
+        # Only the priced fields, in large batches
+        cursor = self.db.quotations.find(
+            {"requirements.pouch_type": {"$ne": None}}, _projection(_pricing_fields(requirement_fields))
+        )
+        return _pricing_columns(list(cursor.sort("id", ASCENDING).batch_size(10_000)), requirement_fields)
+
+    def quotations_fingerprint(self) -> tuple:
+        last_quote = self.db.quotations.find_one(sort=[("id", -1)], projection={"_id": 0, "id": 1})
+        max_id = last_quote.get("id", 0) if last_quote else 0
+        return (self.db.quotations.estimated_document_count(), max_id)
+
+    def delete_quotation(self, quotation_id: int) -> bool:
+        self.ensure_stats()
+        self.ensure_rollups()
+        deleted = self.db.quotations.find_one_and_delete({"id": quotation_id}, projection=DELETED_QUOTATION_PROJECTION)
+        if deleted is None:
+            return False
+        self._update_counters(*_counter_updates([deleted], sign=-1))
+        self.track_deleted_client_name(deleted)
+        return True
+
+    def _update_counters(self, stats_update: dict, rollup_updates: list):
+        self.db.stats.update_one({"_id": STATS_ID}, stats_update, upsert=True)
+        _bulk_upsert(self.db.rollups, rollup_updates)
+
+    def iter_search_quotations(self, query: str = "", material: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               min_price: Optional[float] = None, max_price: Optional[float] = None,
+                               batch_size: int = 500):
+        filter_doc = _search_filter(query, material, date_from, date_to, min_price, max_price)
+        return self.db.quotations.find(filter_doc, QUOTATION_PROJECTION).sort("id", ASCENDING).batch_size(batch_size)
+
+    def _client_name_counts(self) -> Dict[str, int]:
+        counts = self.db.quotations.aggregate([{"$group": {"_id": "$client_name", "count": {"$sum": 1}}}])
+        return {doc["_id"]: doc["count"] for doc in counts if isinstance(doc["_id"], str)}
+
+    def ensure_stats(self):
+        # The stats document is maintained incrementally; build it once from
+        # existing quotations if this database predates it.
+        if self._stats_ready:
+            return
+        if self.db.stats.find_one({"_id": STATS_ID}, projection={"_id": 1}) is None:
+            try:
+                self.db.stats.insert_one(self._compute_stats_document())
+            except DuplicateKeyError:
+                pass  # Another worker built it first
+        self._stats_ready = True
+
+    def _compute_stats_document(self) -> dict:
+        doc: Dict[str, Any] = {"_id": STATS_ID}
+        for quote in self.db.quotations.find({}, STATS_PROJECTION):
+            _accumulate_stats(doc, quote)
+        return doc
+
+    def rebuild_stats(self) -> dict:
+        doc = self._compute_stats_document()
+        self.db.stats.replace_one({"_id": STATS_ID}, doc, upsert=True)
+        self._stats_ready = True
+        return self.get_stats()
+
+    def _stats_document(self) -> dict:
+        self.ensure_stats()
+        return self.db.stats.find_one({"_id": STATS_ID}) or {}
+
+    def _recent_quotations(self, count: int) -> List[dict]:
+        # Via the date index
+        return list(self.db.quotations.find({}, QUOTATION_PROJECTION).sort("date", DESCENDING).limit(count))
+
+    def ensure_rollups(self):
+        # Like the stats document: built once if this database predates rollups
+        if self._rollups_ready:
+            return
+        if self.db.rollups.find_one({}, projection={"_id": 1}) is None:
+            rollups = self._compute_rollups()
+            if rollups:
+                try:
+                    self.db.rollups.insert_many(list(rollups.values()), ordered=False)
+                except BulkWriteError:
+                    pass  # Another worker built them first
+        self._rollups_ready = True
+
+    def _compute_rollups(self) -> Dict[str, dict]:
+        rollups: Dict[str, dict] = {}
+        for quote in self.db.quotations.find({}, ROLLUP_PROJECTION):
+            _apply_rollup_increments(rollups, _rollup_increments([quote]))
+        return rollups
+
+    def rebuild_rollups(self) -> int:
+        rollups = self._compute_rollups()
+        # Replace in place, then drop buckets no quotation falls in any more
+        _bulk_upsert(self.db.rollups, [({"_id": rollup_id}, doc) for rollup_id, doc in rollups.items()], ReplaceOne)
+        self.db.rollups.delete_many({"_id": {"$nin": list(rollups)}})
+        self._rollups_ready = True
+        return len(rollups)
+
+    def _rollup_documents(self, first_id: str, last_id: str) -> List[dict]:
+        self.ensure_rollups()
+        return list(self.db.rollups.find({"_id": {"$gte": first_id, "$lte": last_id}}))
+
+def create_database(backend: Optional[str] = None) -> Database:
+    """The storage backend named by `backend` or the STORAGE_BACKEND env var (default mongo)."""
+    backend = (backend or os.environ.get("STORAGE_BACKEND", "mongo")).lower()
+    if backend == "mongo":
+        return MongoDatabase()
+    if backend == "sqlite":
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(os.environ.get("SQLITE_PATH", "nexus_packaging.db"))
+    if backend == "memory":
+        from memory_database import MemoryDatabase
+        return MemoryDatabase()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
 
-db = Database()
+db = create_database()
@@ -0,0 +1,252 @@
+"""
+Quotation export for accounts: one row per quotation with the requirements
+flattened and every CostBreakdown field, as CSV or XLSX. Rows are encoded
+as the storage cursor yields them and sent in chunks, so memory stays flat
+whatever the row count and the first bytes go out before the first query
+returns. The XLSX workbook is a zip written front to back (inline strings,
+no shared-strings table), so no dependency is needed and nothing is held
+back until the end.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List
+from xml.sax.saxutils import escape
+from models import CostBreakdown, ProductRequirements
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "xlsx": XLSX_MEDIA_TYPE}
+# Rows encoded per chunk sent
+EXPORT_CHUNK_ROWS = 1000
+# Excel's limit is 1,048,576 rows a sheet, header included; longer exports continue on another sheet
+XLSX_MAX_SHEET_ROWS = 1_048_575
+
+REQUIREMENT_FIELDS = [name for name in ProductRequirements.model_fields if name != "film_structure"]
+BREAKDOWN_FIELDS = list(CostBreakdown.model_fields)
+
+# Headers are the document paths, as in GET /api/quotations?fields=.
+# requirements.film_structure is "MATERIAL microns" per layer, outside in.
+EXPORT_COLUMNS = (
+    ["id", "date", "client_name"]
+    + [f"requirements.{name}" for name in REQUIREMENT_FIELDS]
+    + ["requirements.film_structure", "requirements.layer_count"]
+    + [f"breakdown.{name}" for name in BREAKDOWN_FIELDS]
+)
+
+def export_row(quote: dict) -> list:
+    req = quote.get("requirements", {})
+    bd = quote.get("breakdown", {})
+    layers = req.get("film_structure", {}).get("layers", [])
+    structure = " / ".join(f"{layer.get('material')} {layer.get('thickness_micron'):g}" for layer in layers)
+    return (
+        [quote.get("id"), quote.get("date"), quote.get("client_name")]
+        + [req.get(name) for name in REQUIREMENT_FIELDS]
+        + [structure, len(layers)]
+        + [bd.get(name) for name in BREAKDOWN_FIELDS]
+    )
+
+def export_chunks(quotes: Iterable[dict], fmt: str) -> Iterator[bytes]:
+    """The encoded file, header first, then one chunk per EXPORT_CHUNK_ROWS quotations."""
+    writer = CSVWriter() if fmt == "csv" else XLSXWriter()
+    yield writer.start()
+    rows = []
+    for quote in quotes:
+        rows.append(export_row(quote))
+        if len(rows) >= EXPORT_CHUNK_ROWS:
+            chunk = writer.write_rows(rows)
+            rows = []
+            if chunk:
+                yield chunk
+    yield writer.write_rows(rows) + writer.finish()
+
+# Spreadsheet apps run cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+class CSVWriter:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        # BOM, so Excel reads the file as UTF-8
+        self._csv.writerow(EXPORT_COLUMNS)
+        return b"\xef\xbb\xbf" + self._drain()
+
+    def write_rows(self, rows: List[list]) -> bytes:
+        self._csv.writerows(
+            ["'" + value if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES) else value for value in row]
+            for row in rows
+        )
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b""
+
+class _ChunkSink:
+    """Write-only file for zipfile: collects what it writes until drained."""
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+_SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PACKAGE_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Characters XML 1.0 can't carry at all
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f￾￿]")
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+# Cell styles in _STYLES: 1 is the bold header, 2 a date-time
+_HEADER_STYLE, _DATE_STYLE = 1, 2
+_DATE_COLUMN = EXPORT_COLUMNS.index("date")
+
+_STYLES = (
+    f'<styleSheet xmlns="{_SPREADSHEET_NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+def _text_cell(value: str, style: int = 0) -> str:
+    text = escape(_INVALID_XML_CHARS.sub("", value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    styled = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{styled}><is><t{space}>{text}</t></is></c>'
+
+def _cell(value, column: int) -> str:
+    # Numbers first: most cells are. x - x is 0 unless x is inf or NaN, which go out as text.
+    kind = type(value)
+    if (kind is float or kind is int) and value - value == 0:
+        return f"<c><v>{value!r}</v></c>"
+    # Cells carry no reference, so empty ones must still be written to keep the columns aligned
+    if value is None:
+        return "<c/>"
+    if kind is bool:
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if column == _DATE_COLUMN:
+        try:
+            serial = (datetime.fromisoformat(value) - _EXCEL_EPOCH).total_seconds() / 86400
+            return f'<c s="{_DATE_STYLE}"><v>{serial!r}</v></c>'
+        except (TypeError, ValueError):
+            pass
+    return _text_cell(str(value))
+
+class XLSXWriter:
+    """
+    Minimal SpreadsheetML workbook, streamed. Sheet XML is deflated as rows
+    arrive; the workbook parts that list the sheets are written last, since
+    the sheet count is only known at the end.
+    """
+    def __init__(self):
+        self._sink = _ChunkSink()
+        # The sink can't seek, so zipfile uses data descriptors after each member
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        self._sheet = None
+        self._sheets = 0
+        self._sheet_rows = 0
+        self._header = "<row>" + "".join(_text_cell(name, _HEADER_STYLE) for name in EXPORT_COLUMNS) + "</row>"
+
+    def _open_sheet(self):
+        self._sheets += 1
+        self._sheet_rows = 0
+        # force_zip64: a member's size isn't known up front and a large sheet passes 4 GB uncompressed
+        self._sheet = self._zip.open(f"xl/worksheets/sheet{self._sheets}.xml", "w", force_zip64=True)
+        self._sheet.write((
+            f'{_XML_DECLARATION}<worksheet xmlns="{_SPREADSHEET_NS}">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '</sheetView></sheetViews><sheetData>' + self._header
+        ).encode("utf-8"))
+
+    def _close_sheet(self):
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+
+    def start(self) -> bytes:
+        self._open_sheet()
+        return self._sink.drain()
+
+    def write_rows(self, rows: List[list]) -> bytes:
+        for row in rows:
+            if self._sheet_rows >= XLSX_MAX_SHEET_ROWS:
+                self._close_sheet()
+                self._open_sheet()
+            self._sheet_rows += 1
+            self._sheet.write(
+                ("<row>" + "".join(_cell(value, column) for column, value in enumerate(row)) + "</row>").encode("utf-8")
+            )
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._close_sheet()
+        sheets = range(1, self._sheets + 1)
+        parts = {
+            "[Content_Types].xml": (
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                + "".join(
+                    f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                    for i in sheets
+                )
+                + "</Types>"
+            ),
+            "_rels/.rels": (
+                f'<Relationships xmlns="{_PACKAGE_RELATIONSHIP_NS}">'
+                f'<Relationship Id="rId1" Type="{_RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+                "</Relationships>"
+            ),
+            "xl/workbook.xml": (
+                f'<workbook xmlns="{_SPREADSHEET_NS}" xmlns:r="{_RELATIONSHIP_NS}"><sheets>'
+                + "".join(
+                    f'<sheet name="{"Quotations" if i == 1 else f"Quotations {i}"}" sheetId="{i}" r:id="rId{i}"/>'
+                    for i in sheets
+                )
+                + "</sheets></workbook>"
+            ),
+            "xl/_rels/workbook.xml.rels": (
+                f'<Relationships xmlns="{_PACKAGE_RELATIONSHIP_NS}">'
+                + "".join(
+                    f'<Relationship Id="rId{i}" Type="{_RELATIONSHIP_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                    for i in sheets
+                )
+                + f'<Relationship Id="rId{self._sheets + 1}" Type="{_RELATIONSHIP_NS}/styles" Target="styles.xml"/>'
+                "</Relationships>"
+            ),
+            "xl/styles.xml": _STYLES,
+        }
+        for name, xml in parts.items():
+            self._zip.writestr(name, _XML_DECLARATION + xml)
+        self._zip.close()
+        return self._sink.drain()
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from serialization import dumps_json
+
+try:
+    import brotli
+except ImportError:  # Optional: without it, reference data is served gzip-compressed only
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+# Always revalidate: the ETag follows the pricing version, so a repeat load is a cheap 304
+REFERENCE_CACHE_CONTROL = "no-cache"
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        try:
+            if params and float(params.strip().removeprefix("q=")) == 0:
+                continue  # Explicitly refused
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+class EncodedBody:
+    """
+    A JSON body encoded, and compressed when large, once. The ETag names the
+    pricing version plus a digest of the body: the in-memory backend restarts
+    its versions at 0 and a deploy can change presets without a rates update.
+    """
+    def __init__(self, content: Any, name: str, version: int):
+        self.identity = dumps_json(content)
+        self.etag = f'W/"{name}-v{version}-{hashlib.blake2b(self.identity, digest_size=8).hexdigest()}"'
+        self.encoded: Dict[str, bytes] = {}
+        if len(self.identity) >= COMPRESS_MIN_BYTES:
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(self.identity)
+            self.encoded["gzip"] = gzip.compress(self.identity, compresslevel=9)
+
+    def response(self, request: Request, cache_control: str = REFERENCE_CACHE_CONTROL) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match", ""), self.etag):
+            return Response(status_code=304, headers=headers)
+
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for coding, body in self.encoded.items():  # br first when available
+            if coding in accepted or "*" in accepted:
+                return Response(body, media_type="application/json", headers={**headers, "Content-Encoding": coding})
+        return Response(self.identity, media_type="application/json", headers=headers)
+
+class VersionedBodies:
+    """
+    Encoded reference-data bodies (rates, config, presets), one per name,
+    rebuilt only when the pricing version moves on. Requests in between are
+    served from memory, or answered 304 when the client's ETag still matches.
+    """
+    def __init__(self):
+        self._bodies: Dict[str, Tuple[int, EncodedBody]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: int, build: Callable[[], Any]) -> EncodedBody:
+        cached = self._bodies.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            cached = self._bodies.get(name)
+            if cached is None or cached[0] != version:
+                cached = (version, EncodedBody(build(), name, version))
+                self._bodies[name] = cached
+            return cached[1]
+
+    def response(self, request: Request, name: str, version: int, build: Callable[[], Any]) -> Response:
+        return self.get(name, version, build).response(request)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
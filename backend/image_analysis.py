@@ -0,0 +1,117 @@
+"""
+The colour-analysis engine: PIL, NumPy and scikit-learn. Only ever imported
+on the first analysis (normally inside an ai_service pool worker), so
+pricing-only processes never pay for the imaging stack.
+"""
+from PIL import Image
+import numpy as np
+from sklearn.cluster import KMeans
+import io
+import time
+from typing import Optional
+
+# Colours are clustered on a small thumbnail; JPEGs are decoded straight to
+# roughly this size (DCT scaling), so a 50 MP proof never exists in memory.
+ANALYSIS_SIZE = 150
+# Pixels are bucketed to 5 bits per channel before clustering; each bucket is
+# one weighted sample at its mean colour, a few thousand points instead of 22k.
+QUANTIZE_BITS = 5
+
+def rgb_to_hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+def _decode_thumbnail(image_bytes: bytes):
+    """Decode once at reduced size. Returns (rgb pixels as an (n, 3) array, has_transparency)."""
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.format == 'JPEG':
+        image.draft('RGB', (ANALYSIS_SIZE, ANALYSIS_SIZE))
+
+    has_transparency = False
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        # Check the alpha band before resizing, so small transparent areas still count
+        has_transparency = image.getchannel('A').getextrema()[0] < 255
+
+    image = image.convert('RGB')
+    image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    return np.asarray(image).reshape(-1, 3), has_transparency
+
+def _quantized_samples(pixels: np.ndarray):
+    """Bucket pixels by their top QUANTIZE_BITS per channel: (bucket mean colours, bucket pixel counts)."""
+    shift = 8 - QUANTIZE_BITS
+    q = (pixels >> shift).astype(np.int32)
+    keys = (q[:, 0] << (2 * QUANTIZE_BITS)) | (q[:, 1] << QUANTIZE_BITS) | q[:, 2]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.zeros((len(counts), 3))
+    np.add.at(sums, inverse, pixels)
+    return sums / counts[:, None], counts
+
+def _dominant_colors(pixels: np.ndarray, num_colors: int):
+    """Weighted KMeans over the quantized buckets. Returns (centers, pixel count per center)."""
+    samples, weights = _quantized_samples(pixels)
+    if len(samples) <= num_colors:
+        return samples, weights
+
+    clf = KMeans(n_clusters=num_colors, random_state=42, n_init=4)
+    labels = clf.fit_predict(samples, sample_weight=weights)
+    return clf.cluster_centers_, np.bincount(labels, weights=weights, minlength=num_colors)
+
+def analyze_image_colors(image_bytes: bytes, num_colors=5, timings: Optional[dict] = None):
+    """
+    Analyzes an image to find dominant colors.
+    Returns a list of hex codes and their estimated percentage.
+    Decode and clustering seconds are written into timings, if given.
+    """
+    try:
+        started = time.perf_counter()
+        pixels, has_transparency = _decode_thumbnail(image_bytes)
+        decoded = time.perf_counter()
+        centers, counts = _dominant_colors(pixels, num_colors)
+        if timings is not None:
+            timings["decode"] = decoded - started
+            timings["cluster"] = time.perf_counter() - decoded
+        total_pixels = len(pixels)
+
+        # Detect heuristics for Matte/Glossy based on contrast/variance (very basic heuristic)
+        variance = np.var(pixels)
+        surface_finish = "Glossy/High Contrast" if variance > 3000 else "Matte/Low Contrast"
+
+        ordered_colors = []
+        for i in np.argsort(-counts, kind='stable')[:num_colors]:
+            if counts[i] == 0:
+                continue
+            color = centers[i]
+            hex_code = rgb_to_hex(color)
+            percentage = (counts[i] / total_pixels) * 100
+            ordered_colors.append({
+                "hex": hex_code,
+                "percentage": round(float(percentage), 1),
+                "rgb": [int(c) for c in color]
+            })
+
+        suggested_outer_material = "PET" if surface_finish == "Glossy/High Contrast" else "BOPP"
+        if has_transparency:
+            suggested_inner_material = "LDPE/CPP (Clear)"
+        else:
+            suggested_inner_material = "MET_PET / AL_FOIL"
+
+        return {
+            "colors": ordered_colors,
+            "total_colors_detected": len(ordered_colors),
+            "primary_color": ordered_colors[0]['hex'] if ordered_colors else None,
+            "has_transparency": has_transparency,
+            "surface_finish_heuristic": surface_finish,
+            "suggested_materials": {
+                "outer": suggested_outer_material,
+                "inner_barrier": suggested_inner_material
+            }
+        }
+
+    except Exception as e:
+        import traceback
+        print(f"Error analyzing image: {e}")
+        traceback.print_exc()
+        return {"error": str(e)}
@@ -1,13 +1,47 @@
-from fastapi import FastAPI, HTTPException, Body, File, UploadFile, Query
+import time
+IMPORT_STARTED = time.perf_counter()  # First thing, so the startup report covers every import
+
+from fastapi import FastAPI, HTTPException, Body, File, UploadFile, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from models import ProductRequirements, CostBreakdown
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
+from models import ProductRequirements, CostBreakdown, PouchType
 from calculations import CostCalculator
-from database import db
-from ai_service import analyze_image_colors
+from async_database import adb
+from ai_service import (
+    analyze_image_colors_async, analyze_image_colors_inline, artwork_cache, load_analysis_engine, shutdown_analysis_pool,
+)
+from serialization import FastJSONResponse, negotiated_response, ndjson_line
+from http_cache import VersionedBodies
+from presets import presets_with_breakdowns
+from export import EXPORT_MEDIA_TYPES, export_chunks
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, MetricsMiddleware
+from profiling import profile_store, require_admin, start_profile
 from typing import Dict, List, Optional
-from pydantic import BaseModel
+from datetime import date, datetime
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import sys
+
+# Imported lazily (simulation -> NumPy; analysis pool workers -> PIL, NumPy,
+# scikit-learn); /api/system/startup shows whether this process has loaded them
+HEAVY_MODULES = ("numpy", "PIL", "sklearn", "scipy")
+startup_timings = {"import_seconds": round(time.perf_counter() - IMPORT_STARTED, 4)}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await adb.connect()
+    # Presets and their breakdowns are encoded once here, not per page load
+    context = await adb.get_pricing_context()
+    reference_bodies.get("presets", context.version, lambda: presets_with_breakdowns(context))
+    startup_timings["ready_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    yield
+    await adb.close()
+    shutdown_analysis_pool()
 
-app = FastAPI(title="Packaging Job Analyzer", version="2.0.0")
+app = FastAPI(title="Packaging Job Analyzer", version="2.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Models for API
 class QuotationCreate(BaseModel):
@@ -15,6 +49,81 @@ class QuotationCreate(BaseModel):
     requirements: ProductRequirements
     breakdown: CostBreakdown
 
+MAX_LADDER_POINTS = 1000
+MAX_ARTWORK_FILES = 50
+MAX_ARTWORK_BYTES = int(os.getenv("MAX_ARTWORK_BYTES", 50 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+class PriceLadderRequest(BaseModel):
+    requirements: ProductRequirements
+    # Either an explicit list of piece quantities...
+    quantities: Optional[List[int]] = None
+    # ...or an inclusive min/max/step range
+    min_quantity: Optional[int] = Field(None, gt=0)
+    max_quantity: Optional[int] = Field(None, gt=0)
+    step: Optional[int] = Field(None, gt=0)
+
+    def resolve_quantities(self) -> List[int]:
+        if self.quantities is not None:
+            quantities = self.quantities
+        elif None not in (self.min_quantity, self.max_quantity, self.step):
+            if self.max_quantity < self.min_quantity:
+                raise ValueError("max_quantity must be >= min_quantity")
+            if (self.max_quantity - self.min_quantity) // self.step + 1 > MAX_LADDER_POINTS:
+                raise ValueError(f"A ladder can have at most {MAX_LADDER_POINTS} points")
+            quantities = list(range(self.min_quantity, self.max_quantity + 1, self.step))
+        else:
+            raise ValueError("Provide either quantities or min_quantity, max_quantity and step")
+        
+        if not quantities:
+            raise ValueError("At least one quantity is required")
+        if len(quantities) > MAX_LADDER_POINTS:
+            raise ValueError(f"A ladder can have at most {MAX_LADDER_POINTS} points")
+        if any(q <= 0 for q in quantities):
+            raise ValueError("Quantities must be positive")
+        return quantities
+
+class RateShockRequest(BaseModel):
+    # Percent change per material, e.g. {"AL_FOIL": 12, "LDPE": -3}
+    rate_deltas_percent: Dict[str, float]
+    limit: Optional[int] = Field(None, ge=0, description="Return only the N most eroded quotations")
+
+class HistoricalRepricingRequest(BaseModel):
+    # No filters: the whole portfolio
+    quotation_ids: Optional[List[int]] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = Field(None, description="Inclusive")
+    limit: Optional[int] = Field(None, ge=0, description="Return only the N quotations with the most margin drift")
+
+class StructureOptimizationRequest(BaseModel):
+    # The job, as in ProductRequirements but without a film structure
+    pouch_type: PouchType
+    width_mm: float = Field(..., gt=0)
+    height_mm: float = Field(..., gt=0)
+    gusset_mm: float = Field(0, ge=0)
+    number_of_colors: int = Field(0, ge=0, le=10)
+    quantity_pieces: Optional[int] = Field(None, gt=0)
+    quantity_kg: Optional[float] = Field(None, gt=0)
+    margin_percent: float = Field(20.0, ge=0, le=100)
+    # Constraints on the structure
+    min_layers: int = Field(2, ge=1)
+    max_layers: int = Field(3, ge=1)
+    allowed_materials: Optional[List[str]] = None  # Default: every material with stocked gauges
+    min_total_micron: Optional[float] = Field(None, gt=0)
+    max_total_micron: Optional[float] = Field(None, gt=0)
+    barrier_materials: Optional[List[str]] = Field(None, description='At least one layer must match, e.g. ["AL_FOIL"] or ["MET_*"]')
+    thickness_options: Optional[Dict[str, List[float]]] = None  # Gauges per material, replacing the stocked ones
+    top_n: int = Field(5, ge=1, le=50)
+
+OPTIMIZER_JOB_FIELDS = {"pouch_type", "width_mm", "height_mm", "gusset_mm", "number_of_colors",
+                        "quantity_pieces", "quantity_kg", "margin_percent"}
+
+# Rates, config and presets: encoded once per pricing version, served with ETags
+reference_bodies = VersionedBodies()
+
+# Compress larger responses (reference data above comes precompressed)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -24,214 +133,371 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 def read_root():
     return {"message": "Packaging Job Analyzer API v2.0 is running"}
 
+def process_memory_mb() -> dict:
+    memory = {"rss": None, "peak_rss": None}
+    try:
+        with open("/proc/self/statm") as f:
+            memory["rss"] = round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass  # Not Linux
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["peak_rss"] = round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)  # bytes on macOS, KB elsewhere
+    except ImportError:
+        pass  # Windows
+    return memory
+
+@app.get("/api/system/startup")
+def get_startup_report():
+    """
+    Cold-start report for this worker: time to import the app and to finish
+    startup, memory, and which heavy optional modules have been loaded.
+    For a per-module breakdown run `python -X importtime -c "import main"`.
+    """
+    return {
+        **startup_timings,
+        "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 1),
+        "memory_mb": process_memory_mb(),
+        "heavy_modules_loaded": {name: name in sys.modules for name in HEAVY_MODULES},
+        "modules_loaded": len(sys.modules),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """This worker's request, database, pricing-stage and image-stage metrics, in Prometheus text format."""
+    return Response(METRICS_REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    """A stored request profile: stage times, database and MongoDB calls, top functions."""
+    require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return profile.report()
+
+@app.get("/api/profiles/{profile_id}/pstats")
+def download_profile(profile_id: str, request: Request):
+    require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return Response(
+        profile.pstats_bytes(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
 @app.post("/api/calculate-cost", response_model=CostBreakdown)
-def calculate_cost(requirements: ProductRequirements):
+def calculate_cost(requirements: ProductRequirements, request: Request, response: Response):
+    profile = start_profile(request, "calculate-cost")  # None unless an admin asked for one
     try:
-        result = CostCalculator.calculate_cost(requirements, margin_percent=requirements.margin_percent)
-        return result
+        if profile is None:
+            result = CostCalculator.calculate_cost(requirements, margin_percent=requirements.margin_percent)
+        else:
+            # Profiled: priced against the current snapshot directly, so a cached
+            # quote still runs (and times) every stage
+            with profile:
+                context = adb.shared.get_pricing_context()
+                result = CostCalculator.calculate_cost(requirements, margin_percent=requirements.margin_percent, context=context)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e), headers=profile.headers() if profile else None)
+    if profile:
+        response.headers.update(profile.headers())
+    return result
+
+@app.post("/api/calculate-cost/batch", response_model=List[CostBreakdown])
+def calculate_cost_batch(requirements: List[ProductRequirements], request: Request):
+    try:
+        # Breakdowns are built by the calculator: no need to validate them again
+        return negotiated_response(request, CostCalculator.calculate_cost_batch(requirements))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/calculate-cost/ladder")
+def calculate_price_ladder(ladder: PriceLadderRequest, request: Request):
+    try:
+        quantities = ladder.resolve_quantities()
+        req = ladder.requirements
+        return negotiated_response(request, CostCalculator.calculate_price_ladder(req, quantities, margin_percent=req.margin_percent))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return {
+        "cost": CostCalculator.cost_cache.stats(),
+        "structures": CostCalculator.structure_registry.stats(),
+        "artwork": artwork_cache.stats(),
+    }
+
 @app.get("/api/rates")
-def get_rates():
-    return db.get_rates()
+async def get_rates(request: Request):
+    context = await adb.get_pricing_context()
+    return reference_bodies.response(request, "rates", context.version, lambda: dict(context.rates))
 
 @app.post("/api/rates")
-def update_rates(rates: Dict[str, float]):
-    return db.update_rates(rates)
+async def update_rates(rates: Dict[str, float]):
+    return await adb.update_rates(rates)
+
+@app.get("/api/rates/history")
+async def get_pricing_history():
+    """Every rates/config version with the time it took effect, oldest first."""
+    return await adb.get_pricing_history()
+
+@app.get("/api/rates/as-of")
+async def get_pricing_as_of(timestamp: datetime = Query(..., description="e.g. 2025-03-01T00:00:00")):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)  # Stored times are naive local, like quotation dates
+    context = await adb.get_pricing_context_as_of(timestamp.isoformat())
+    return {"version": context.version, "rates": dict(context.rates), "config": dict(context.config)}
 
 @app.get("/api/config")
-def get_config():
-    return db.get_config()
+async def get_config(request: Request):
+    context = await adb.get_pricing_context()
+    return reference_bodies.response(request, "config", context.version, lambda: dict(context.config))
 
 @app.post("/api/config")
-def update_config(config: Dict[str, float]):
-    return db.update_config(config)
+async def update_config(config: Dict[str, float]):
+    return await adb.update_config(config)
 
 @app.get("/api/quotations")
-def get_quotations():
-    return db.get_quotations()
+async def get_quotations(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; enables cursor pagination"),
+    after: Optional[int] = Query(None, description="Cursor: the next_cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,client_name,breakdown.selling_price_per_1000"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    descending = order == "desc"
+    
+    if format == "ndjson":
+        # One document per line, sent as the Mongo cursor yields them
+        cursor = adb.iter_quotations(fields=field_list, after=after, limit=limit, descending=descending)
+        
+        async def lines():
+            async for q in cursor:
+                yield ndjson_line(q)
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    if limit is not None:
+        page = await adb.get_quotations_page(limit, after=after, fields=field_list, descending=descending)
+        return negotiated_response(request, page)
+    
+    # Unpaginated: the full list, as before
+    return negotiated_response(request, await adb.get_quotations(fields=field_list))
 
 @app.post("/api/quotations")
-def save_quotation(quotation: QuotationCreate):
+async def save_quotation(quotation: QuotationCreate):
     req_dict = quotation.requirements.model_dump()
     breakdown_dict = quotation.breakdown.model_dump()
-    return db.save_quotation(req_dict, breakdown_dict, quotation.client_name)
+    return await adb.save_quotation(req_dict, breakdown_dict, quotation.client_name)
+
+@app.post("/api/quotations/bulk")
+async def save_quotations(quotations: List[QuotationCreate]):
+    saved = await adb.save_quotations([
+        (q.requirements.model_dump(), q.breakdown.model_dump(), q.client_name)
+        for q in quotations
+    ])
+    return {"count": len(saved), "ids": [q["id"] for q in saved]}
 
 @app.delete("/api/quotations/{quotation_id}")
-def delete_quotation(quotation_id: int):
-    success = db.delete_quotation(quotation_id)
+async def delete_quotation(quotation_id: int):
+    success = await adb.delete_quotation(quotation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Quotation not found")
     return {"message": "Quotation deleted", "id": quotation_id}
 
 @app.get("/api/quotations/search")
-def search_quotations(q: str = Query("", description="Search query")):
-    return db.search_quotations(q)
+async def search_quotations(
+    request: Request,
+    q: str = Query("", description="Search query"),
+    material: Optional[str] = Query(None, description="Only quotations with a layer of this material"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None, description="Inclusive"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum selling price per 1000"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum selling price per 1000"),
+):
+    results = await adb.search_quotations(
+        q, material=material, date_from=date_from, date_to=date_to, min_price=min_price, max_price=max_price
+    )
+    return negotiated_response(request, results)
+
+@app.get("/api/quotations/export")
+def export_quotations(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    q: str = Query("", description="Client name (or pouch type) contains, as in search"),
+    material: Optional[str] = Query(None, description="Only quotations with a layer of this material"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None, description="Inclusive"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum selling price per 1000"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum selling price per 1000"),
+):
+    # A sync generator over the sync cursor: Starlette pulls each chunk in its
+    # threadpool, so reads and encoding stay off the event loop
+    quotes = adb.shared.iter_search_quotations(
+        q, material=material, date_from=date_from, date_to=date_to, min_price=min_price, max_price=max_price
+    )
+    filename = f"quotations-{datetime.now():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        export_chunks(quotes, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/quotations/clients")
+async def suggest_client_names(
+    prefix: str = Query("", description="Start of the client name"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    return await adb.suggest_client_names(prefix, limit)
 
 @app.get("/api/dashboard/stats")
-def get_dashboard_stats():
-    return db.get_stats()
+async def get_dashboard_stats(request: Request):
+    profile = start_profile(
+        request, "dashboard-stats",
+        note="Profiles the synchronous storage call; unprofiled requests on MongoDB use the async driver instead",
+    )
+    if profile is None:
+        return negotiated_response(request, await adb.get_stats())
+    # Profiled: the sync storage call, alone in a worker thread under the profiler
+    # (profiling the event loop would take in every other request on it)
+    response = negotiated_response(request, await asyncio.to_thread(profile.run, adb.shared.get_stats))
+    response.headers.update(profile.headers())
+    return response
+
+@app.get("/api/dashboard/timeseries")
+async def get_dashboard_timeseries(
+    request: Request,
+    granularity: str = Query("month", pattern="^(day|week|month)$"),
+    date_from: Optional[date] = Query(None, description="Default: the last 30 days, 26 weeks or 12 months"),
+    date_to: Optional[date] = Query(None, description="Inclusive; default today"),
+):
+    try:
+        timeseries = await adb.get_timeseries(granularity, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return negotiated_response(request, timeseries)
+
+@app.post("/api/simulations/rate-shock")
+def simulate_rate_shock(scenario: RateShockRequest, request: Request):
+    try:
+        from simulation import portfolio_simulator
+        return negotiated_response(request, portfolio_simulator.simulate(scenario.rate_deltas_percent, limit=scenario.limit))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/simulations/historical-repricing")
+def reprice_at_historical_rates(scenario: HistoricalRepricingRequest, request: Request):
+    try:
+        from simulation import portfolio_simulator
+        result = portfolio_simulator.reprice_at_historical_rates(
+            scenario.quotation_ids, date_from=scenario.date_from, date_to=scenario.date_to, limit=scenario.limit
+        )
+        return negotiated_response(request, result)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/structures/optimize")
+def optimize_structure(search: StructureOptimizationRequest, request: Request):
+    try:
+        from structure_optimizer import find_cheapest_structures
+        job = search.model_dump(include=OPTIMIZER_JOB_FIELDS, exclude_unset=True)
+        constraints = search.model_dump(exclude=OPTIMIZER_JOB_FIELDS)
+        return negotiated_response(request, find_cheapest_structures(job, **constraints))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/presets")
-def get_presets():
-    return [
-        {
-            "id": "snacks",
-            "name": "Snacks & Chips",
-            "description": "Namkeen, chips, kurkure — nitrogen-flushed MET barrier pouches",
-            "icon": "🍿",
-            "config": {
-                "pouch_type": "CENTER_SEAL",
-                "width_mm": 160,
-                "height_mm": 240,
-                "gusset_mm": 50,
-                "number_of_colors": 8,
-                "printing_method": "ROTOGRAVURE",
-                "cylinder_cost_per_unit": 5000,
-                "quantity_pieces": 200000,
-                "margin_percent": 20,
-                "film_structure": {
-                    "layers": [
-                        {"material": "BOPP", "thickness_micron": 20},
-                        {"material": "MET_BOPP", "thickness_micron": 20},
-                        {"material": "LDPE", "thickness_micron": 50}
-                    ]
-                }
-            }
-        },
-        {
-            "id": "pharma",
-            "name": "Pharma & Healthcare",
-            "description": "Tablets, sachets, ORS — high-barrier AL foil laminates",
-            "icon": "💊",
-            "config": {
-                "pouch_type": "THREE_SIDE_SEAL",
-                "width_mm": 80,
-                "height_mm": 120,
-                "gusset_mm": 0,
-                "number_of_colors": 4,
-                "printing_method": "ROTOGRAVURE",
-                "cylinder_cost_per_unit": 4500,
-                "quantity_pieces": 500000,
-                "margin_percent": 30,
-                "film_structure": {
-                    "layers": [
-                        {"material": "PET", "thickness_micron": 12},
-                        {"material": "AL_FOIL", "thickness_micron": 9},
-                        {"material": "LDPE", "thickness_micron": 37.5}
-                    ]
-                }
-            }
-        },
-        {
-            "id": "sweets",
-            "name": "Sweets & Mithai",
-            "description": "Laddu, barfi, bakery — premium printed trays & pillow packs",
-            "icon": "🍬",
-            "config": {
-                "pouch_type": "CENTER_SEAL",
-                "width_mm": 200,
-                "height_mm": 150,
-                "gusset_mm": 0,
-                "number_of_colors": 7,
-                "printing_method": "ROTOGRAVURE",
-                "cylinder_cost_per_unit": 5500,
-                "quantity_pieces": 100000,
-                "margin_percent": 25,
-                "film_structure": {
-                    "layers": [
-                        {"material": "BOPP", "thickness_micron": 20},
-                        {"material": "MET_BOPP", "thickness_micron": 20},
-                        {"material": "CPP", "thickness_micron": 30}
-                    ]
-                }
-            }
-        },
-        {
-            "id": "mop_detergent",
-            "name": "MOP & Detergents",
-            "description": "Surf, shampoo sachets, phenyl — heavy-duty liquid-resistant pouches",
-            "icon": "🧴",
-            "config": {
-                "pouch_type": "THREE_SIDE_SEAL",
-                "width_mm": 120,
-                "height_mm": 175,
-                "gusset_mm": 0,
-                "number_of_colors": 5,
-                "printing_method": "ROTOGRAVURE",
-                "cylinder_cost_per_unit": 4000,
-                "quantity_pieces": 300000,
-                "margin_percent": 18,
-                "film_structure": {
-                    "layers": [
-                        {"material": "PET", "thickness_micron": 12},
-                        {"material": "NYLON", "thickness_micron": 15},
-                        {"material": "LDPE", "thickness_micron": 80}
-                    ]
-                }
-            }
-        },
-        {
-            "id": "dairy",
-            "name": "Dairy & Beverages",
-            "description": "Milk, lassi, juice — liquid-fill stand-up & pillow pouches",
-            "icon": "🥛",
-            "config": {
-                "pouch_type": "STAND_UP_POUCH",
-                "width_mm": 140,
-                "height_mm": 220,
-                "gusset_mm": 60,
-                "number_of_colors": 6,
-                "printing_method": "ROTOGRAVURE",
-                "cylinder_cost_per_unit": 5000,
-                "quantity_pieces": 200000,
-                "margin_percent": 22,
-                "film_structure": {
-                    "layers": [
-                        {"material": "PET", "thickness_micron": 12},
-                        {"material": "AL_FOIL", "thickness_micron": 7},
-                        {"material": "LDPE", "thickness_micron": 75}
-                    ]
-                }
-            }
-        },
-        {
-            "id": "agro",
-            "name": "Agro & Fertilizers",
-            "description": "Seeds, fertilizers, pesticides — heavy-gauge multi-layer sacks",
-            "icon": "🌾",
-            "config": {
-                "pouch_type": "STAND_UP_POUCH",
-                "width_mm": 250,
-                "height_mm": 350,
-                "gusset_mm": 80,
-                "number_of_colors": 3,
-                "printing_method": "FLEXO",
-                "cylinder_cost_per_unit": 3000,
-                "quantity_pieces": 50000,
-                "margin_percent": 15,
-                "film_structure": {
-                    "layers": [
-                        {"material": "BOPP", "thickness_micron": 25},
-                        {"material": "LDPE", "thickness_micron": 100}
-                    ]
-                }
-            }
-        }
-    ]
+async def get_presets(request: Request):
+    context = await adb.get_pricing_context()
+    return reference_bodies.response(request, "presets", context.version, lambda: presets_with_breakdowns(context))
 
 @app.post("/api/analyze-image")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(request: Request, file: UploadFile = File(...)):
+    profile = start_profile(request, "analyze-image")
     try:
         contents = await file.read()
-        result = analyze_image_colors(contents)
+        if profile is None:
+            result = await analyze_image_colors_async(contents)
+        else:
+            # Profiled: analysed here rather than in the pool (and never from the cache).
+            # The imaging stack is imported first, as pool workers do when they start.
+            await asyncio.to_thread(load_analysis_engine)
+            result = await asyncio.to_thread(profile.run, analyze_image_colors_inline, contents)
         if "error" in result:
              raise HTTPException(status_code=400, detail=result["error"])
+        if profile:
+            return FastJSONResponse(result, headers=profile.headers())
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def read_upload_limited(file: UploadFile, max_bytes: int) -> bytes:
+    # Read in chunks and stop as soon as the limit is passed, rather than buffering the whole file
+    chunks, size = [], 0
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ValueError(f"File exceeds the {max_bytes} byte limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@app.post("/api/analyze-image/batch")
+async def analyze_images(files: List[UploadFile] = File(...)):
+    """
+    Analyze several artworks at once. Files are fanned out across the analysis
+    process pool and each result is streamed as an NDJSON line as soon as it
+    is ready, so lines arrive in completion order (use `index` to match them up).
+    """
+    if len(files) > MAX_ARTWORK_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ARTWORK_FILES} files per request")
+
+    async def analyze(index, filename, contents, error):
+        if error is None:
+            try:
+                result = await analyze_image_colors_async(contents)
+            except Exception as e:
+                # A broken pool or a worker killed mid-job fails this file, not the stream
+                result = {"error": str(e) or type(e).__name__}
+            if "error" not in result:
+                return {"index": index, "filename": filename, "result": result}
+            error = result["error"]
+        return {"index": index, "filename": filename, "error": error}
+
+    # Upload files are closed once the handler returns, so they are all read
+    # here; each one goes to the pool as soon as it is read
+    tasks = []
+    try:
+        for index, file in enumerate(files):
+            try:
+                contents, error = await read_upload_limited(file, MAX_ARTWORK_BYTES), None
+            except ValueError as e:
+                contents, error = None, str(e)
+            tasks.append(asyncio.ensure_future(analyze(index, file.filename, contents, error)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    async def lines():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield ndjson_line(await next_done)
+        finally:
+            # Client went away: drop whatever is still queued
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
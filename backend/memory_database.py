@@ -0,0 +1,208 @@
+import bisect
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from database import (
+    Database, DEFAULT_CONFIG, DEFAULT_RATES, STATS_ID,
+    _accumulate_stats, _apply_increments, _apply_rollup_increments, _clone, _combined_stats_increments,
+    _new_quotations, _pricing_columns, _project_document, _rollup_increments, _search_matcher, _stats_increments,
+)
+from pricing_history import PRICING_HISTORY_START, pricing_history_entry
+
+class MemoryDatabase(Database):
+    """
+    Process-local storage for tests, benchmarks and single-process demos;
+    nothing survives a restart. Documents are kept in id order with sorted
+    secondary indexes on date and price and a material -> ids map, so the
+    dashboard and search filters don't scan the whole collection.
+    """
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._rates = dict(DEFAULT_RATES)
+        self._config = dict(DEFAULT_CONFIG)
+        self._pricing_version = 0
+        self._pricing_log = [pricing_history_entry(0, self._rates, self._config, PRICING_HISTORY_START)]
+        self._last_id = 0
+        self._quotations: Dict[int, dict] = {}
+        self._ids: List[int] = []  # sorted
+        self._by_date: List[Tuple[str, int]] = []  # sorted (date, id)
+        self._by_price: List[Tuple[float, int]] = []  # sorted (selling_price_per_1000, id)
+        self._by_material: Dict[str, set] = {}
+        self._stats: dict = {"_id": STATS_ID}
+        self._rollups: Dict[str, dict] = {}
+
+    def _read_pricing_state(self) -> Tuple[Dict[str, float], Dict[str, float], int]:
+        with self._lock:
+            return dict(self._rates), dict(self._config), self._pricing_version
+
+    def _read_pricing_version(self) -> int:
+        return self._pricing_version
+
+    def _write_rates(self, rates: Dict[str, float]):
+        with self._lock:
+            self._rates = dict(rates)
+
+    def _write_config(self, config: Dict[str, float]):
+        with self._lock:
+            self._config = dict(config)
+
+    def _next_pricing_version(self) -> int:
+        with self._lock:
+            self._pricing_version += 1
+            return self._pricing_version
+
+    def _append_pricing_history(self, entry: dict):
+        with self._lock:
+            self._pricing_log.append(_clone(entry))
+
+    def _read_pricing_history(self, after_version: int) -> List[dict]:
+        with self._lock:
+            versions = [entry["version"] for entry in self._pricing_log]
+            return [_clone(entry) for entry in self._pricing_log[bisect.bisect_right(versions, after_version):]]
+
+    @staticmethod
+    def _price(quote: dict) -> Optional[float]:
+        return quote.get("breakdown", {}).get("selling_price_per_1000")
+
+    @staticmethod
+    def _materials(quote: dict) -> set:
+        layers = quote.get("requirements", {}).get("film_structure", {}).get("layers", [])
+        return {layer.get("material") for layer in layers}
+
+    def _index(self, quote: dict):
+        quote_id = quote["id"]
+        bisect.insort(self._ids, quote_id)
+        bisect.insort(self._by_date, (quote["date"], quote_id))
+        price = self._price(quote)
+        if price is not None:
+            bisect.insort(self._by_price, (price, quote_id))
+        for material in self._materials(quote):
+            self._by_material.setdefault(material, set()).add(quote_id)
+
+    @staticmethod
+    def _remove_sorted(index: list, key):
+        i = bisect.bisect_left(index, key)
+        if i < len(index) and index[i] == key:
+            del index[i]
+
+    def _unindex(self, quote: dict):
+        quote_id = quote["id"]
+        self._remove_sorted(self._ids, quote_id)
+        self._remove_sorted(self._by_date, (quote["date"], quote_id))
+        price = self._price(quote)
+        if price is not None:
+            self._remove_sorted(self._by_price, (price, quote_id))
+        for material in self._materials(quote):
+            self._by_material.get(material, set()).discard(quote_id)
+
+    def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        if not quotations:
+            return []
+        with self._lock:
+            ids = range(self._last_id + 1, self._last_id + len(quotations) + 1)
+            self._last_id = ids[-1]
+            new_quotes = [_clone(quote) for quote in _new_quotations(ids, quotations)]
+            for quote in new_quotes:
+                self._quotations[quote["id"]] = quote
+                self._index(quote)
+            _apply_increments(self._stats, _combined_stats_increments(new_quotes))
+            _apply_rollup_increments(self._rollups, _rollup_increments(new_quotes))
+        self.track_saved_client_names(new_quotes)
+        return [_clone(quote) for quote in new_quotes]
+
+    def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                        limit: Optional[int] = None, descending: bool = False,
+                        batch_size: int = 500) -> Iterator[dict]:
+        with self._lock:
+            if descending:
+                end = bisect.bisect_left(self._ids, after) if after is not None else len(self._ids)
+                ids = self._ids[max(0, end - limit):end][::-1] if limit else self._ids[:end][::-1]
+            else:
+                start = bisect.bisect_right(self._ids, after) if after is not None else 0
+                ids = self._ids[start:start + limit] if limit else self._ids[start:]
+        for quote_id in ids:
+            quote = self._quotations.get(quote_id)
+            if quote is not None:  # Deleted since the snapshot
+                yield _project_document(quote, fields)
+
+    def pricing_columns(self, requirement_fields: List[str]) -> dict:
+        # Stored documents are never changed in place, so they are read without copying
+        with self._lock:
+            quotes = [self._quotations[quote_id] for quote_id in self._ids]
+        return _pricing_columns(quotes, requirement_fields)
+
+    def quotations_fingerprint(self) -> tuple:
+        with self._lock:
+            return (len(self._ids), self._ids[-1] if self._ids else 0)
+
+    def delete_quotation(self, quotation_id: int) -> bool:
+        with self._lock:
+            deleted = self._quotations.pop(quotation_id, None)
+            if deleted is None:
+                return False
+            self._unindex(deleted)
+            _apply_increments(self._stats, _stats_increments(deleted, sign=-1))
+            _apply_rollup_increments(self._rollups, _rollup_increments([deleted], sign=-1))
+        self.track_deleted_client_name(deleted)
+        return True
+
+    def iter_search_quotations(self, query: str = "", material: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               min_price: Optional[float] = None, max_price: Optional[float] = None,
+                               batch_size: int = 500) -> Iterator[dict]:
+        matches = _search_matcher(query, material, date_from, date_to, min_price, max_price)
+        with self._lock:
+            # Narrow with the indexes, then check every condition on the survivors
+            candidates: Optional[set] = None
+            if material:
+                candidates = set(self._by_material.get(material, ()))
+            if min_price is not None or max_price is not None:
+                lo = bisect.bisect_left(self._by_price, (min_price, 0)) if min_price is not None else 0
+                hi = bisect.bisect_right(self._by_price, (max_price, float("inf"))) if max_price is not None else len(self._by_price)
+                in_range = {quote_id for _, quote_id in self._by_price[lo:hi]}
+                candidates = in_range if candidates is None else candidates & in_range
+            if date_from or date_to:
+                lo = bisect.bisect_left(self._by_date, (date_from.isoformat(), 0)) if date_from else 0
+                # date_to is inclusive: everything before the next day
+                hi = bisect.bisect_left(self._by_date, ((date_to + timedelta(days=1)).isoformat(), 0)) if date_to else len(self._by_date)
+                in_range = {quote_id for _, quote_id in self._by_date[lo:hi]}
+                candidates = in_range if candidates is None else candidates & in_range
+            ids = sorted(candidates) if candidates is not None else list(self._ids)
+        for quote_id in ids:
+            quote = self._quotations.get(quote_id)
+            if quote is not None and matches(quote):  # None: deleted since the snapshot
+                yield _clone(quote)
+
+    def _client_name_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(Counter(quote.get("client_name", "Unknown") for quote in self._quotations.values()))
+
+    def rebuild_stats(self) -> dict:
+        doc = {"_id": STATS_ID}
+        with self._lock:
+            for quote in self._quotations.values():
+                _accumulate_stats(doc, quote)
+            self._stats = doc
+        return self.get_stats()
+
+    def _stats_document(self) -> dict:
+        with self._lock:
+            return _clone(self._stats)
+
+    def _recent_quotations(self, count: int) -> List[dict]:
+        with self._lock:
+            newest = self._by_date[-count:][::-1] if count else []
+            return [_clone(self._quotations[quote_id]) for _, quote_id in newest]
+
+    def rebuild_rollups(self) -> int:
+        rollups: Dict[str, dict] = {}
+        with self._lock:
+            _apply_rollup_increments(rollups, _rollup_increments(list(self._quotations.values())))
+            self._rollups = rollups
+        return len(rollups)
+
+    def _rollup_documents(self, first_id: str, last_id: str) -> List[dict]:
+        with self._lock:
+            return [_clone(doc) for rollup_id, doc in self._rollups.items() if first_id <= rollup_id <= last_id]
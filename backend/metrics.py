@@ -0,0 +1,280 @@
+"""
+Process-local metrics, served by GET /metrics in the Prometheus text format.
+No client library or external service: each worker keeps its own registry.
+Recording a sample appends the raw value to a list; sorting values into
+buckets waits for a scrape (or for a few thousand to pile up), so the hot
+paths pay little more than a perf_counter call when nobody is scraping.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request, database and image-stage latencies (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Pricing stages run in microseconds
+STAGE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3)
+# Raw samples per series held before they are bucketed without a scrape
+PENDING_LIMIT = 4096
+
+# Per-request sample capture, for profiling.py. The context variable is only
+# read while some capture is open, so other requests pay one integer check.
+_captures_open = 0
+_captures_lock = threading.Lock()
+_capture: ContextVar[Optional[list]] = ContextVar("metrics_capture", default=None)
+
+@contextmanager
+def capture_samples() -> Iterator[list]:
+    """
+    Collect (metric name, label values, value) for every sample recorded in
+    this context (thread, or task and the threads it hands work to) until exit.
+    """
+    global _captures_open
+    sink = []
+    token = _capture.set(sink)
+    with _captures_lock:
+        _captures_open += 1
+    try:
+        yield sink
+    finally:
+        with _captures_lock:
+            _captures_open -= 1
+        _capture.reset(token)
+
+def capture_sink() -> Optional[list]:
+    """The open capture's sink in this context, if any."""
+    return _capture.get() if _captures_open else None
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class HistogramSeries:
+    """One label combination of a Histogram. observe() is the hot-path call."""
+    __slots__ = ("histogram", "labelvalues", "pending", "bucket_counts", "total", "count")
+
+    def __init__(self, histogram: "Histogram", labelvalues: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+        self.pending: List[float] = []
+        self.bucket_counts = [0] * (len(histogram.buckets) + 1)  # Last one is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.pending.append(value)
+        if len(self.pending) >= PENDING_LIMIT:
+            self.histogram.fold(self)
+        if _captures_open:
+            sink = _capture.get()
+            if sink is not None:
+                sink.append((self.histogram.name, self.labelvalues, value))
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues) -> HistogramSeries:
+        """The series for these label values; hot paths look it up once and keep it."""
+        series = self._series.get(labelvalues)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(labelvalues, HistogramSeries(self, labelvalues))
+        return series
+
+    def observe(self, value: float, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def fold(self, series: HistogramSeries):
+        """Move pending samples into the bucket counts."""
+        with self._lock:
+            # Slice then delete: samples appended meanwhile stay pending
+            n = len(series.pending)
+            samples = series.pending[:n]
+            del series.pending[:n]
+            for value in samples:
+                series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            series.total += sum(samples)
+            series.count += n
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(self._series.items()):
+            self.fold(series)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series.bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.total)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{_label_text(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, until the last body byte is sent.",
+    ("method", "route", "status"),
+)
+DB_METHOD_SECONDS = REGISTRY.histogram(
+    "db_method_duration_seconds", "Latency of Database methods; _count is the number of calls.",
+    ("backend", "method"),
+)
+DB_METHOD_ERRORS = REGISTRY.counter(
+    "db_method_errors_total", "Database method calls that raised.", ("backend", "method"),
+)
+MONGO_COMMAND_SECONDS = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "Server round trip of each MongoDB command (find, getMore, insert, ...).",
+    ("command",),
+)
+MONGO_COMMAND_FAILURES = REGISTRY.counter(
+    "mongo_command_failures_total", "MongoDB commands that failed.", ("command",),
+)
+PRICING_STAGE_SECONDS = REGISTRY.histogram(
+    "pricing_stage_duration_seconds", "Time per stage of CostCalculator.calculate_cost (uncached).",
+    ("stage",), buckets=STAGE_BUCKETS,
+)
+IMAGE_STAGE_SECONDS = REGISTRY.histogram(
+    "image_analysis_stage_duration_seconds", "Artwork decode and colour clustering time (cache misses only).",
+    ("stage",),
+)
+
+def instrument_methods(cls, backend: str, exclude: Sequence[str] = ()):
+    """
+    Time every public method of cls (inherited ones included) into
+    db_method_duration_seconds under this backend label. Coroutine methods
+    are timed until they complete; methods returning iterators only until
+    the iterator is created.
+    """
+    for name in dir(cls):
+        if name.startswith("_") or name in exclude:
+            continue
+        method = inspect.getattr_static(cls, name)
+        if not inspect.isfunction(method) or getattr(method, "__instrumented__", False):
+            continue
+        setattr(cls, name, _timed_method(method, (backend, name)))
+
+def _timed_method(method, labelvalues: Tuple[str, str]):
+    # Series are created on first call, so backends that are never used don't show up
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                DB_METHOD_ERRORS.inc(*labelvalues)
+                raise
+            finally:
+                DB_METHOD_SECONDS.observe(time.perf_counter() - started, *labelvalues)
+    else:
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                DB_METHOD_ERRORS.inc(*labelvalues)
+                raise
+            finally:
+                DB_METHOD_SECONDS.observe(time.perf_counter() - started, *labelvalues)
+    timed.__instrumented__ = True
+    return timed
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration_seconds. Routes are
+    labelled by their path template (/api/quotations/{quotation_id}), and
+    unmatched paths share one label, so the series count stays bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"], getattr(route, "path", "unmatched"), str(status),
+            )
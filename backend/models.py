@@ -1,6 +1,7 @@
 from enum import Enum
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from types import MappingProxyType
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
+from typing import Dict, List, Mapping, Optional
 
 class MaterialType(str, Enum):
     PET = "PET"
@@ -24,25 +25,27 @@ class PrintingMethod(str, Enum):
     ROTOGRAVURE = "ROTOGRAVURE"
     FLEXO = "FLEXO"
 
+# Standard densities (g/cm3); unknown custom materials are priced at DEFAULT_DENSITY
+MATERIAL_DENSITIES = {
+    MaterialType.PET: 1.4,
+    MaterialType.BOPP: 0.905,
+    MaterialType.MET_PET: 1.4,
+    MaterialType.MET_BOPP: 0.905,
+    MaterialType.LDPE: 0.92,
+    MaterialType.CPP: 0.90,
+    MaterialType.AL_FOIL: 2.7,
+    MaterialType.NYLON: 1.15,
+    MaterialType.PAPER: 0.8 
+}
+DEFAULT_DENSITY = 1.0
+
 class Layer(BaseModel):
     material: str  # Accepts both MaterialType enum values and custom material names
     thickness_micron: float = Field(..., gt=0, description="Thickness in microns")
     
     @property
     def density(self) -> float:
-        # Standard densities (g/cm3)
-        densities = {
-            MaterialType.PET: 1.4,
-            MaterialType.BOPP: 0.905,
-            MaterialType.MET_PET: 1.4,
-            MaterialType.MET_BOPP: 0.905,
-            MaterialType.LDPE: 0.92,
-            MaterialType.CPP: 0.90,
-            MaterialType.AL_FOIL: 2.7,
-            MaterialType.NYLON: 1.15,
-            MaterialType.PAPER: 0.8 
-        }
-        return densities.get(self.material, 1.0)
+        return MATERIAL_DENSITIES.get(self.material, DEFAULT_DENSITY)
 
 class FilmStructure(BaseModel):
     layers: List[Layer]
@@ -105,3 +108,53 @@ class CostBreakdown(BaseModel):
     cost_per_pouch: float
     selling_price_per_pouch: float
     margin_percent: float
+    
+    # Version of the PricingContext this breakdown was priced against
+    pricing_version: Optional[int] = None
+
+class PricingContext(BaseModel):
+    """
+    Immutable snapshot of everything the calculator reads: material rates,
+    global config and the costing constants. Never mutated in place; the
+    database swaps in a new snapshot with a higher version on every update.
+    rates and config are read-only mappings: copy them to build on.
+    """
+    model_config = ConfigDict(frozen=True)
+    
+    version: int = 0
+    rates: Mapping[str, float] = Field(default_factory=dict)
+    config: Mapping[str, float] = Field(default_factory=dict)
+    
+    # Adhesive - dry lamination per layer interface
+    adhesive_gsm: float = 2.5
+    adhesive_rate: float = 250 # INR/kg
+    
+    # Ink assumptions
+    ink_gsm_per_color: float = 0.5 # Average per color
+    white_base_gsm: float = 1.0 # Extra for white base when printed
+    ink_rate: float = 300 # INR/kg
+    
+    # Operational Costs (INR/kg)
+    printing_cost_per_kg_base: float = 15
+    printing_cost_per_kg_per_color: float = 2
+    lamination_cost_per_kg_base: float = 12
+    lamination_cost_per_layer: float = 5 # Cost adds up for multi-pass
+    pouching_cost_per_kg: float = 20
+    slitting_cost_per_kg: float = 5
+    overheads_per_kg: float = 12
+    
+    @field_validator("rates", "config", mode="after")
+    @classmethod
+    def read_only(cls, value: Mapping[str, float]) -> Mapping[str, float]:
+        return MappingProxyType(dict(value))
+    
+    @field_serializer("rates", "config")
+    def serialize_mapping(self, value: Mapping[str, float]) -> Dict[str, float]:
+        return dict(value)
+    
+    @classmethod
+    def build(cls, version: int, rates: Dict[str, float], config: Dict[str, float]) -> "PricingContext":
+        """Config entries named like a constant (e.g. "ink_rate") override its default."""
+        reserved = {"version", "rates", "config"}
+        constants = {k: v for k, v in config.items() if k in cls.model_fields and k not in reserved}
+        return cls(version=version, rates=dict(rates), config=dict(config), **constants)
@@ -0,0 +1,159 @@
+from typing import List
+from calculations import CostCalculator
+from models import PricingContext, ProductRequirements
+
+# Industry sector starting points for the quote form
+PRESETS = [
+    {
+        "id": "snacks",
+        "name": "Snacks & Chips",
+        "description": "Namkeen, chips, kurkure — nitrogen-flushed MET barrier pouches",
+        "icon": "🍿",
+        "config": {
+            "pouch_type": "CENTER_SEAL",
+            "width_mm": 160,
+            "height_mm": 240,
+            "gusset_mm": 50,
+            "number_of_colors": 8,
+            "printing_method": "ROTOGRAVURE",
+            "cylinder_cost_per_unit": 5000,
+            "quantity_pieces": 200000,
+            "margin_percent": 20,
+            "film_structure": {
+                "layers": [
+                    {"material": "BOPP", "thickness_micron": 20},
+                    {"material": "MET_BOPP", "thickness_micron": 20},
+                    {"material": "LDPE", "thickness_micron": 50}
+                ]
+            }
+        }
+    },
+    {
+        "id": "pharma",
+        "name": "Pharma & Healthcare",
+        "description": "Tablets, sachets, ORS — high-barrier AL foil laminates",
+        "icon": "💊",
+        "config": {
+            "pouch_type": "THREE_SIDE_SEAL",
+            "width_mm": 80,
+            "height_mm": 120,
+            "gusset_mm": 0,
+            "number_of_colors": 4,
+            "printing_method": "ROTOGRAVURE",
+            "cylinder_cost_per_unit": 4500,
+            "quantity_pieces": 500000,
+            "margin_percent": 30,
+            "film_structure": {
+                "layers": [
+                    {"material": "PET", "thickness_micron": 12},
+                    {"material": "AL_FOIL", "thickness_micron": 9},
+                    {"material": "LDPE", "thickness_micron": 37.5}
+                ]
+            }
+        }
+    },
+    {
+        "id": "sweets",
+        "name": "Sweets & Mithai",
+        "description": "Laddu, barfi, bakery — premium printed trays & pillow packs",
+        "icon": "🍬",
+        "config": {
+            "pouch_type": "CENTER_SEAL",
+            "width_mm": 200,
+            "height_mm": 150,
+            "gusset_mm": 0,
+            "number_of_colors": 7,
+            "printing_method": "ROTOGRAVURE",
+            "cylinder_cost_per_unit": 5500,
+            "quantity_pieces": 100000,
+            "margin_percent": 25,
+            "film_structure": {
+                "layers": [
+                    {"material": "BOPP", "thickness_micron": 20},
+                    {"material": "MET_BOPP", "thickness_micron": 20},
+                    {"material": "CPP", "thickness_micron": 30}
+                ]
+            }
+        }
+    },
+    {
+        "id": "mop_detergent",
+        "name": "MOP & Detergents",
+        "description": "Surf, shampoo sachets, phenyl — heavy-duty liquid-resistant pouches",
+        "icon": "🧴",
+        "config": {
+            "pouch_type": "THREE_SIDE_SEAL",
+            "width_mm": 120,
+            "height_mm": 175,
+            "gusset_mm": 0,
+            "number_of_colors": 5,
+            "printing_method": "ROTOGRAVURE",
+            "cylinder_cost_per_unit": 4000,
+            "quantity_pieces": 300000,
+            "margin_percent": 18,
+            "film_structure": {
+                "layers": [
+                    {"material": "PET", "thickness_micron": 12},
+                    {"material": "NYLON", "thickness_micron": 15},
+                    {"material": "LDPE", "thickness_micron": 80}
+                ]
+            }
+        }
+    },
+    {
+        "id": "dairy",
+        "name": "Dairy & Beverages",
+        "description": "Milk, lassi, juice — liquid-fill stand-up & pillow pouches",
+        "icon": "🥛",
+        "config": {
+            "pouch_type": "STAND_UP_POUCH",
+            "width_mm": 140,
+            "height_mm": 220,
+            "gusset_mm": 60,
+            "number_of_colors": 6,
+            "printing_method": "ROTOGRAVURE",
+            "cylinder_cost_per_unit": 5000,
+            "quantity_pieces": 200000,
+            "margin_percent": 22,
+            "film_structure": {
+                "layers": [
+                    {"material": "PET", "thickness_micron": 12},
+                    {"material": "AL_FOIL", "thickness_micron": 7},
+                    {"material": "LDPE", "thickness_micron": 75}
+                ]
+            }
+        }
+    },
+    {
+        "id": "agro",
+        "name": "Agro & Fertilizers",
+        "description": "Seeds, fertilizers, pesticides — heavy-gauge multi-layer sacks",
+        "icon": "🌾",
+        "config": {
+            "pouch_type": "STAND_UP_POUCH",
+            "width_mm": 250,
+            "height_mm": 350,
+            "gusset_mm": 80,
+            "number_of_colors": 3,
+            "printing_method": "FLEXO",
+            "cylinder_cost_per_unit": 3000,
+            "quantity_pieces": 50000,
+            "margin_percent": 15,
+            "film_structure": {
+                "layers": [
+                    {"material": "BOPP", "thickness_micron": 25},
+                    {"material": "LDPE", "thickness_micron": 100}
+                ]
+            }
+        }
+    }
+]
+
+def presets_with_breakdowns(context: PricingContext) -> List[dict]:
+    """Every preset with its CostBreakdown at the given rates, as the form would price it."""
+    presets = []
+    for preset in PRESETS:
+        req = ProductRequirements(**preset["config"])
+        breakdown = CostCalculator.calculate_cost(req, margin_percent=req.margin_percent, context=context)
+        presets.append({**preset, "breakdown": breakdown.model_dump()})
+    return presets
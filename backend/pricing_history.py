@@ -0,0 +1,80 @@
+import bisect
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from models import PricingContext
+
+# effective_at of the first entry: the rates in force before history was recorded
+PRICING_HISTORY_START = datetime.min.isoformat()
+
+def pricing_history_entry(version: int, rates: Dict[str, float], config: Dict[str, float],
+                          effective_at: Optional[str] = None) -> dict:
+    # Timestamps use the quotation "date" format, so the two compare as strings
+    return {
+        "version": version,
+        "effective_at": effective_at or datetime.now().isoformat(),
+        "rates": dict(rates),
+        "config": dict(config),
+    }
+
+class PricingHistory:
+    """
+    In-memory index over the append-only pricing log, for as-of lookups:
+    which rates and config were in force at a given timestamp. Entries are
+    kept in version order with their effective times, so a lookup is one
+    bisect. Contexts are built on first use and kept.
+    """
+    def __init__(self):
+        self._times: List[str] = []
+        self._entries: List[dict] = []
+        self._contexts: List[Optional[PricingContext]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def last_version(self) -> int:
+        return self._entries[-1]["version"] if self._entries else -1
+
+    def extend(self, entries: List[dict]):
+        """Add log entries newer than the last one indexed (in any order)."""
+        with self._lock:
+            for entry in sorted(entries, key=lambda e: e["version"]):
+                if entry["version"] <= self.last_version:
+                    continue
+                # Versions order the log; clamp so skewed worker clocks can't unsort the times
+                effective_at = max(entry["effective_at"], self._times[-1]) if self._times else entry["effective_at"]
+                self._times.append(effective_at)
+                self._entries.append(entry)
+                self._contexts.append(None)
+
+    def locate(self, timestamp: str) -> int:
+        """Position of the entry in force at timestamp (the first entry for anything earlier)."""
+        return max(bisect.bisect_right(self._times, timestamp) - 1, 0)
+
+    def locate_many(self, timestamps) -> "np.ndarray":
+        """locate() for an array of timestamps at once."""
+        import numpy as np
+        positions = np.searchsorted(np.array(self._times), np.asarray(timestamps, dtype=str), side="right") - 1
+        return np.maximum(positions, 0)
+
+    def entry(self, position: int) -> dict:
+        return self._entries[position]
+
+    def context(self, position: int) -> PricingContext:
+        context = self._contexts[position]
+        if context is None:
+            entry = self._entries[position]
+            context = PricingContext.build(version=entry["version"], rates=entry["rates"], config=entry["config"])
+            self._contexts[position] = context
+        return context
+
+    def latest(self) -> Optional[PricingContext]:
+        return self.context(len(self._entries) - 1) if self._entries else None
+
+    def as_of(self, timestamp: str) -> PricingContext:
+        return self.context(self.locate(timestamp))
+
+    def entries(self) -> List[dict]:
+        return list(self._entries)
@@ -0,0 +1,153 @@
+"""
+Opt-in profiling of single requests, for chasing one customer's slow quote
+or artwork. A request sending X-Profile: 1 (or ?profile=1) together with the
+admin token in X-Admin-Token runs under cProfile. Every metrics sample it
+records is captured too: pricing and image stages, Database methods and
+MongoDB commands. The result is kept in memory; its id comes back in
+X-Profile-Id with the stage times in Server-Timing, and GET /api/profiles/{id}
+returns it as JSON or as a pstats file.
+Requests without the flag never create a profiler.
+"""
+import cProfile
+import hmac
+import marshal
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException, Request
+from cache import LRUCache
+from metrics import DB_METHOD_SECONDS, IMAGE_STAGE_SECONDS, PRICING_STAGE_SECONDS, capture_samples
+
+# Unset: profiling is off and flagged requests are refused
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+# Functions listed in the JSON report, by cumulative time (the pstats file has all of them)
+TOP_FUNCTIONS = 40
+
+profile_store = LRUCache(
+    maxsize=int(os.getenv("PROFILE_STORE_SIZE", 50)),
+    ttl_seconds=float(os.getenv("PROFILE_STORE_TTL_SECONDS", 3600)),
+)
+
+# One profiled request at a time per process: from Python 3.12 cProfile hooks
+# the whole interpreter and refuses a second active profiler
+_profiler_lock = threading.Lock()
+
+def require_admin(request: Request):
+    if not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (PROFILING_ADMIN_TOKEN is not set)")
+    token = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if not hmac.compare_digest(token.encode(), PROFILING_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def profiling_requested(request: Request) -> bool:
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    if not flag or flag.lower() in ("0", "false", "no"):
+        return False
+    require_admin(request)
+    return True
+
+def start_profile(request: Request, endpoint: str, note: Optional[str] = None) -> Optional["RequestProfile"]:
+    """A RequestProfile if this request asked for one (403 if not allowed), else None."""
+    return RequestProfile(endpoint, note) if profiling_requested(request) else None
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+class RequestProfile:
+    """
+    Context manager profiling the work done inside it, in the current thread.
+    Async handlers hand their work to a thread with run(), so the profile
+    holds this request only and not everything else on the event loop.
+    """
+    def __init__(self, endpoint: str, note: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        # What the profile covers, where that differs from the unprofiled request
+        self.note = note
+        self.created_at = datetime.now().isoformat()
+        self.profiler = cProfile.Profile()
+        self.samples: list = []
+        self.wall_seconds = 0.0
+
+    def __enter__(self) -> "RequestProfile":
+        _profiler_lock.acquire()
+        self._capture = capture_samples()
+        self.samples = self._capture.__enter__()
+        self._started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.wall_seconds = time.perf_counter() - self._started
+        self._capture.__exit__(*exc_info)
+        _profiler_lock.release()
+        profile_store.set(self.id, self)
+        return False
+
+    def run(self, function: Callable, *args, **kwargs) -> Any:
+        with self:
+            return function(*args, **kwargs)
+
+    def stage_seconds(self) -> Dict[str, float]:
+        stages = {}
+        for name, labelvalues, value in self.samples:
+            if name == PRICING_STAGE_SECONDS.name:
+                key = f"pricing.{labelvalues[0]}"
+            elif name == IMAGE_STAGE_SECONDS.name:
+                key = f"image.{labelvalues[0]}"
+            else:
+                continue
+            stages[key] = stages.get(key, 0) + value
+        return stages
+
+    def headers(self) -> Dict[str, str]:
+        timings = [f"total;dur={_ms(self.wall_seconds)}"]
+        timings += [f"{stage.replace('.', '-')};dur={_ms(seconds)}" for stage, seconds in self.stage_seconds().items()]
+        return {"X-Profile-Id": self.id, "Server-Timing": ", ".join(timings)}
+
+    def report(self) -> dict:
+        database_calls = [
+            {"backend": labelvalues[0], "method": labelvalues[1], "ms": _ms(value)}
+            for name, labelvalues, value in self.samples if name == DB_METHOD_SECONDS.name
+        ]
+        mongo_commands = [
+            {"command": labelvalues[0], "collection": labelvalues[1], "ok": labelvalues[2], "ms": _ms(value)}
+            for name, labelvalues, value in self.samples if name == "mongo_command_trace"
+        ]
+
+        stats = pstats.Stats(self.profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+        top_functions = []
+        for function in stats.fcn_list[:TOP_FUNCTIONS]:
+            primitive_calls, calls, self_seconds, cumulative_seconds, _ = stats.stats[function]
+            top_functions.append({
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "primitive_calls": primitive_calls,
+                "self_ms": _ms(self_seconds),
+                "cumulative_ms": _ms(cumulative_seconds),
+            })
+
+        return {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "note": self.note,
+            "created_at": self.created_at,
+            "wall_ms": _ms(self.wall_seconds),
+            "stages_ms": {stage: _ms(seconds) for stage, seconds in self.stage_seconds().items()},
+            "database_calls": database_calls,
+            "mongo_commands": mongo_commands,
+            "top_functions": top_functions,
+            "pstats_url": f"/api/profiles/{self.id}/pstats",
+        }
+
+    def pstats_bytes(self) -> bytes:
+        # The format pstats.Stats.dump_stats writes: load with pstats, snakeviz, etc.
+        return marshal.dumps(pstats.Stats(self.profiler).stats)
@@ -0,0 +1,55 @@
+import bisect
+import threading
+import time
+from typing import Dict, List
+
+class ClientNameIndex:
+    """
+    In-memory prefix index over distinct client names, for search-box typeahead.
+    Names are kept sorted case-insensitively so a prefix lookup is a bisect,
+    with a per-name quotation count so deletes know when a name disappears.
+    """
+    def __init__(self, ttl_seconds: float = 300):
+        # Other workers' saves only show up on reload, so reload periodically
+        self.ttl_seconds = ttl_seconds
+        self._counts: Dict[str, int] = {}
+        self._keys: List[tuple] = []  # sorted (name.lower(), name)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def load(self, counts: Dict[str, int]):
+        with self._lock:
+            self._counts = {name: n for name, n in counts.items() if n > 0}
+            self._keys = sorted((name.lower(), name) for name in self._counts)
+            self._loaded_at = time.monotonic()
+
+    def add(self, name: str):
+        with self._lock:
+            if name not in self._counts:
+                bisect.insort(self._keys, (name.lower(), name))
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def remove(self, name: str):
+        with self._lock:
+            count = self._counts.get(name, 0) - 1
+            if count > 0:
+                self._counts[name] = count
+                return
+            self._counts.pop(name, None)
+            i = bisect.bisect_left(self._keys, (name.lower(), name))
+            if i < len(self._keys) and self._keys[i] == (name.lower(), name):
+                del self._keys[i]
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        prefix = prefix.lower()
+        keys = self._keys
+        start = bisect.bisect_left(keys, (prefix, ""))
+        matches = []
+        for lower, name in keys[start:start + limit]:
+            if not lower.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
@@ -0,0 +1,101 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library, just slower
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # In requirements.txt; without it, clients asking for MessagePack get JSON
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def _default(obj: Any) -> Any:
+    # Types neither encoder knows natively
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # NumPy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+def ndjson_line(content: Any) -> bytes:
+    return dumps_json(content) + b"\n"
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded with orjson. Handlers that return one directly also
+    skip FastAPI's jsonable_encoder pass and response_model re-validation,
+    which is most of the cost for large lists of trusted data.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+class MessagePackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_msgpack(content)
+
+def accept_qualities(accept: str) -> Dict[str, float]:
+    """Media range -> q from an Accept header (q defaults to 1; malformed q counts as 0)."""
+    qualities = {}
+    for entry in accept.split(","):
+        media_range, *params = (part.strip() for part in entry.split(";"))
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        qualities[media_range] = max(q, qualities.get(media_range, 0.0))
+    return qualities
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    True when the client names a MessagePack type with q > 0 and ranks it at
+    least as high as JSON. Only explicit MessagePack types count; JSON takes
+    its q from application/json, else application/*, else */*.
+    """
+    if msgpack is None:
+        return False
+    qualities = accept_qualities(request.headers.get("accept", ""))
+    msgpack_q = max((qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES), default=0.0)
+    if msgpack_q <= 0:
+        return False
+    json_q = next(
+        (qualities[media_range] for media_range in ("application/json", "application/*", "*/*") if media_range in qualities),
+        0.0,
+    )
+    return msgpack_q >= json_q
+
+def negotiated_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """MessagePack when the Accept header asks for it (and msgpack is installed), else fast JSON."""
+    response_class = MessagePackResponse if wants_msgpack(request) else FastJSONResponse
+    return response_class(content, status_code=status_code, headers={"Vary": "Accept"})
@@ -0,0 +1,229 @@
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from calculations import CostCalculator
+from database import db
+
+class PortfolioSimulator:
+    """
+    What-if repricing of stored quotations: under material rate shocks, or at
+    the rates in force on their quote date versus today's. The portfolio is
+    held as batch columns (rates are applied at evaluation time), so a
+    scenario is a few vectorized evaluate_batch passes. Nothing is written
+    back to the database.
+    """
+    def __init__(self):
+        self._portfolio: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def _load_portfolio(self) -> dict:
+        fingerprint = db.quotations_fingerprint()
+        portfolio = self._portfolio
+        if portfolio is not None and portfolio["fingerprint"] == fingerprint:
+            return portfolio
+        
+        with self._lock:
+            if self._portfolio is not None and self._portfolio["fingerprint"] == fingerprint:
+                return self._portfolio
+            # Only the priced fields, one list each: every column is a single NumPy conversion
+            stored = db.pricing_columns(CostCalculator.BATCH_FIELDS)
+            ids = np.array(stored["id"], dtype=np.int64)
+            prices = np.array(stored["selling_price_per_1000"], dtype=float)
+            self._portfolio = {
+                "fingerprint": fingerprint,
+                "ids": stored["id"],
+                "client_names": ["Unknown" if name is None else name for name in stored["client_name"]],
+                "dates": np.array(["" if day is None else day for day in stored["date"]], dtype=str),
+                "quoted_price_per_1000": np.where(np.isnan(prices), 0, prices),
+                "columns": CostCalculator.batch_columns_from_lists(
+                    stored["requirements"],
+                    layer_row=np.searchsorted(ids, np.array(stored["layer_id"], dtype=np.int64)),
+                    layer_material=stored["layer_material"],
+                    layer_thickness=stored["layer_thickness"],
+                ),
+            }
+            return self._portfolio
+
+    @staticmethod
+    def _margin_percent(price: np.ndarray, cost: np.ndarray) -> np.ndarray:
+        # Same definition as CostCalculator: price = cost * (1 + margin / 100)
+        return np.divide(price - cost, cost, out=np.zeros(len(cost)), where=cost > 0) * 100
+
+    def simulate(self, rate_deltas_percent: Dict[str, float], limit: Optional[int] = None) -> dict:
+        """
+        Reprice the portfolio at current rates and at current rates shocked by
+        rate_deltas_percent (e.g. {"AL_FOIL": 12, "LDPE": -3}), holding each
+        quotation's quoted selling price fixed. Items are ordered by margin
+        erosion, worst first; limit caps how many are returned.
+        """
+        portfolio = self._load_portfolio()
+        context = db.get_pricing_context()
+        
+        shocked_rates = dict(context.rates)
+        for material, delta in rate_deltas_percent.items():
+            shocked_rates[material] = shocked_rates.get(material, 100) * (1 + delta / 100)
+        shocked_context = context.model_copy(update={"rates": shocked_rates})
+        
+        columns = portfolio["columns"]
+        if columns["size"]:
+            cost_before = CostCalculator.evaluate_batch(columns, context)["cost_per_1000_pouches"]
+            cost_after = CostCalculator.evaluate_batch(columns, shocked_context)["cost_per_1000_pouches"]
+        else:
+            cost_before = cost_after = np.zeros(0)
+        price = portfolio["quoted_price_per_1000"]
+        
+        margin_before = self._margin_percent(price, cost_before)
+        margin_after = self._margin_percent(price, cost_after)
+        erosion = margin_before - margin_after
+        
+        total_revenue = float(price.sum())
+        total_cost_before = float(cost_before.sum())
+        total_cost_after = float(cost_after.sum())
+        portfolio_margin_before = (total_revenue / total_cost_before - 1) * 100 if total_cost_before > 0 else 0
+        portfolio_margin_after = (total_revenue / total_cost_after - 1) * 100 if total_cost_after > 0 else 0
+        
+        order = np.argsort(-erosion, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        
+        items = [
+            {
+                "id": portfolio["ids"][i],
+                "client_name": portfolio["client_names"][i],
+                "selling_price_per_1000": round(p, 2),
+                "cost_per_1000_before": round(before, 2),
+                "cost_per_1000_after": round(after, 2),
+                "cost_delta_per_1000": round(after - before, 2),
+                "margin_percent_before": round(m_before, 2),
+                "margin_percent_after": round(m_after, 2),
+                "margin_erosion_points": round(m_before - m_after, 2),
+            }
+            for i, p, before, after, m_before, m_after in zip(
+                order.tolist(),
+                price[order].tolist(),
+                cost_before[order].tolist(),
+                cost_after[order].tolist(),
+                margin_before[order].tolist(),
+                margin_after[order].tolist(),
+            )
+        ]
+        
+        n = len(price)
+        return {
+            "pricing_version": context.version,
+            "rate_deltas_percent": rate_deltas_percent,
+            "summary": {
+                "quotations": n,
+                "total_revenue": round(total_revenue, 2),
+                "total_cost_before": round(total_cost_before, 2),
+                "total_cost_after": round(total_cost_after, 2),
+                "total_cost_delta": round(total_cost_after - total_cost_before, 2),
+                "portfolio_margin_before": round(portfolio_margin_before, 2),
+                "portfolio_margin_after": round(portfolio_margin_after, 2),
+                "portfolio_margin_erosion_points": round(portfolio_margin_before - portfolio_margin_after, 2),
+                "avg_margin_before": round(float(margin_before.mean()), 2) if n else 0,
+                "avg_margin_after": round(float(margin_after.mean()), 2) if n else 0,
+                "loss_making_after": int((margin_after < 0).sum()),
+            },
+            "items": items,
+        }
+
+    def reprice_at_historical_rates(self, quotation_ids: Optional[List[int]] = None,
+                                    date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                    limit: Optional[int] = None) -> dict:
+        """
+        Reprice stored quotations (all, the given ids, and/or a quote-date
+        range) at the rates and config in force on their quote date and at
+        current ones, holding each quoted selling price fixed. Quotations are
+        grouped by historical pricing version, one evaluate_batch pass per
+        version. Items are ordered by margin drift, worst first.
+        """
+        portfolio = self._load_portfolio()
+        history = db.pricing_history()
+        context = history.latest()  # "Now" from the same read as "then"
+        
+        dates = portfolio["dates"]
+        selected = np.ones(len(dates), dtype=bool)
+        if quotation_ids is not None:
+            wanted = set(quotation_ids)
+            selected &= np.fromiter((i in wanted for i in portfolio["ids"]), dtype=bool, count=len(dates))
+        if date_from:
+            selected &= dates >= date_from.isoformat()
+        if date_to:
+            selected &= dates < (date_to + timedelta(days=1)).isoformat()  # date_to is inclusive
+        rows = np.flatnonzero(selected)
+        
+        columns = CostCalculator.take_batch_rows(portfolio["columns"], rows)
+        positions = history.locate_many(dates[rows])
+        cost_then = np.zeros(len(rows))
+        if len(rows):
+            cost_now = CostCalculator.evaluate_batch(columns, context)["cost_per_1000_pouches"]
+            for position in np.unique(positions).tolist():
+                group = np.flatnonzero(positions == position)
+                group_columns = CostCalculator.take_batch_rows(columns, group)
+                cost_then[group] = CostCalculator.evaluate_batch(group_columns, history.context(position))["cost_per_1000_pouches"]
+        else:
+            cost_now = np.zeros(0)
+        price = portfolio["quoted_price_per_1000"][rows]
+        
+        margin_then = self._margin_percent(price, cost_then)
+        margin_now = self._margin_percent(price, cost_now)
+        drift = margin_then - margin_now
+        
+        total_revenue = float(price.sum())
+        total_cost_then = float(cost_then.sum())
+        total_cost_now = float(cost_now.sum())
+        portfolio_margin_then = (total_revenue / total_cost_then - 1) * 100 if total_cost_then > 0 else 0
+        portfolio_margin_now = (total_revenue / total_cost_now - 1) * 100 if total_cost_now > 0 else 0
+        
+        order = np.argsort(-drift, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        
+        items = [
+            {
+                "id": portfolio["ids"][row],
+                "client_name": portfolio["client_names"][row],
+                "date": str(dates[row]),
+                "pricing_version_then": history.entry(position)["version"],
+                "selling_price_per_1000": round(p, 2),
+                "cost_per_1000_then": round(then, 2),
+                "cost_per_1000_now": round(now, 2),
+                "cost_delta_per_1000": round(now - then, 2),
+                "margin_percent_then": round(m_then, 2),
+                "margin_percent_now": round(m_now, 2),
+                "margin_drift_points": round(m_then - m_now, 2),
+            }
+            for row, position, p, then, now, m_then, m_now in zip(
+                rows[order].tolist(),
+                positions[order].tolist(),
+                price[order].tolist(),
+                cost_then[order].tolist(),
+                cost_now[order].tolist(),
+                margin_then[order].tolist(),
+                margin_now[order].tolist(),
+            )
+        ]
+        
+        n = len(rows)
+        return {
+            "pricing_version": context.version,
+            "summary": {
+                "quotations": n,
+                "pricing_versions_used": len(np.unique(positions)),
+                "total_revenue": round(total_revenue, 2),
+                "total_cost_then": round(total_cost_then, 2),
+                "total_cost_now": round(total_cost_now, 2),
+                "total_cost_delta": round(total_cost_now - total_cost_then, 2),
+                "portfolio_margin_then": round(portfolio_margin_then, 2),
+                "portfolio_margin_now": round(portfolio_margin_now, 2),
+                "portfolio_margin_drift_points": round(portfolio_margin_then - portfolio_margin_now, 2),
+                "avg_margin_then": round(float(margin_then.mean()), 2) if n else 0,
+                "avg_margin_now": round(float(margin_now.mean()), 2) if n else 0,
+                "loss_making_now": int((margin_now < 0).sum()),
+            },
+            "items": items,
+        }
+
+portfolio_simulator = PortfolioSimulator()
@@ -0,0 +1,401 @@
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from database import (
+    Database, DEFAULT_CONFIG, DEFAULT_RATES, STATS_ID,
+    _accumulate_stats, _apply_increments, _apply_rollup_increments, _combined_stats_increments,
+    _client_terms, _new_quotations, _project_document, _rollup_increments, _search_pouch_types, _stats_increments,
+)
+from pricing_history import PRICING_HISTORY_START, pricing_history_entry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotations (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    pouch_type TEXT,
+    selling_price_per_1000 REAL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotations_date ON quotations (date DESC);
+CREATE INDEX IF NOT EXISTS quotations_client_name ON quotations (client_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS quotations_pouch_type ON quotations (pouch_type);
+CREATE INDEX IF NOT EXISTS quotations_price ON quotations (selling_price_per_1000);
+
+-- One row per distinct layer material of a quotation, for the material filter
+CREATE TABLE IF NOT EXISTS quotation_materials (
+    material TEXT NOT NULL,
+    quotation_id INTEGER NOT NULL,
+    PRIMARY KEY (material, quotation_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS quotation_materials_quotation ON quotation_materials (quotation_id);
+
+-- One row per distinct lower-cased word of a quotation's client name, for search
+CREATE TABLE IF NOT EXISTS quotation_client_terms (
+    term TEXT NOT NULL,
+    quotation_id INTEGER NOT NULL,
+    PRIMARY KEY (term, quotation_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS quotation_client_terms_quotation ON quotation_client_terms (quotation_id);
+
+-- Append-only log of every rates/config version, for as-of lookups
+CREATE TABLE IF NOT EXISTS pricing_history (
+    version INTEGER PRIMARY KEY,
+    effective_at TEXT NOT NULL,
+    rates TEXT NOT NULL,
+    config TEXT NOT NULL
+);
+
+-- Dashboard time-series buckets ("day:2025-03-14", "week:...", "month:..."), as JSON
+CREATE TABLE IF NOT EXISTS rollups (id TEXT PRIMARY KEY, document TEXT NOT NULL) WITHOUT ROWID;
+
+-- rates, config and the dashboard stats document, as JSON
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+"""
+
+class SQLiteDatabase(Database):
+    """
+    Embedded single-file storage for small single-node deployments: no
+    network hop and no server to run. Quotations are stored as JSON with the
+    searched fields in indexed columns. Writes take an IMMEDIATE transaction,
+    so several worker processes can share one file safely.
+    """
+    def __init__(self, path: str = "nexus_packaging.db"):
+        super().__init__()
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def connect(self):
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            for key, value in (("rates", DEFAULT_RATES), ("config", DEFAULT_CONFIG), ("stats", {"_id": STATS_ID})):
+                conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            self._conn = conn
+            if not conn.execute("SELECT 1 FROM pricing_history LIMIT 1").fetchone():
+                # Start the pricing log with what is in force now
+                rates, config, version = self._read_pricing_state()
+                self._insert_pricing_history(conn, pricing_history_entry(version, rates, config, PRICING_HISTORY_START))
+            if (not conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone()
+                    and conn.execute("SELECT 1 FROM quotations LIMIT 1").fetchone()):
+                # A file from before rollups existed: backfill them once
+                self._write(self._replace_rollups)
+            if (not conn.execute("SELECT 1 FROM quotation_client_terms LIMIT 1").fetchone()
+                    and conn.execute("SELECT 1 FROM quotations LIMIT 1").fetchone()):
+                # Likewise the client-name words
+                self._write(self._index_all_client_terms)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            self.connect()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, work):
+        """Run work(conn) in one IMMEDIATE transaction (takes the write lock up front)."""
+        with self._lock:
+            self.connect()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _get_setting(conn: sqlite3.Connection, key: str) -> dict:
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    @staticmethod
+    def _set_setting(conn: sqlite3.Connection, key: str, value: dict):
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @staticmethod
+    def _increment_counter(conn: sqlite3.Connection, name: str, count: int = 1, floor: int = 0) -> int:
+        row = conn.execute("SELECT seq FROM counters WHERE name = ?", (name,)).fetchone()
+        seq = max(row[0] if row else 0, floor) + count
+        conn.execute("INSERT OR REPLACE INTO counters (name, seq) VALUES (?, ?)", (name, seq))
+        return seq
+
+    def _read_pricing_state(self) -> Tuple[Dict[str, float], Dict[str, float], int]:
+        with self._lock:
+            self.connect()
+            version = self._read_pricing_version()
+            return self._get_setting(self._conn, "rates"), self._get_setting(self._conn, "config"), version
+
+    def _read_pricing_version(self) -> int:
+        version = self._query("SELECT seq FROM counters WHERE name = 'pricing_context'")
+        return version[0][0] if version else 0
+
+    def _write_rates(self, rates: Dict[str, float]):
+        self._write(lambda conn: self._set_setting(conn, "rates", rates))
+
+    def _write_config(self, config: Dict[str, float]):
+        self._write(lambda conn: self._set_setting(conn, "config", config))
+
+    def _next_pricing_version(self) -> int:
+        return self._write(lambda conn: self._increment_counter(conn, "pricing_context"))
+
+    @staticmethod
+    def _insert_pricing_history(conn: sqlite3.Connection, entry: dict):
+        # OR IGNORE: a concurrent process may have logged the same version first
+        conn.execute(
+            "INSERT OR IGNORE INTO pricing_history (version, effective_at, rates, config) VALUES (?, ?, ?, ?)",
+            (entry["version"], entry["effective_at"], json.dumps(entry["rates"]), json.dumps(entry["config"])),
+        )
+
+    def _append_pricing_history(self, entry: dict):
+        self._write(lambda conn: self._insert_pricing_history(conn, entry))
+
+    def _read_pricing_history(self, after_version: int) -> List[dict]:
+        rows = self._query(
+            "SELECT version, effective_at, rates, config FROM pricing_history WHERE version > ? ORDER BY version",
+            (after_version,),
+        )
+        return [
+            {"version": version, "effective_at": effective_at, "rates": json.loads(rates), "config": json.loads(config)}
+            for version, effective_at, rates, config in rows
+        ]
+
+    def save_quotations(self, quotations: List[Tuple[dict, dict, str]]) -> List[dict]:
+        if not quotations:
+            return []
+
+        def insert(conn: sqlite3.Connection) -> List[dict]:
+            # Never reuse ids, even of deleted quotations
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM quotations").fetchone()[0]
+            last_id = self._increment_counter(conn, "quotation_id", len(quotations), floor=max_id)
+            ids = range(last_id - len(quotations) + 1, last_id + 1)
+            documents = [json.dumps(quote) for quote in _new_quotations(ids, quotations)]
+            new_quotes = [json.loads(document) for document in documents]  # Plain JSON types, as read back later
+            conn.executemany(
+                "INSERT INTO quotations (id, date, client_name, pouch_type, selling_price_per_1000, document) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (q["id"], q["date"], q["client_name"], q.get("requirements", {}).get("pouch_type"),
+                     q.get("breakdown", {}).get("selling_price_per_1000"), document)
+                    for q, document in zip(new_quotes, documents)
+                ],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO quotation_materials (material, quotation_id) VALUES (?, ?)",
+                [
+                    (layer.get("material"), q["id"])
+                    for q in new_quotes
+                    for layer in q.get("requirements", {}).get("film_structure", {}).get("layers", [])
+                ],
+            )
+            self._index_client_terms(conn, [(q["id"], q["client_name"]) for q in new_quotes])
+            stats = self._get_setting(conn, "stats")
+            _apply_increments(stats, _combined_stats_increments(new_quotes))
+            self._set_setting(conn, "stats", stats)
+            self._update_rollups(conn, new_quotes)
+            return new_quotes
+
+        new_quotes = self._write(insert)
+        self.track_saved_client_names(new_quotes)
+        return new_quotes
+
+    @staticmethod
+    def _index_client_terms(conn: sqlite3.Connection, quotes: List[Tuple[int, str]]):
+        conn.executemany(
+            "INSERT OR IGNORE INTO quotation_client_terms (term, quotation_id) VALUES (?, ?)",
+            [(term, quote_id) for quote_id, client_name in quotes for term in _client_terms(client_name)],
+        )
+
+    def _index_all_client_terms(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM quotation_client_terms")
+        self._index_client_terms(conn, conn.execute("SELECT id, client_name FROM quotations").fetchall())
+
+    def iter_quotations(self, fields: Optional[List[str]] = None, after: Optional[int] = None,
+                        limit: Optional[int] = None, descending: bool = False,
+                        batch_size: int = 500) -> Iterator[dict]:
+        # Keyset pages of batch_size: no cursor stays open between batches
+        comparison, order = ("<", "DESC") if descending else (">", "ASC")
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            where = f"WHERE id {comparison} ?" if after is not None else ""
+            rows = self._query(
+                f"SELECT id, document FROM quotations {where} ORDER BY id {order} LIMIT ?",
+                (after, size) if after is not None else (size,),
+            )
+            for _, document in rows:
+                yield _project_document(json.loads(document), fields)
+            if len(rows) < size:
+                return
+            after = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def pricing_columns(self, requirement_fields: List[str]) -> dict:
+        # json_extract and json_each pick the fields out in SQLite: no document is parsed in Python
+        extracts = ", ".join("json_extract(document, ?)" for _ in requirement_fields)
+        rows = self._query(
+            f"SELECT id, client_name, date, selling_price_per_1000, {extracts} FROM quotations "
+            "WHERE pouch_type IS NOT NULL ORDER BY id",
+            tuple(f"$.requirements.{field}" for field in requirement_fields),
+        )
+        layers = self._query(
+            "SELECT quotations.id, json_extract(layer.value, '$.material'), json_extract(layer.value, '$.thickness_micron') "
+            "FROM quotations, json_each(quotations.document, '$.requirements.film_structure.layers') AS layer "
+            "WHERE quotations.pouch_type IS NOT NULL ORDER BY quotations.id, layer.key"
+        )
+        columns = list(zip(*rows)) or [()] * (4 + len(requirement_fields))
+        layer_columns = list(zip(*layers)) or [(), (), ()]
+        return {
+            "id": list(columns[0]),
+            "client_name": list(columns[1]),
+            "date": list(columns[2]),
+            "selling_price_per_1000": list(columns[3]),
+            "requirements": {field: list(values) for field, values in zip(requirement_fields, columns[4:])},
+            "layer_id": list(layer_columns[0]),
+            "layer_material": list(layer_columns[1]),
+            "layer_thickness": list(layer_columns[2]),
+        }
+
+    def quotations_fingerprint(self) -> tuple:
+        count, max_id = self._query("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM quotations")[0]
+        return (count, max_id)
+
+    def delete_quotation(self, quotation_id: int) -> bool:
+        def delete(conn: sqlite3.Connection) -> Optional[dict]:
+            row = conn.execute("SELECT document FROM quotations WHERE id = ?", (quotation_id,)).fetchone()
+            if row is None:
+                return None
+            deleted = json.loads(row[0])
+            conn.execute("DELETE FROM quotations WHERE id = ?", (quotation_id,))
+            conn.execute("DELETE FROM quotation_materials WHERE quotation_id = ?", (quotation_id,))
+            conn.execute("DELETE FROM quotation_client_terms WHERE quotation_id = ?", (quotation_id,))
+            stats = self._get_setting(conn, "stats")
+            _apply_increments(stats, _stats_increments(deleted, sign=-1))
+            self._set_setting(conn, "stats", stats)
+            self._update_rollups(conn, [deleted], sign=-1)
+            return deleted
+
+        deleted = self._write(delete)
+        if deleted is None:
+            return False
+        self.track_deleted_client_name(deleted)
+        return True
+
+    def iter_search_quotations(self, query: str = "", material: Optional[str] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               min_price: Optional[float] = None, max_price: Optional[float] = None,
+                               batch_size: int = 500) -> Iterator[dict]:
+        # The SQL form of _search_filter: each client word is a range scan of
+        # the quotation_client_terms primary key, the other conditions use indexes
+        conditions, params = [], []
+        if query:
+            alternatives = []
+            terms = _client_terms(query)
+            if terms:
+                alternatives.append(" AND ".join(
+                    ["id IN (SELECT quotation_id FROM quotation_client_terms WHERE term >= ? AND term < ?)"] * len(terms)
+                ))
+                for term in terms:
+                    # Every word starting with term sorts in [term, term with its last character bumped)
+                    params.extend((term, term[:-1] + chr(ord(term[-1]) + 1)))
+            pouch_types = _search_pouch_types(query)
+            if pouch_types:
+                alternatives.append(f"pouch_type IN ({', '.join('?' * len(pouch_types))})")
+                params.extend(pouch_types)
+            conditions.append(f"({' OR '.join(alternatives)})" if alternatives else "0")
+        if material:
+            conditions.append("id IN (SELECT quotation_id FROM quotation_materials WHERE material = ?)")
+            params.append(material)
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append("date < ?")  # date_to is inclusive
+            params.append((date_to + timedelta(days=1)).isoformat())
+        if min_price is not None:
+            conditions.append("selling_price_per_1000 >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("selling_price_per_1000 <= ?")
+            params.append(max_price)
+
+        # Keyset pages in id order, as iter_quotations
+        conditions.append("id > ?")
+        where = f"WHERE {' AND '.join(conditions)}"
+        after = 0
+        while True:
+            rows = self._query(f"SELECT id, document FROM quotations {where} ORDER BY id LIMIT ?",
+                               (*params, after, batch_size))
+            for _, document in rows:
+                yield json.loads(document)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def _client_name_counts(self) -> Dict[str, int]:
+        return dict(self._query("SELECT client_name, COUNT(*) FROM quotations GROUP BY client_name"))
+
+    def rebuild_stats(self) -> dict:
+        def rebuild(conn: sqlite3.Connection):
+            doc = {"_id": STATS_ID}
+            for (document,) in conn.execute("SELECT document FROM quotations"):
+                _accumulate_stats(doc, json.loads(document))
+            self._set_setting(conn, "stats", doc)
+
+        self._write(rebuild)
+        return self.get_stats()
+
+    def _stats_document(self) -> dict:
+        with self._lock:
+            self.connect()
+            return self._get_setting(self._conn, "stats")
+
+    def _recent_quotations(self, count: int) -> List[dict]:
+        rows = self._query("SELECT document FROM quotations ORDER BY date DESC LIMIT ?", (count,))
+        return [json.loads(document) for document, in rows]
+
+    @staticmethod
+    def _update_rollups(conn: sqlite3.Connection, quotes: List[dict], sign: int = 1):
+        buckets = _rollup_increments(quotes, sign)
+        placeholders = ", ".join("?" * len(buckets))
+        rows = conn.execute(f"SELECT id, document FROM rollups WHERE id IN ({placeholders})", tuple(buckets))
+        rollups = {rollup_id: json.loads(document) for rollup_id, document in rows}
+        _apply_rollup_increments(rollups, buckets)
+        conn.executemany(
+            "INSERT OR REPLACE INTO rollups (id, document) VALUES (?, ?)",
+            [(rollup_id, json.dumps(rollups[rollup_id])) for rollup_id in buckets],
+        )
+
+    @staticmethod
+    def _replace_rollups(conn: sqlite3.Connection) -> int:
+        rollups: dict = {}
+        for (document,) in conn.execute("SELECT document FROM quotations"):
+            _apply_rollup_increments(rollups, _rollup_increments([json.loads(document)]))
+        conn.execute("DELETE FROM rollups")
+        conn.executemany(
+            "INSERT INTO rollups (id, document) VALUES (?, ?)",
+            [(rollup_id, json.dumps(doc)) for rollup_id, doc in rollups.items()],
+        )
+        return len(rollups)
+
+    def rebuild_rollups(self) -> int:
+        return self._write(self._replace_rollups)
+
+    def _rollup_documents(self, first_id: str, last_id: str) -> List[dict]:
+        rows = self._query("SELECT document FROM rollups WHERE id BETWEEN ? AND ?", (first_id, last_id))
+        return [json.loads(document) for document, in rows]
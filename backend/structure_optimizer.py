@@ -0,0 +1,156 @@
+from fnmatch import fnmatch
+from itertools import combinations_with_replacement
+from math import comb
+from typing import Dict, List, Optional
+import numpy as np
+from calculations import CostCalculator
+from database import db
+from models import MaterialType, ProductRequirements
+
+# Commercially stocked film gauges (microns) the optimizer picks from
+STANDARD_GAUGES_MICRON = {
+    MaterialType.PET.value: [10, 12, 23],
+    MaterialType.BOPP.value: [15, 18, 20, 25, 30],
+    MaterialType.MET_PET.value: [12],
+    MaterialType.MET_BOPP.value: [18, 20, 25],
+    MaterialType.LDPE.value: [30, 40, 50, 60, 75, 90, 100, 120],
+    MaterialType.CPP.value: [25, 30, 40, 50, 60],
+    MaterialType.AL_FOIL.value: [7, 9, 12],
+    MaterialType.NYLON.value: [12, 15, 25],
+    MaterialType.PAPER.value: [40, 50, 60],
+}
+# Heat-sealable films: one of these is the innermost layer
+SEALANT_MATERIALS = (MaterialType.LDPE.value, MaterialType.CPP.value)
+# Placed between the print film and the sealant when laying out a result
+BARRIER_PATTERNS = (MaterialType.AL_FOIL.value, "MET_*")
+MAX_LAYERS = 4
+MAX_CANDIDATES = 500_000
+
+def _matches(material: str, patterns) -> bool:
+    return any(fnmatch(material, pattern) for pattern in patterns)
+
+def _layer_position(material: str, barrier_patterns) -> int:
+    # Outside-in: print film, barrier, then any further sealant-grade film
+    if material in SEALANT_MATERIALS:
+        return 2
+    return 1 if _matches(material, barrier_patterns) else 0
+
+def _candidate_layers(options: list, sealant_options: List[int], min_layers: int, max_layers: int) -> "np.ndarray":
+    """
+    Option indices of every structure of min_layers..max_layers layers: a
+    sealant innermost plus a multiset of outer layers, padded with -1 to
+    max_layers columns. Cost does not depend on the order of layers, so each
+    multiset is scored once and only the winners are laid out.
+    """
+    count = sum(comb(len(options) + n - 2, n - 1) * len(sealant_options) for n in range(min_layers, max_layers + 1))
+    if count > MAX_CANDIDATES:
+        raise ValueError(f"{count:,} candidate structures exceeds {MAX_CANDIDATES:,}; narrow the materials or layers")
+
+    blocks = []
+    for num_layers in range(min_layers, max_layers + 1):
+        combos = list(combinations_with_replacement(range(len(options)), num_layers - 1))
+        outer = np.array(combos, dtype=int).reshape(len(combos), num_layers - 1)
+        block = np.full((len(outer) * len(sealant_options), max_layers), -1, dtype=int)
+        block[:, :num_layers - 1] = np.tile(outer, (len(sealant_options), 1))
+        block[:, num_layers - 1] = np.repeat(sealant_options, len(outer))
+        blocks.append(block)
+    return np.concatenate(blocks)
+
+def _candidate_columns(job: dict, layers: "np.ndarray", options: list) -> dict:
+    # batch_columns for one copy of the job, widened to one row per candidate
+    placeholder = {"layers": [{"material": options[0][0], "thickness_micron": options[0][1]}]}
+    base = CostCalculator.batch_columns([{**job, "film_structure": placeholder}])
+    n = len(layers)
+
+    materials = list(dict.fromkeys(material for material, _ in options))
+    option_material = np.array([materials.index(material) for material, _ in options] + [-1])
+    option_thickness = np.array([micron for _, micron in options] + [0.0])
+    thickness = option_thickness[layers]  # -1 padding picks the trailing 0 / -1 entries
+    structure = {
+        "size": n,
+        "num_layers": (layers >= 0).sum(axis=1),
+        "thickness": thickness,
+        "material_index": option_material[layers],
+        "materials": materials,
+        "total_thickness": thickness.sum(axis=1),
+    }
+    job_columns = {key: np.repeat(value, n) for key, value in base.items() if key not in structure}
+    return {**job_columns, **structure}
+
+def find_cheapest_structures(job: dict, *, min_layers: int = 2, max_layers: int = 3,
+                             allowed_materials: Optional[List[str]] = None,
+                             min_total_micron: Optional[float] = None, max_total_micron: Optional[float] = None,
+                             barrier_materials: Optional[List[str]] = None,
+                             thickness_options: Optional[Dict[str, List[float]]] = None,
+                             top_n: int = 5) -> dict:
+    """
+    Cheapest film structures for a job (ProductRequirements fields without
+    film_structure) under the given constraints. Candidates are built from
+    the stocked gauges of each allowed material, filtered on total thickness
+    and barrier, and the survivors scored in one evaluate_batch pass at
+    current rates.
+    barrier_materials takes names or patterns such as "MET_*"; at least one
+    layer must match. Returns the top_n with their full cost breakdowns.
+    """
+    if not 1 <= min_layers <= max_layers <= MAX_LAYERS:
+        raise ValueError(f"Layer counts must satisfy 1 <= min_layers <= max_layers <= {MAX_LAYERS}")
+    min_total = min_total_micron or 0
+    max_total = max_total_micron if max_total_micron is not None else float("inf")
+    if min_total > max_total:
+        raise ValueError("min_total_micron must be <= max_total_micron")
+
+    gauges = {**STANDARD_GAUGES_MICRON, **(thickness_options or {})}
+    materials = list(dict.fromkeys(allowed_materials if allowed_materials is not None else gauges))
+    missing = [m for m in materials if not gauges.get(m)]
+    if missing:
+        raise ValueError(f"No thickness options for {', '.join(missing)}; pass them in thickness_options")
+
+    options = sorted(
+        {(material, float(micron)) for material in materials for micron in gauges[material] if micron > 0},
+        key=lambda o: (o[1], o[0]),
+    )
+    sealant_options = [i for i, (material, _) in enumerate(options) if material in SEALANT_MATERIALS]
+    if not sealant_options:
+        raise ValueError(f"At least one sealant material ({', '.join(SEALANT_MATERIALS)}) must be allowed")
+
+    context = db.get_pricing_context()
+    layers = _candidate_layers(options, sealant_options, min_layers, max_layers)
+    columns = _candidate_columns(job, layers, options)
+
+    # Prune on total thickness and barrier before pricing
+    total = columns["total_thickness"]
+    valid = (total >= min_total) & (total <= max_total)
+    if barrier_materials:
+        is_barrier = np.array([_matches(material, barrier_materials) for material, _ in options] + [False])
+        valid &= is_barrier[layers].any(axis=1)
+    keep = np.flatnonzero(valid)
+    if not len(keep):
+        return {"pricing_version": context.version, "candidates_evaluated": 0, "structures": []}
+    columns = CostCalculator.take_batch_rows(columns, keep)
+
+    raw = CostCalculator.evaluate_batch(columns, context)
+    # Cheapest first; ties go to fewer, then thinner, layers
+    order = np.lexsort((columns["total_thickness"], columns["num_layers"], raw["cost_per_1000_pouches"]))
+
+    # Full breakdowns for the winners only, exactly as calculate_cost prices them
+    barrier_patterns = BARRIER_PATTERNS + tuple(barrier_materials or ())
+    reqs = []
+    for row in keep[order[:top_n]].tolist():
+        chosen = [options[i] for i in layers[row].tolist() if i >= 0]
+        outer = sorted(chosen[:-1], key=lambda option: _layer_position(option[0], barrier_patterns))
+        reqs.append(ProductRequirements(**job, film_structure={
+            "layers": [{"material": material, "thickness_micron": micron} for material, micron in outer + chosen[-1:]]
+        }))
+    breakdowns = CostCalculator.calculate_cost_batch(reqs, context=context)
+    return {
+        "pricing_version": context.version,
+        "candidates_evaluated": len(keep),
+        "structures": [
+            {
+                "rank": rank,
+                "film_structure": req.film_structure.model_dump(),
+                "breakdown": breakdown.model_dump(),
+            }
+            for rank, (req, breakdown) in enumerate(zip(reqs, breakdowns), start=1)
+        ],
+    }
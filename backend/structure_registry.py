@@ -0,0 +1,108 @@
+import threading
+from typing import NamedTuple, Optional, Tuple
+from cache import LRUCache
+from models import FilmStructure, PricingContext, MATERIAL_DENSITIES, DEFAULT_DENSITY
+
+class StructureCost(NamedTuple):
+    """Area-independent figures of one film structure + colour count at one set of rates."""
+    total_film_gsm: float
+    total_material_cost_per_sqm: float  # Layers, adhesive and ink
+    ink_cost_per_sqm: float
+    total_thickness: float
+    num_layers: int
+
+def compile_structure(layers: Tuple[Tuple[str, float], ...], number_of_colors: int,
+                      ctx: PricingContext) -> StructureCost:
+    """
+    GSM and cost per sqm of (material, thickness) layers, adhesive between
+    them and ink. Same arithmetic, in the same order, as the per-quote loop
+    it replaces, so cached and uncached prices match to the last bit.
+    """
+    total_film_gsm = 0
+    total_material_cost_per_sqm = 0
+    num_layers = len(layers)
+    rates = ctx.rates
+
+    for i, (material, thickness) in enumerate(layers):
+        # GSM = Thickness * Density
+        layer_gsm = thickness * MATERIAL_DENSITIES.get(material, DEFAULT_DENSITY)
+        total_film_gsm += layer_gsm
+
+        # Cost per sqm = (GSM / 1000) * Rate
+        total_material_cost_per_sqm += (layer_gsm / 1000) * rates.get(material, 100)
+
+        # Adhesive if not last layer
+        if i < num_layers - 1:
+            total_film_gsm += ctx.adhesive_gsm
+            total_material_cost_per_sqm += (ctx.adhesive_gsm / 1000) * ctx.adhesive_rate
+
+    # Ink: N colours at ink_gsm_per_color plus a white base when printed
+    ink_cost_per_sqm = 0
+    if number_of_colors > 0:
+        ink_gsm = number_of_colors * ctx.ink_gsm_per_color
+        ink_gsm += ctx.white_base_gsm
+        total_film_gsm += ink_gsm
+        ink_cost_per_sqm = (ink_gsm / 1000) * ctx.ink_rate
+        total_material_cost_per_sqm += ink_cost_per_sqm
+
+    return StructureCost(
+        total_film_gsm=total_film_gsm,
+        total_material_cost_per_sqm=total_material_cost_per_sqm,
+        ink_cost_per_sqm=ink_cost_per_sqm,
+        total_thickness=sum(thickness for _, thickness in layers),
+        num_layers=num_layers,
+    )
+
+def _rates_fingerprint(ctx: PricingContext) -> tuple:
+    # Everything compile_structure reads from the context. Hypothetical contexts
+    # (rate shocks) share the live version number, so the version alone is not enough.
+    return (
+        ctx.version, tuple(sorted(ctx.rates.items())),
+        ctx.adhesive_gsm, ctx.adhesive_rate, ctx.ink_gsm_per_color, ctx.white_base_gsm, ctx.ink_rate,
+    )
+
+class FilmStructureRegistry:
+    """
+    Compiled StructureCost per unique (rates, layers, colour count). Quotes
+    mostly reuse a handful of laminates, so pricing one is a lookup followed
+    by multiplying the vector by area and quantity. Everything compiled
+    against older rates is dropped when a newer pricing version shows up.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        # Most calls reuse one context object: keep it (and so its id) alive
+        # with its fingerprint to skip rebuilding the fingerprint
+        self._last_context: Optional[PricingContext] = None
+        self._last_fingerprint: tuple = ()
+
+    def _fingerprint(self, ctx: PricingContext) -> tuple:
+        with self._lock:
+            if ctx is self._last_context:
+                return self._last_fingerprint
+            if self._version is None or ctx.version > self._version:
+                # Rates or config changed: nothing compiled is valid any more
+                self.cache.clear()
+                self._version = ctx.version
+            fingerprint = _rates_fingerprint(ctx)
+            self._last_context, self._last_fingerprint = ctx, fingerprint
+            return fingerprint
+
+    def get(self, film_structure: FilmStructure, number_of_colors: int, ctx: PricingContext) -> StructureCost:
+        layers = tuple((layer.material, layer.thickness_micron) for layer in film_structure.layers)
+        key = (self._fingerprint(ctx), layers, number_of_colors)
+        compiled = self.cache.get(key)
+        if compiled is None:
+            compiled = compile_structure(layers, number_of_colors, ctx)
+            self.cache.set(key, compiled)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
+            self._version = None
+            self._last_context, self._last_fingerprint = None, ()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# Modules import each other flat from the backend directory, and the global
+# db is built when database is first imported: keep it off the network
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+@pytest.fixture
+def store(monkeypatch):
+    """A fresh in-memory backend as the global db of the pricing modules."""
+    import calculations
+    import simulation
+    from memory_database import MemoryDatabase
+
+    database = MemoryDatabase()
+    monkeypatch.setattr(calculations, "db", database)
+    monkeypatch.setattr(simulation, "db", database)
+    calculations.CostCalculator.cost_cache.clear()
+    yield database
+    calculations.CostCalculator.cost_cache.clear()
+
+@pytest.fixture(params=["memory", "sqlite", "mongomock"])
+def backend(request, tmp_path, monkeypatch):
+    """Each storage backend in turn, empty; Mongo on mongomock."""
+    import database
+    from memory_database import MemoryDatabase
+    from sqlite_database import SQLiteDatabase
+
+    if request.param == "sqlite":
+        store = SQLiteDatabase(str(tmp_path / "backend.db"))
+    elif request.param == "mongomock":
+        pytest.importorskip("mongomock")
+        from benchmarks.mongomock_client import MongoClient
+        monkeypatch.setattr(database, "MongoClient", MongoClient)
+        store = database.MongoDatabase()
+    else:
+        store = MemoryDatabase()
+    yield store
+    store.close()
@@ -0,0 +1,30 @@
+import json
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.testclient import TestClient
+
+import main
+
+def test_every_file_gets_a_line_when_the_pool_breaks(monkeypatch):
+    async def analyze(contents):
+        if contents == b"broken":
+            raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+        if contents == b"unreadable":
+            return {"error": "cannot identify image file"}
+        return {"colors": [contents.decode()]}
+
+    monkeypatch.setattr(main, "analyze_image_colors_async", analyze)
+    monkeypatch.setattr(main, "MAX_ARTWORK_BYTES", 12)
+    files = [("files", (name, body)) for name, body in [
+        ("a.png", b"red"), ("b.png", b"broken"), ("c.png", b"unreadable"), ("d.png", b"over the limit"), ("e.png", b"blue"),
+    ]]
+    response = TestClient(main.app).post("/api/analyze-image/batch", files=files)
+    assert response.status_code == 200
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert lines[0]["result"] == {"colors": ["red"]}
+    assert "terminated abruptly" in lines[1]["error"]
+    assert lines[2]["error"] == "cannot identify image file"
+    assert "byte limit" in lines[3]["error"]
+    assert lines[4]["result"] == {"colors": ["blue"]}
@@ -0,0 +1,35 @@
+import pytest
+
+from benchmarks.data import requirement_specs
+from calculations import CostCalculator
+from models import ProductRequirements
+
+def specs():
+    specs = requirement_specs(300, seed=11)
+    # Per-job overrides and explicit operational fields the generator leaves out
+    specs[0].update(printing_cost_per_kg_override=0, lamination_cost_per_kg_override=14.5)
+    specs[1].update(printing_cost_per_kg_override=22, labor_cost_per_kg=0, machine_usage_cost_per_kg=11)
+    specs[2].update(number_of_colors=0, quantity_kg=None, quantity_pieces=None)
+    specs[3].update(film_structure={"layers": [{"material": "CUSTOM.FILM", "thickness_micron": 30}]})
+    return specs
+
+@pytest.fixture
+def requirements(store):
+    # Unset operational fields fall back to this config, not the model defaults
+    store.update_config({"wastage_percent": 6.5, "labor_cost_per_kg": 9.25})
+    return [ProductRequirements(**spec) for spec in specs()]
+
+def test_batch_matches_scalar(store, requirements):
+    context = store.get_pricing_context()
+    batch = CostCalculator.calculate_cost_batch(requirements, context=context)
+    assert len(batch) == len(requirements)
+    for req, breakdown in zip(requirements, batch):
+        assert breakdown == CostCalculator.calculate_cost(req, margin_percent=req.margin_percent, context=context)
+
+def test_batch_uses_global_context(store, requirements):
+    batch = CostCalculator.calculate_cost_batch(requirements[:20])
+    assert {breakdown.pricing_version for breakdown in batch} == {store.get_pricing_context().version}
+    assert batch == [CostCalculator.calculate_cost(req, margin_percent=req.margin_percent) for req in requirements[:20]]
+
+def test_empty_batch(store):
+    assert CostCalculator.calculate_cost_batch([]) == []
@@ -0,0 +1,24 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.run import BACKENDS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_benchmarks_run_on_every_backend(backend, tmp_path):
+    if backend == "mongomock" and importlib.util.find_spec("mongomock") is None:
+        pytest.skip("mongomock is not installed (benchmarks/requirements.txt)")
+    # A subprocess: the backend must be chosen before database is first imported
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--backend", backend, "--suites", "pricing,database",
+         "--sizes", "100", "--batch-size", "10", "--baseline", str(tmp_path / "baseline.json")],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert f"seeded 100 quotations ({backend})" in result.stderr
+    assert "stats.get.100" in result.stdout
@@ -0,0 +1,46 @@
+from calculations import CostCalculator
+from models import ProductRequirements
+
+SPEC = {
+    "pouch_type": "CENTER_SEAL",
+    "width_mm": 150,
+    "height_mm": 200,
+    "quantity_pieces": 100_000,
+    "film_structure": {"layers": [
+        {"material": "BOPP", "thickness_micron": 20},
+        {"material": "CPP", "thickness_micron": 30},
+    ]},
+    "number_of_colors": 5,
+}
+
+def test_repeat_quote_is_cached(store):
+    req = ProductRequirements(**SPEC)
+    first = CostCalculator.calculate_cost(req)
+    hits = CostCalculator.cost_cache.stats()["hits"]
+    assert CostCalculator.calculate_cost(req) == first
+    assert CostCalculator.cost_cache.stats()["hits"] == hits + 1
+
+def test_rate_update_bumps_version_and_invalidates(store):
+    req = ProductRequirements(**SPEC)
+    before = CostCalculator.calculate_cost(req)
+    assert before.pricing_version == 0
+
+    store.update_rates({"BOPP": 200})
+    after = CostCalculator.calculate_cost(req)
+    assert after.pricing_version == 1
+    assert after.material_cost_per_kg > before.material_cost_per_kg
+    # Everything cached under version 0 was dropped
+    assert len(CostCalculator.cost_cache) == 1
+
+def test_config_update_bumps_version(store):
+    req = ProductRequirements(**SPEC)
+    before = CostCalculator.calculate_cost(req)
+    store.update_config({"wastage_percent": 9})
+    after = CostCalculator.calculate_cost(req)
+    assert after.pricing_version == before.pricing_version + 1
+    assert after.wastage_cost_per_kg > before.wastage_cost_per_kg
+
+def test_returned_breakdowns_are_copies(store):
+    req = ProductRequirements(**SPEC)
+    CostCalculator.calculate_cost(req).selling_price_per_1000 = 0
+    assert CostCalculator.calculate_cost(req).selling_price_per_1000 > 0
@@ -0,0 +1,55 @@
+import pytest
+
+from benchmarks.data import requirement_specs
+from calculations import CostCalculator
+from memory_database import MemoryDatabase
+from models import ProductRequirements
+
+def quotations(count: int):
+    context = MemoryDatabase().get_pricing_context()
+    for i, spec in enumerate(requirement_specs(count, seed=5)):
+        req = ProductRequirements(**spec)
+        breakdown = CostCalculator.calculate_cost(req, margin_percent=req.margin_percent, context=context)
+        yield req.model_dump(mode="json"), breakdown.model_dump(), f"Client {i % 3}"
+
+def test_empty_store_reports_zeros(backend):
+    stats = backend.get_stats()
+    assert stats["total_quotations"] == 0
+    assert stats["popular_material"] == "N/A"
+    assert stats["recent_quotations"] == []
+
+def test_saves_and_deletes_match_a_rebuild(backend):
+    saved = backend.save_quotations(list(quotations(20)))
+    saved.append(backend.save_quotation(*next(quotations(1))))
+    for quote in saved[::4]:
+        assert backend.delete_quotation(quote["id"])
+    kept = [quote for quote in saved if quote not in saved[::4]]
+
+    incremental = backend.get_stats()
+    assert incremental["total_quotations"] == len(kept)
+    assert incremental["total_revenue"] == pytest.approx(
+        sum(quote["breakdown"]["selling_price_per_1000"] for quote in kept), abs=0.01
+    )
+    layers = sum(len(quote["requirements"]["film_structure"]["layers"]) for quote in kept)
+    assert sum(incremental["material_usage"].values()) == layers
+    # The reported figures are rounded, so incremental sums match a full recount exactly
+    assert incremental == backend.rebuild_stats()
+
+def test_deleted_values_leave_the_histograms(backend):
+    requirements = {"pouch_type": "CENTER_SEAL", "film_structure": {"layers": [{"material": "PAPER.80gsm"}]}}
+    breakdown = {"selling_price_per_1000": 100, "margin_percent": 20, "total_cost_per_kg": 150}
+    only = backend.save_quotation(requirements, breakdown, "Once")
+    backend.save_quotations(list(quotations(2)))
+    # Material names may hold characters Mongo field names can't
+    assert backend.get_stats()["material_usage"]["PAPER.80gsm"] == 1
+
+    backend.delete_quotation(only["id"])
+    stats = backend.get_stats()
+    assert "PAPER.80gsm" not in stats["material_usage"]
+    assert stats["total_quotations"] == 2
+
+def test_recent_quotations_are_the_newest(backend):
+    saved = backend.save_quotations(list(quotations(8)))
+    recent = backend.get_stats()["recent_quotations"]
+    newest = sorted(saved, key=lambda quote: quote["date"], reverse=True)[:5]
+    assert [quote["date"] for quote in recent] == [quote["date"] for quote in newest]
@@ -0,0 +1,123 @@
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+from fastapi.testclient import TestClient
+
+import export
+import main
+from async_database import ThreadedAsyncDatabase
+from export import EXPORT_COLUMNS, export_chunks
+
+NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+def quote(quote_id: int, client_name: str = "Acme Foods") -> dict:
+    return {
+        "id": quote_id,
+        "date": "2025-06-01T09:30:00",
+        "client_name": client_name,
+        "requirements": {
+            "pouch_type": "CENTER_SEAL", "width_mm": 120.0, "height_mm": 180.0, "number_of_colors": 4,
+            "film_structure": {"layers": [
+                {"material": "PET", "thickness_micron": 12.0},
+                {"material": "LDPE", "thickness_micron": 50.0},
+            ]},
+        },
+        "breakdown": {"selling_price_per_1000": 812.5, "margin_percent": 20.0},
+    }
+
+def column(name: str) -> int:
+    return EXPORT_COLUMNS.index(name)
+
+def read_csv(data: bytes) -> list:
+    assert data.startswith(b"\xef\xbb\xbf")
+    return list(csv.reader(io.StringIO(data[3:].decode("utf-8"))))
+
+def sheet_rows(workbook: zipfile.ZipFile, number: int = 1) -> list:
+    sheet = ET.fromstring(workbook.read(f"xl/worksheets/sheet{number}.xml"))
+    return sheet.findall("s:sheetData/s:row", NS)
+
+def cell_text(cell) -> str:
+    return "".join(cell.itertext())
+
+def test_csv_has_the_header_and_one_row_per_quotation():
+    rows = read_csv(b"".join(export_chunks([quote(1), quote(2)], "csv")))
+    assert rows[0] == EXPORT_COLUMNS
+    assert [row[column("id")] for row in rows[1:]] == ["1", "2"]
+    assert rows[1][column("requirements.film_structure")] == "PET 12 / LDPE 50"
+    assert rows[1][column("requirements.layer_count")] == "2"
+    assert rows[1][column("breakdown.selling_price_per_1000")] == "812.5"
+    # Fields a quotation doesn't have are left empty, not dropped
+    assert rows[1][column("breakdown.total_cost_per_kg")] == ""
+    assert all(len(row) == len(EXPORT_COLUMNS) for row in rows)
+
+@pytest.mark.parametrize("name", ["=HYPERLINK(\"http://x\")", "+1", "-2+3", "@SUM(A1)"])
+def test_csv_defuses_formula_cells(name):
+    rows = read_csv(b"".join(export_chunks([quote(1, name)], "csv")))
+    assert rows[1][column("client_name")] == "'" + name
+
+def test_xlsx_is_a_readable_workbook():
+    data = b"".join(export_chunks([quote(1), quote(2, "=cmd|' /C calc'!A0 \x07")], "xlsx"))
+    with zipfile.ZipFile(io.BytesIO(data)) as workbook:
+        assert workbook.testzip() is None
+        assert {"[Content_Types].xml", "xl/workbook.xml", "xl/styles.xml"} <= set(workbook.namelist())
+        header, first, second = sheet_rows(workbook)
+
+    assert [cell_text(cell) for cell in header] == EXPORT_COLUMNS
+    price = first[column("breakdown.selling_price_per_1000")]
+    assert price.get("t") is None and cell_text(price) == "812.5"
+    # Dates are serial numbers in a date style, so Excel can sort and filter them
+    date_cell = first[column("date")]
+    assert date_cell.get("s") == "2" and float(cell_text(date_cell)) == pytest.approx(45809.3958, abs=1e-4)
+    # Text is only ever an inline string: never a formula, and stripped of characters XML can't hold
+    name = second[column("client_name")]
+    assert name.get("t") == "inlineStr" and name.find("s:f", NS) is None
+    assert cell_text(name) == "=cmd|' /C calc'!A0 "
+
+def test_xlsx_rolls_over_to_a_new_sheet(monkeypatch):
+    monkeypatch.setattr(export, "XLSX_MAX_SHEET_ROWS", 2)
+    data = b"".join(export_chunks([quote(i) for i in range(1, 6)], "xlsx"))
+    with zipfile.ZipFile(io.BytesIO(data)) as workbook:
+        sheets = ET.fromstring(workbook.read("xl/workbook.xml")).findall("s:sheets/s:sheet", NS)
+        assert [sheet.get("name") for sheet in sheets] == ["Quotations", "Quotations 2", "Quotations 3"]
+        ids = []
+        for number in (1, 2, 3):
+            header, *rows = sheet_rows(workbook, number)
+            assert cell_text(header[0]) == "id"
+            ids += [cell_text(row[column("id")]) for row in rows]
+    assert ids == ["1", "2", "3", "4", "5"]
+
+def test_rows_are_encoded_as_they_arrive(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 2)
+    pulled = []
+
+    def quotes():
+        for i in range(1, 6):
+            pulled.append(i)
+            yield quote(i)
+
+    chunks = export_chunks(quotes(), "csv")
+    next(chunks)
+    # The header goes out before the first quotation is read
+    assert pulled == []
+    assert len(read_csv(b"\xef\xbb\xbf" + next(chunks))) == 2
+    assert pulled == [1, 2]
+    assert len(list(chunks)) == 2
+
+def test_endpoint_streams_filtered_exports(store, monkeypatch):
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(store))
+    for i, name in enumerate(["Acme Foods", "Globex", "Acme Pharma"]):
+        req = quote(i + 1, name)
+        store.save_quotation(req["requirements"], req["breakdown"], name)
+    client = TestClient(main.app)
+
+    response = client.get("/api/quotations/export", params={"format": "csv", "q": "acme"})
+    assert response.headers["content-disposition"].endswith('.csv"')
+    assert [row[column("client_name")] for row in read_csv(response.content)[1:]] == ["Acme Foods", "Acme Pharma"]
+
+    response = client.get("/api/quotations/export", params={"format": "xlsx"})
+    assert response.headers["content-type"] == export.XLSX_MEDIA_TYPE
+    with zipfile.ZipFile(io.BytesIO(response.content)) as workbook:
+        assert len(sheet_rows(workbook)) == 4
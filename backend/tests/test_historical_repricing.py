@@ -0,0 +1,77 @@
+import pytest
+
+from calculations import CostCalculator
+from models import ProductRequirements
+from simulation import PortfolioSimulator
+
+SPECS = [
+    {
+        "pouch_type": "STAND_UP_ZIPPER", "width_mm": 180, "height_mm": 260, "gusset_mm": 50,
+        "quantity_pieces": 40_000, "number_of_colors": 7, "margin_percent": 22,
+        "film_structure": {"layers": [
+            {"material": "PET", "thickness_micron": 12},
+            {"material": "AL_FOIL", "thickness_micron": 9},
+            {"material": "LDPE", "thickness_micron": 90},
+        ]},
+    },
+    {
+        "pouch_type": "CENTER_SEAL", "width_mm": 120, "height_mm": 180,
+        "quantity_kg": 800, "number_of_colors": 4, "margin_percent": 15,
+        "film_structure": {"layers": [
+            {"material": "BOPP", "thickness_micron": 20},
+            {"material": "MET_BOPP", "thickness_micron": 18},
+        ]},
+    },
+]
+
+def save_at_current_rates(store, spec: dict, client_name: str) -> dict:
+    req = ProductRequirements(**spec)
+    breakdown = CostCalculator.calculate_cost(req, margin_percent=req.margin_percent)
+    return store.save_quotation(req.model_dump(mode="json"), breakdown.model_dump(), client_name)
+
+def cost_per_1000(spec: dict, context) -> float:
+    req = ProductRequirements(**spec)
+    return CostCalculator.calculate_cost(req, margin_percent=req.margin_percent, context=context).cost_per_1000_pouches
+
+def test_quotes_repriced_at_the_rates_of_their_date(store):
+    old = [save_at_current_rates(store, spec, "Before") for spec in SPECS]
+    context_then = store.get_pricing_context()
+    store.update_rates({"AL_FOIL": 520, "BOPP": 150})
+    new = save_at_current_rates(store, SPECS[0], "After")
+    context_now = store.get_pricing_context()
+
+    result = PortfolioSimulator().reprice_at_historical_rates()
+    assert result["pricing_version"] == context_now.version
+    assert result["summary"]["quotations"] == 3
+    assert result["summary"]["pricing_versions_used"] == 2
+    items = {item["id"]: item for item in result["items"]}
+
+    for quote, spec in zip(old, SPECS):
+        item = items[quote["id"]]
+        assert item["pricing_version_then"] == context_then.version
+        assert item["cost_per_1000_then"] == cost_per_1000(spec, context_then)
+        assert item["cost_per_1000_now"] == cost_per_1000(spec, context_now)
+        # Rates only went up, so the margin of a fixed quoted price drifts down
+        assert item["margin_drift_points"] > 0
+        assert item["margin_percent_then"] == pytest.approx(spec["margin_percent"], abs=0.05)
+
+    item = items[new["id"]]
+    assert item["pricing_version_then"] == context_now.version
+    assert item["cost_per_1000_then"] == item["cost_per_1000_now"]
+    assert item["margin_drift_points"] == 0
+    # Worst drift first
+    drifts = [item["margin_drift_points"] for item in result["items"]]
+    assert drifts == sorted(drifts, reverse=True)
+
+def test_filters_by_id(store):
+    quotes = [save_at_current_rates(store, spec, "Client") for spec in SPECS]
+    store.update_rates({"PET": 140})
+    result = PortfolioSimulator().reprice_at_historical_rates(quotation_ids=[quotes[1]["id"]])
+    assert [item["id"] for item in result["items"]] == [quotes[1]["id"]]
+    # SPECS[1] has no PET: nothing drifts
+    assert result["items"][0]["margin_drift_points"] == 0
+
+def test_empty_portfolio(store):
+    result = PortfolioSimulator().reprice_at_historical_rates()
+    assert result["summary"]["quotations"] == 0
+    assert result["items"] == []
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from database import MongoDatabase
+
+class Quotations:
+    """quotations collection whose first create_index fails with `code`."""
+    def __init__(self, code: int):
+        self.code = code
+        self.calls = []
+
+    def create_index(self, keys, **options):
+        self.calls.append("create_index")
+        if self.calls.count("create_index") == 1:
+            raise OperationFailure("create_index failed", code=self.code)
+
+    def drop_index(self, name):
+        self.calls.append(f"drop_index {name}")
+
+def ensure_index(code: int) -> Quotations:
+    quotations = Quotations(code)
+    MongoDatabase()._ensure_unique_id_index(SimpleNamespace(quotations=quotations))
+    return quotations
+
+@pytest.mark.parametrize("code", [85, 86])
+def test_conflicting_id_index_is_upgraded(code):
+    assert ensure_index(code).calls == ["create_index", "drop_index id_1", "create_index"]
+
+def test_duplicate_ids_leave_the_index_alone(caplog):
+    assert ensure_index(11000).calls == ["create_index"]
+    assert "not unique" in caplog.text
+
+def test_other_failures_are_raised():
+    with pytest.raises(OperationFailure):
+        ensure_index(13)  # Unauthorized
@@ -0,0 +1,80 @@
+import numpy as np
+
+import simulation
+from calculations import CostCalculator
+from models import ProductRequirements
+
+SPECS = [
+    {
+        "pouch_type": "STAND_UP_ZIPPER", "width_mm": 180, "height_mm": 260, "gusset_mm": 50,
+        "quantity_pieces": 40_000, "number_of_colors": 7, "margin_percent": 22,
+        "film_structure": {"layers": [
+            {"material": "PET", "thickness_micron": 12},
+            {"material": "AL_FOIL", "thickness_micron": 9},
+            {"material": "LDPE", "thickness_micron": 90},
+        ]},
+    },
+    {
+        "pouch_type": "CENTER_SEAL", "width_mm": 120, "height_mm": 180,
+        "quantity_kg": 800, "number_of_colors": 4, "cylinder_cost_per_unit": 6500,
+        "film_structure": {"layers": [{"material": "BOPP", "thickness_micron": 20}]},
+    },
+    {
+        "pouch_type": "THREE_SIDE_SEAL", "width_mm": 90, "height_mm": 120,
+        "quantity_pieces": 250_000, "number_of_colors": 2, "printing_cost_per_kg_override": 35,
+        "film_structure": {"layers": [
+            {"material": "BOPP", "thickness_micron": 18},
+            {"material": "MET_BOPP", "thickness_micron": 18},
+        ]},
+    },
+]
+
+def seed(store):
+    requirements = [ProductRequirements(**spec) for spec in SPECS]
+    breakdowns = CostCalculator.calculate_cost_batch(requirements)
+    store.save_quotations([
+        (req.model_dump(mode="json"), bd.model_dump(), f"Client {i}")
+        for i, (req, bd) in enumerate(zip(requirements, breakdowns))
+    ])
+    return requirements
+
+def test_stored_columns_price_like_the_requirement_models(backend):
+    requirements = seed(backend)
+    # A legacy quote without a pouch type is not priceable and is left out
+    backend.save_quotation({"width_mm": 100}, {"selling_price_per_1000": 10}, "Legacy")
+
+    stored = backend.pricing_columns(CostCalculator.BATCH_FIELDS)
+    ids = np.array(stored["id"], dtype=np.int64)
+    columns = CostCalculator.batch_columns_from_lists(
+        stored["requirements"],
+        layer_row=np.searchsorted(ids, np.array(stored["layer_id"], dtype=np.int64)),
+        layer_material=stored["layer_material"],
+        layer_thickness=stored["layer_thickness"],
+    )
+
+    assert stored["client_name"] == ["Client 0", "Client 1", "Client 2"]
+    context = backend.get_pricing_context()
+    from_store = CostCalculator.evaluate_batch(columns, context)
+    from_models = CostCalculator.evaluate_batch(
+        CostCalculator.batch_columns([req.model_dump(exclude_unset=True) for req in requirements]), context
+    )
+    for field in ("total_cost_per_kg", "cost_per_1000_pouches", "selling_price", "cylinder_cost_total"):
+        np.testing.assert_allclose(from_store[field], from_models[field])
+
+def test_simulation_loads_the_portfolio_from_any_backend(backend, monkeypatch):
+    requirements = seed(backend)
+    monkeypatch.setattr(simulation, "db", backend)
+
+    result = simulation.PortfolioSimulator().simulate({"AL_FOIL": 10})
+
+    context = backend.get_pricing_context()
+    expected = {
+        i + 1: CostCalculator.calculate_cost(req, context=context).cost_per_1000_pouches
+        for i, req in enumerate(requirements)
+    }
+    assert result["summary"]["quotations"] == len(SPECS)
+    assert {item["id"]: item["cost_per_1000_before"] for item in result["items"]} == {
+        quote_id: round(cost, 2) for quote_id, cost in expected.items()
+    }
+    # Only the foil laminate costs more
+    assert [item["id"] for item in result["items"] if item["cost_delta_per_1000"] > 0] == [1]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from calculations import LADDER_RUNG_FIELDS, STAGE_TIMERS, CostCalculator
+from database import db
+from models import ProductRequirements
+
+SPEC = {
+    "pouch_type": "STAND_UP_POUCH",
+    "width_mm": 160,
+    "height_mm": 230,
+    "gusset_mm": 40,
+    "film_structure": {"layers": [
+        {"material": "PET", "thickness_micron": 12},
+        {"material": "AL_FOIL", "thickness_micron": 9},
+        {"material": "LDPE", "thickness_micron": 80},
+    ]},
+    "number_of_colors": 6,
+    "cylinder_cost_per_unit": 4200,
+}
+QUANTITIES = [1, 7, 5_000, 12_345, 100_000, 2_500_000]
+
+def samples(stage: str) -> int:
+    series = STAGE_TIMERS[stage]
+    return series.count + len(series.pending)
+
+@pytest.mark.parametrize("margin", [0, 17.5, 20])
+def test_rungs_match_calculate_cost(margin):
+    req = ProductRequirements(**SPEC)
+    context = db.get_pricing_context()
+    ladder = CostCalculator.calculate_price_ladder(req, QUANTITIES, margin_percent=margin, context=context)
+    assert ladder["rungs"]["quantity_pieces"] == QUANTITIES
+    for i, quantity in enumerate(QUANTITIES):
+        single = CostCalculator.calculate_cost(
+            req.model_copy(update={"quantity_pieces": quantity}), margin_percent=margin, context=context
+        ).model_dump()
+        assert {field: ladder["rungs"][field][i] for field in LADDER_RUNG_FIELDS} == {
+            field: single[field] for field in LADDER_RUNG_FIELDS
+        }
+        assert ladder["breakdown"] == {field: value for field, value in single.items() if field not in LADDER_RUNG_FIELDS}
+
+def test_stage_metrics_recorded_once_per_ladder():
+    req = ProductRequirements(**SPEC)
+    before = {stage: samples(stage) for stage in STAGE_TIMERS}
+    CostCalculator.calculate_price_ladder(req, list(range(1_000, 101_000, 1_000)), context=db.get_pricing_context())
+    assert {stage: samples(stage) - before[stage] for stage in STAGE_TIMERS} == dict.fromkeys(STAGE_TIMERS, 1)
+
+def test_ladder_endpoint():
+    client = TestClient(main.app)
+    response = client.post("/api/calculate-cost/ladder", json={
+        "requirements": SPEC, "min_quantity": 10_000, "max_quantity": 50_000, "step": 10_000,
+    })
+    assert response.status_code == 200
+    rungs = response.json()["rungs"]
+    assert rungs["quantity_pieces"] == [10_000, 20_000, 30_000, 40_000, 50_000]
+    # Cylinders spread over more pouches: the price per 1000 falls with the quantity
+    assert rungs["selling_price_per_1000"] == sorted(rungs["selling_price_per_1000"], reverse=True)
@@ -0,0 +1,96 @@
+import pytest
+
+import database
+from calculations import CostCalculator
+from models import ProductRequirements
+from sqlite_database import SQLiteDatabase
+
+SPEC = {
+    "pouch_type": "THREE_SIDE_SEAL",
+    "width_mm": 150,
+    "height_mm": 220,
+    "quantity_pieces": 50_000,
+    "film_structure": {"layers": [
+        {"material": "PET", "thickness_micron": 12},
+        {"material": "LDPE", "thickness_micron": 50},
+    ]},
+    "number_of_colors": 4,
+}
+
+@pytest.fixture
+def shared_file(tmp_path):
+    """Two workers on one SQLite file."""
+    path = str(tmp_path / "pricing.db")
+    first, second = SQLiteDatabase(path), SQLiteDatabase(path)
+    yield first, second
+    first.close()
+    second.close()
+
+def test_other_instance_prices_at_updated_rate(shared_file, monkeypatch):
+    first, second = shared_file
+    req = ProductRequirements(**SPEC)
+    before = CostCalculator.calculate_cost(req, context=second.get_pricing_context())
+
+    first.update_rates({"PET": 220})
+    # Within the revalidation window the snapshot is reused as is
+    assert second.get_pricing_context().rates["PET"] == 110
+
+    monkeypatch.setattr(database, "PRICING_REVALIDATE_SECONDS", 0)
+    context = second.get_pricing_context()
+    assert context.version == first.get_pricing_context().version
+    assert context.rates["PET"] == 220
+    after = CostCalculator.calculate_cost(req, context=context)
+    assert after.material_cost_per_kg > before.material_cost_per_kg
+    assert after == CostCalculator.calculate_cost(req, context=first.get_pricing_context())
+
+def test_unchanged_version_keeps_snapshot(shared_file, monkeypatch):
+    first, second = shared_file
+    monkeypatch.setattr(database, "PRICING_REVALIDATE_SECONDS", 0)
+    context = second.get_pricing_context()
+    assert second.get_pricing_context() is context
+
+def test_updates_merge_into_stored_state(shared_file):
+    first, second = shared_file
+    second.get_pricing_context()
+    first.update_rates({"PET": 220})
+    # second's snapshot is stale, but its update must not undo first's
+    second.update_rates({"BOPP": 150})
+    rates = first.refresh_pricing_context().rates
+    assert rates["PET"] == 220 and rates["BOPP"] == 150
+
+def test_history_and_current_pricing_agree(shared_file):
+    first, second = shared_file
+    second.get_pricing_context()
+    first.update_rates({"PET": 220})
+    # Still inside second's revalidation window: catching up the log moves the snapshot on too
+    history = second.pricing_history()
+    assert history.latest().version == first.get_pricing_context().version
+    assert second.get_pricing_context().version == history.latest().version
+    assert second.get_pricing_context().rates["PET"] == 220
+
+def test_snapshot_maps_are_read_only(store):
+    context = store.get_pricing_context()
+    with pytest.raises(TypeError):
+        context.rates["PET"] = 0
+    with pytest.raises(TypeError):
+        CostCalculator().MATERIAL_RATES_INR_PER_KG["PET"] = 0
+    with pytest.raises(TypeError):
+        context.config["wastage_percent"] = 0
+    # Copies handed out by the store are the caller's own
+    rates = store.get_rates()
+    rates["PET"] = 0
+    assert store.get_pricing_context().rates["PET"] > 0
+    assert context.model_dump()["rates"] == dict(context.rates)
+
+def test_history_read_elsewhere_advances_the_snapshot(shared_file):
+    # How AsyncDatabase catches up: it reads the log itself and hands the entries over
+    first, second = shared_file
+    second.get_pricing_context()
+    first.update_rates({"PET": 220})
+    last_version = second.pricing_history_snapshot().last_version
+    entries = [entry for entry in first.get_pricing_history() if entry["version"] > last_version]
+
+    history = second.extend_pricing_history(entries)
+    assert history is second.pricing_history_snapshot()
+    assert second.pricing_context_snapshot().version == first.get_pricing_context().version
+    assert second.get_pricing_context().rates["PET"] == 220
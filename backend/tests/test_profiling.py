@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import profiling
+from async_database import ThreadedAsyncDatabase
+
+TOKEN = "test-admin-token"
+PROFILED = {"X-Profile": "1", "X-Admin-Token": TOKEN}
+SPEC = {
+    "pouch_type": "THREE_SIDE_SEAL",
+    "width_mm": 100,
+    "height_mm": 150,
+    "quantity_pieces": 20_000,
+    "film_structure": {"layers": [
+        {"material": "PET", "thickness_micron": 12},
+        {"material": "LDPE", "thickness_micron": 60},
+    ]},
+}
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(store))
+    return TestClient(main.app)
+
+def test_profile_needs_the_admin_token(client):
+    response = client.post("/api/calculate-cost", json=SPEC, headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+    assert "x-profile-id" not in client.post("/api/calculate-cost", json=SPEC).headers
+
+def test_profiled_repeat_quote_times_every_stage(client):
+    unprofiled = client.post("/api/calculate-cost", json=SPEC).json()
+    # The same quote again is a cache hit, unless it is profiled
+    response = client.post("/api/calculate-cost", json=SPEC, headers=PROFILED)
+    assert response.status_code == 200
+    assert response.json() == unprofiled
+
+    report = client.get(f"/api/profiles/{response.headers['x-profile-id']}", headers=PROFILED).json()
+    stages = {f"pricing.{stage}" for stage in ("dimensions", "structure", "conversion", "amortization", "breakdown")}
+    assert stages <= set(report["stages_ms"])
+    assert "pricing-amortization;dur=" in response.headers["server-timing"]
+    assert report["note"] is None
+
+def test_profiled_dashboard_stats_says_what_it_covers(client):
+    response = client.get("/api/dashboard/stats", headers=PROFILED)
+    assert response.status_code == 200
+    report = client.get(f"/api/profiles/{response.headers['x-profile-id']}", headers=PROFILED).json()
+    assert "synchronous storage call" in report["note"]
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from async_database import ThreadedAsyncDatabase
+
+def seed(store, count: int):
+    return store.save_quotations([
+        ({"pouch_type": "CENTER_SEAL", "width_mm": 100 + i}, {"selling_price_per_1000": 10 * i}, f"Client {i}")
+        for i in range(count)
+    ])
+
+def walk(store, limit: int, **kwargs):
+    pages, after = [], None
+    while True:
+        page = store.get_quotations_page(limit, after=after, **kwargs)
+        pages.append(page)
+        after = page["next_cursor"]
+        if after is None:
+            return pages
+
+def test_cursor_walks_every_quotation_once(backend):
+    ids = [quote["id"] for quote in seed(backend, 7)]
+
+    pages = walk(backend, 3)
+    assert [len(page["items"]) for page in pages] == [3, 3, 1]
+    assert [quote["id"] for page in pages for quote in page["items"]] == ids
+
+    pages = walk(backend, 3, descending=True)
+    assert [quote["id"] for page in pages for quote in page["items"]] == ids[::-1]
+
+def test_exact_last_page_has_no_cursor(backend):
+    seed(backend, 4)
+    pages = walk(backend, 2)
+    assert len(pages) == 2 and pages[-1]["next_cursor"] is None
+
+def test_cursor_survives_deletes_between_pages(backend):
+    ids = [quote["id"] for quote in seed(backend, 6)]
+    first = backend.get_quotations_page(2)
+    backend.delete_quotation(ids[2])
+    second = backend.get_quotations_page(2, after=first["next_cursor"])
+    # Keyset paging: nothing is skipped or repeated when rows before the cursor move
+    assert [quote["id"] for quote in second["items"]] == ids[3:5]
+
+def test_projection_keeps_only_the_requested_fields(backend):
+    seed(backend, 3)
+    page = backend.get_quotations_page(2, fields=["client_name", "breakdown.selling_price_per_1000"])
+    # The id is kept for the cursor even when not asked for
+    assert page["items"][1] == {"id": page["next_cursor"], "client_name": "Client 1",
+                                "breakdown": {"selling_price_per_1000": 10}}
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(store))
+    return TestClient(main.app)
+
+def test_ndjson_streams_one_document_per_line(client, store):
+    seed(store, 5)
+    response = client.get("/api/quotations", params={"format": "ndjson", "after": 2, "fields": "id,client_name"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": i, "client_name": f"Client {i - 1}"} for i in (3, 4, 5)]
+
+def test_unpaginated_listing_is_unchanged(client, store):
+    saved = seed(store, 3)
+    response = client.get("/api/quotations")
+    assert [quote["id"] for quote in response.json()] == [quote["id"] for quote in saved]
+    assert response.json()[0]["requirements"]["width_mm"] == 100
+
+def test_page_size_is_bounded(client):
+    assert client.get("/api/quotations", params={"limit": 1001}).status_code == 422
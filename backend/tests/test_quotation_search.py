@@ -0,0 +1,98 @@
+import os
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from database import _create_search_indexes, _search_filter, _with_client_terms
+
+QUOTES = [
+    ("Acme Foods Pvt Ltd", "CENTER_SEAL", "PET", 900.0),
+    ("Foodies Co", "STAND_UP_POUCH", "BOPP", 1500.0),
+    ("ACME-Snacks", "THREE_SIDE_SEAL", "AL_FOIL", 2500.0),
+    ("Zeta Acmeware", "CENTER_SEAL", "PET", 4000.0),
+    ("Öko Bäckerei", "SIDE_GUSSET", "PAPER", 700.0),
+]
+
+def quotation(client_name: str, pouch_type: str, material: str, price: float):
+    requirements = {"pouch_type": pouch_type, "film_structure": {"layers": [{"material": material, "thickness_micron": 20}]}}
+    return requirements, {"selling_price_per_1000": price}, client_name
+
+@pytest.fixture
+def saved(backend):
+    backend.save_quotations([quotation(*quote) for quote in QUOTES])
+    return backend
+
+def clients(store, query: str = "", **filters) -> list:
+    return [quote["client_name"] for quote in store.search_quotations(query, **filters)]
+
+@pytest.mark.parametrize("query, expected", [
+    # Each query word starts a word of the client name, in any case
+    ("acme", ["Acme Foods Pvt Ltd", "ACME-Snacks", "Zeta Acmeware"]),
+    ("FOO", ["Acme Foods Pvt Ltd", "Foodies Co"]),
+    ("acme fo", ["Acme Foods Pvt Ltd"]),
+    ("snacks acme", ["ACME-Snacks"]),
+    ("bäck", ["Öko Bäckerei"]),
+    # Not a substring match
+    ("cme", []),
+    # Pouch types still match on their own
+    ("stand_up", ["Foodies Co"]),
+    ("...", []),
+])
+def test_search_matches_word_prefixes(saved, query, expected):
+    assert clients(saved, query) == expected
+
+def test_search_filters_and_delete(saved):
+    assert clients(saved, "acme", material="PET") == ["Acme Foods Pvt Ltd", "Zeta Acmeware"]
+    assert clients(saved, "acme", min_price=1000, max_price=3000) == ["ACME-Snacks"]
+    tomorrow = date.today() + timedelta(days=1)
+    assert clients(saved, "acme", date_from=tomorrow) == []
+    assert clients(saved, "acme", date_to=date.today()) == clients(saved, "acme")
+
+    first = saved.search_quotations("zeta")[0]
+    assert set(first) == {"id", "date", "client_name", "requirements", "breakdown"}
+    assert saved.delete_quotation(first["id"])
+    assert clients(saved, "acme") == ["Acme Foods Pvt Ltd", "ACME-Snacks"]
+
+def test_sqlite_search_uses_indexes(tmp_path):
+    from sqlite_database import SQLiteDatabase
+
+    store = SQLiteDatabase(str(tmp_path / "search.db"))
+    store.save_quotations([quotation(*quote) for quote in QUOTES])
+    statements = []
+    store._conn.set_trace_callback(statements.append)
+    assert clients(store, "acme fo", material="PET") == ["Acme Foods Pvt Ltd"]
+    select = next(sql for sql in statements if sql.startswith("SELECT id, document FROM quotations"))
+    plan = [row[3] for row in store._query("EXPLAIN QUERY PLAN " + select)]
+    store.close()
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    assert "SEARCH quotation_client_terms USING PRIMARY KEY (term>? AND term<?)" in plan
+
+@pytest.mark.skipif(not os.environ.get("MONGODB_TEST_URI"), reason="set MONGODB_TEST_URI to run against MongoDB")
+def test_mongo_search_uses_client_terms_index():
+    from pymongo import MongoClient
+
+    client = MongoClient(os.environ["MONGODB_TEST_URI"])
+    database = client[f"search_plan_{uuid.uuid4().hex[:8]}"]
+    try:
+        _create_search_indexes(database.quotations)
+        quotes = [{"id": i, "date": "2025-01-01", "client_name": name, "requirements": requirements, "breakdown": breakdown}
+                  for i, (requirements, breakdown, name) in enumerate((quotation(*quote) for quote in QUOTES * 50), 1)]
+        database.quotations.insert_many(_with_client_terms(quotes))
+        plan = str(database.quotations.find(_search_filter("acme fo")).explain()["queryPlanner"]["winningPlan"])
+        assert "COLLSCAN" not in plan
+        assert "IXSCAN" in plan and "client_terms_1" in plan
+    finally:
+        client.drop_database(database.name)
+        client.close()
+
+def test_quotations_from_before_client_terms_are_backfilled(backend):
+    backend.save_quotations([quotation(*quote) for quote in QUOTES])
+    if hasattr(backend, "path"):  # SQLite: a file written before the terms table existed
+        backend._write(lambda conn: conn.execute("DELETE FROM quotation_client_terms"))
+        backend.close()
+        backend.connect()
+    elif hasattr(backend, "_backfill_client_terms"):
+        backend.db.quotations.update_many({}, {"$unset": {"client_terms": ""}})
+        backend._backfill_client_terms(backend.db, batch_size=2)
+    assert clients(backend, "acme fo") == ["Acme Foods Pvt Ltd"]
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+from async_database import ThreadedAsyncDatabase
+from sqlite_database import SQLiteDatabase
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """The app on one SQLite-backed instance, and another worker on the same file."""
+    path = str(tmp_path / "etags.db")
+    served, other = SQLiteDatabase(path), SQLiteDatabase(path)
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(served))
+    monkeypatch.setattr(database, "PRICING_REVALIDATE_SECONDS", 0)
+    main.reference_bodies.clear()
+    yield TestClient(main.app), other
+    main.reference_bodies.clear()
+    served.close()
+    other.close()
+
+@pytest.mark.parametrize("path", ["/api/rates", "/api/config", "/api/presets"])
+def test_etag_follows_update_made_elsewhere(workers, path):
+    client, other = workers
+    first = client.get(path)
+    etag = first.headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    other.update_rates({"PET": 220})
+    other.update_config({"wastage_percent": 7.5})
+
+    second = client.get(path, headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    if path == "/api/rates":
+        assert second.json()["PET"] == 220
+    elif path == "/api/config":
+        assert second.json()["wastage_percent"] == 7.5
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from benchmarks.data import requirement_specs
+from calculations import CostCalculator
+from database import _rollup_increments, _rollup_id
+from memory_database import MemoryDatabase
+from models import ProductRequirements
+
+def quotations(count: int):
+    context = MemoryDatabase().get_pricing_context()
+    for i, spec in enumerate(requirement_specs(count, seed=3)):
+        req = ProductRequirements(**spec)
+        breakdown = CostCalculator.calculate_cost(req, margin_percent=req.margin_percent, context=context)
+        yield req.model_dump(mode="json"), breakdown.model_dump(), f"Client {i % 4}"
+
+def today(store, granularity: str) -> dict:
+    return store.get_timeseries(granularity)["points"][-1]
+
+def test_bucket_ids_per_granularity():
+    buckets = _rollup_increments([
+        {"date": "2025-03-05T10:00:00", "breakdown": {"selling_price_per_1000": 100}},
+        {"date": "2025-03-06T09:00:00", "breakdown": {"selling_price_per_1000": 50}},
+        {"date": "2025-04-01T00:00:00", "breakdown": {"selling_price_per_1000": 10}},
+    ])
+    assert buckets[_rollup_id("month", date(2025, 3, 1))]["sum_revenue"] == 150
+    assert buckets[_rollup_id("month", date(2025, 4, 1))]["sum_revenue"] == 10
+    assert buckets[_rollup_id("day", date(2025, 3, 5))]["total_quotations"] == 1
+    # 2025-03-05 and 06 fall in the week starting Monday 2025-03-03
+    assert buckets[_rollup_id("week", date(2025, 3, 3))]["total_quotations"] == 2
+
+def test_saves_and_deletes_update_rollups(backend):
+    saved = backend.save_quotations(list(quotations(12)))
+    saved.append(backend.save_quotation(*next(quotations(1))))
+    revenue = sum(quote["breakdown"]["selling_price_per_1000"] for quote in saved)
+    for granularity in ("day", "week", "month"):
+        point = today(backend, granularity)
+        assert point["quotations"] == 13
+        assert point["revenue"] == pytest.approx(revenue, abs=0.01)
+
+    for quote in saved[:5]:
+        assert backend.delete_quotation(quote["id"])
+    assert not backend.delete_quotation(saved[0]["id"])
+    remaining = revenue - sum(quote["breakdown"]["selling_price_per_1000"] for quote in saved[:5])
+    point = today(backend, "day")
+    assert point["quotations"] == 8
+    assert point["revenue"] == pytest.approx(remaining, abs=0.01)
+
+    # Incremental upkeep agrees with a rebuild from the quotations
+    incremental = backend.get_timeseries("month")
+    backend.rebuild_rollups()
+    rebuilt = backend.get_timeseries("month")
+    assert rebuilt["points"][-1]["quotations"] == incremental["points"][-1]["quotations"]
+    assert rebuilt["totals"]["revenue"] == pytest.approx(incremental["totals"]["revenue"], abs=0.01)
+    assert rebuilt["totals"]["material_mix"] == pytest.approx(incremental["totals"]["material_mix"], abs=0.1)
+
+def test_deleting_everything_empties_the_buckets(backend):
+    saved = backend.save_quotations(list(quotations(3)))
+    for quote in saved:
+        backend.delete_quotation(quote["id"])
+    point = today(backend, "week")
+    assert point["quotations"] == 0
+    assert point["revenue"] == pytest.approx(0, abs=0.01)
+    assert point["material_mix"] == {}
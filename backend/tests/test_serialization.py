@@ -0,0 +1,39 @@
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import main
+from serialization import wants_msgpack
+
+def request_accepting(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json;q=0.9", True),
+    ("application/json;q=0.5, application/vnd.msgpack;q=0.5", True),
+    ("Application/MsgPack;Q=0.8, */*;q=0.1", True),
+    ("", False),
+    ("*/*", False),
+    ("application/json", False),
+    ("application/msgpack;q=0", False),
+    ("application/msgpack;q=0.0, application/json", False),
+    ("application/msgpack;q=0.4, application/json;q=0.8", False),
+    ("application/msgpack;q=0.4, application/*", False),
+    ("application/msgpack;q=oops", False),
+])
+def test_msgpack_negotiation_follows_q_values(accept, expected):
+    assert wants_msgpack(request_accepting(accept)) is expected
+
+def test_stats_come_back_as_msgpack_or_json(store, monkeypatch):
+    from async_database import ThreadedAsyncDatabase
+
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(store))
+    client = TestClient(main.app)
+    packed = client.get("/api/dashboard/stats", headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert "Accept" in packed.headers["vary"]
+    plain = client.get("/api/dashboard/stats", headers={"Accept": "application/msgpack;q=0, application/json"})
+    assert plain.headers["content-type"] == "application/json"
+    assert msgpack.unpackb(packed.content) == plain.json()
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from async_database import AsyncDatabase, ThreadedAsyncDatabase, create_async_database
+from database import MongoDatabase, create_database
+from memory_database import MemoryDatabase
+from sqlite_database import SQLiteDatabase
+
+REQUIREMENTS = {"pouch_type": "THREE_SIDE_SEAL", "film_structure": {"layers": [{"material": "PET"}]}}
+BREAKDOWN = {"selling_price_per_1000": 250.0, "margin_percent": 20}
+
+def test_backend_chosen_by_name_or_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "chosen.db"))
+    monkeypatch.setenv("STORAGE_BACKEND", "SQLite")
+    store = create_database()
+    assert isinstance(store, SQLiteDatabase)
+    store.close()
+    assert isinstance(create_database("memory"), MemoryDatabase)
+
+    mongo = create_database("mongo")
+    # Connections are lazy: no server is needed to build it
+    assert isinstance(mongo, MongoDatabase) and mongo._client is None
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="expected one of"):
+        create_database("cassandra")
+
+def test_async_facade_matches_the_backend():
+    assert isinstance(create_async_database(MemoryDatabase()), ThreadedAsyncDatabase)
+    assert isinstance(create_async_database(MongoDatabase()), AsyncDatabase)
+
+def test_threaded_facade_runs_the_sync_methods():
+    adb = ThreadedAsyncDatabase(MemoryDatabase())
+
+    async def scenario():
+        saved = await adb.save_quotation(REQUIREMENTS, BREAKDOWN, "Acme")
+        listed = [quote async for quote in adb.iter_quotations(fields=["id", "client_name"])]
+        return saved, listed, await adb.get_stats()
+
+    saved, listed, stats = asyncio.run(scenario())
+    assert listed == [{"id": saved["id"], "client_name": "Acme"}]
+    assert stats["total_quotations"] == 1
+
+def test_new_backend_starts_with_default_pricing(backend):
+    context = backend.get_pricing_context()
+    assert context.rates["PET"] > 0 and context.config
+    assert backend.get_rates() == dict(context.rates)
+
+def test_rate_updates_bump_the_version(backend):
+    before = backend.get_pricing_context()
+    backend.update_rates({"PET": before.rates["PET"] + 10})
+    after = backend.refresh_pricing_context()
+    assert after.version > before.version
+    assert after.rates["PET"] == before.rates["PET"] + 10
+    assert after.rates["LDPE"] == before.rates["LDPE"]
+
+def test_ids_keep_increasing_across_deletes(backend):
+    first = backend.save_quotation(REQUIREMENTS, BREAKDOWN, "Acme")
+    assert backend.delete_quotation(first["id"])
+    assert not backend.delete_quotation(first["id"])
+    second, third = backend.save_quotations([(REQUIREMENTS, BREAKDOWN, "Acme"), (REQUIREMENTS, BREAKDOWN, "Beta")])
+    assert first["id"] < second["id"] < third["id"]
+    assert [quote["id"] for quote in backend.get_quotations()] == [second["id"], third["id"]]
+
+def test_saved_documents_are_copies(backend):
+    requirements = {**REQUIREMENTS, "film_structure": {"layers": [{"material": "PET"}]}}
+    saved = backend.save_quotation(requirements, BREAKDOWN, "Acme")
+    requirements["film_structure"]["layers"].append({"material": "LDPE"})
+    saved["client_name"] = "Changed"
+    stored = backend.get_quotations()[0]
+    assert stored["client_name"] == "Acme"
+    assert stored["requirements"]["film_structure"]["layers"] == [{"material": "PET"}]
+
+def test_fingerprint_tracks_saves_and_deletes(backend):
+    empty = backend.quotations_fingerprint()
+    saved = backend.save_quotation(REQUIREMENTS, BREAKDOWN, "Acme")
+    one = backend.quotations_fingerprint()
+    assert one != empty
+    backend.delete_quotation(saved["id"])
+    assert backend.quotations_fingerprint() != one
+
+def test_sqlite_file_persists_across_instances(tmp_path):
+    path = str(tmp_path / "persist.db")
+    first = SQLiteDatabase(path)
+    saved = first.save_quotation(REQUIREMENTS, BREAKDOWN, "Acme")
+    first.update_rates({"PET": 321})
+    first.close()
+
+    second = SQLiteDatabase(path)
+    try:
+        assert second.get_quotations() == [saved]
+        assert second.get_rates()["PET"] == 321
+        assert second.get_stats()["total_quotations"] == 1
+        assert second.save_quotation(REQUIREMENTS, BREAKDOWN, "Beta")["id"] > saved["id"]
+    finally:
+        second.close()
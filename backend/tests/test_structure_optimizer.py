@@ -0,0 +1,107 @@
+from itertools import combinations_with_replacement, product
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import structure_optimizer
+from calculations import CostCalculator
+from models import ProductRequirements
+from structure_optimizer import SEALANT_MATERIALS, find_cheapest_structures
+
+JOB = {
+    "pouch_type": "THREE_SIDE_SEAL",
+    "width_mm": 140,
+    "height_mm": 200,
+    "number_of_colors": 4,
+    "quantity_pieces": 50_000,
+}
+GAUGES = {"PET": [12, 23], "AL_FOIL": [9], "BOPP": [20], "LDPE": [50, 90]}
+
+@pytest.fixture(autouse=True)
+def optimizer_db(store, monkeypatch):
+    monkeypatch.setattr(structure_optimizer, "db", store)
+    return store
+
+def layer_list(result: dict) -> list:
+    return [[(layer["material"], layer["thickness_micron"]) for layer in structure["film_structure"]["layers"]]
+            for structure in result["structures"]]
+
+def brute_force_costs(store, max_layers: int) -> list:
+    # Every sealant-innermost structure, priced one at a time
+    options = [(material, micron) for material, gauges in GAUGES.items() for micron in gauges]
+    sealants = [option for option in options if option[0] in SEALANT_MATERIALS]
+    context = store.get_pricing_context()
+    costs = []
+    for num_layers in range(2, max_layers + 1):
+        for outer, sealant in product(combinations_with_replacement(options, num_layers - 1), sealants):
+            layers = [{"material": m, "thickness_micron": t} for m, t in (*outer, sealant)]
+            req = ProductRequirements(**JOB, film_structure={"layers": layers})
+            costs.append(CostCalculator.calculate_cost(req, context=context).cost_per_1000_pouches)
+    return sorted(costs)
+
+def test_ranked_by_cost_like_exhaustive_pricing(optimizer_db):
+    result = find_cheapest_structures(JOB, allowed_materials=list(GAUGES), thickness_options=GAUGES, top_n=4)
+    costs = [structure["breakdown"]["cost_per_1000_pouches"] for structure in result["structures"]]
+    assert [structure["rank"] for structure in result["structures"]] == [1, 2, 3, 4]
+    assert costs == sorted(costs)
+    every_cost = brute_force_costs(optimizer_db, 3)
+    assert costs == pytest.approx(every_cost[:4])
+    assert result["candidates_evaluated"] == len(every_cost)
+
+def test_constraints_hold_for_every_result():
+    result = find_cheapest_structures(
+        JOB, min_layers=3, max_layers=3, allowed_materials=list(GAUGES), thickness_options=GAUGES,
+        min_total_micron=80, max_total_micron=130, barrier_materials=["AL_FOIL"], top_n=10,
+    )
+    assert result["structures"]
+    for layers in layer_list(result):
+        assert len(layers) == 3
+        assert 80 <= sum(micron for _, micron in layers) <= 130
+        assert any(material == "AL_FOIL" for material, _ in layers)
+        assert layers[-1][0] in SEALANT_MATERIALS
+        assert {material for material, _ in layers} <= set(GAUGES)
+
+def test_barrier_sits_between_print_film_and_sealant():
+    result = find_cheapest_structures(
+        JOB, min_layers=3, max_layers=3, allowed_materials=["PET", "AL_FOIL", "LDPE"],
+        thickness_options=GAUGES, barrier_materials=["AL_FOIL"], top_n=1,
+    )
+    assert [material for material, _ in layer_list(result)[0]] == ["PET", "AL_FOIL", "LDPE"]
+
+def test_pattern_barriers_match_metallised_films():
+    result = find_cheapest_structures(
+        JOB, allowed_materials=["BOPP", "MET_BOPP", "CPP"], barrier_materials=["MET_*"], top_n=5,
+    )
+    for layers in layer_list(result):
+        assert any(material.startswith("MET_") for material, _ in layers)
+
+def test_impossible_constraints_return_no_structures():
+    result = find_cheapest_structures(JOB, allowed_materials=["PET", "LDPE"], thickness_options=GAUGES,
+                                      max_total_micron=20)
+    assert result["structures"] == [] and result["candidates_evaluated"] == 0
+
+@pytest.mark.parametrize("constraints, message", [
+    ({"allowed_materials": ["PET", "AL_FOIL"]}, "sealant"),
+    ({"min_layers": 3, "max_layers": 2}, "min_layers"),
+    ({"min_total_micron": 100, "max_total_micron": 50}, "min_total_micron"),
+    ({"allowed_materials": ["LDPE", "UNOBTAINIUM"]}, "thickness_options"),
+])
+def test_invalid_searches_are_rejected(constraints, message):
+    with pytest.raises(ValueError, match=message):
+        find_cheapest_structures(JOB, **constraints)
+
+def test_candidate_space_is_capped(monkeypatch):
+    monkeypatch.setattr(structure_optimizer, "MAX_CANDIDATES", 10)
+    with pytest.raises(ValueError, match="candidate structures"):
+        find_cheapest_structures(JOB, max_layers=4)
+
+def test_endpoint_reports_bad_constraints_as_400(store, monkeypatch):
+    from async_database import ThreadedAsyncDatabase
+    monkeypatch.setattr(main, "adb", ThreadedAsyncDatabase(store))
+    client = TestClient(main.app)
+
+    response = client.post("/api/structures/optimize", json={**JOB, "allowed_materials": ["PET"]})
+    assert response.status_code == 400
+    response = client.post("/api/structures/optimize", json={**JOB, "top_n": 2})
+    assert response.status_code == 200 and len(response.json()["structures"]) == 2
@@ -0,0 +1,84 @@
+import pytest
+
+from calculations import CostCalculator
+from models import FilmStructure, ProductRequirements, MATERIAL_DENSITIES
+from structure_registry import FilmStructureRegistry, compile_structure
+
+SPEC = {
+    "pouch_type": "STAND_UP_POUCH",
+    "width_mm": 160,
+    "height_mm": 240,
+    "gusset_mm": 40,
+    "quantity_pieces": 30_000,
+    "film_structure": {"layers": [
+        {"material": "PET", "thickness_micron": 12},
+        {"material": "AL_FOIL", "thickness_micron": 9},
+        {"material": "LDPE", "thickness_micron": 80},
+    ]},
+    "number_of_colors": 5,
+}
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = FilmStructureRegistry(maxsize=16)
+    monkeypatch.setattr(CostCalculator, "structure_registry", registry)
+    return registry
+
+def test_compiled_vector_matches_the_layer_arithmetic(store):
+    ctx = store.get_pricing_context()
+    compiled = compile_structure((("PET", 12), ("LDPE", 50)), 0, ctx)
+    pet_gsm, ldpe_gsm = 12 * MATERIAL_DENSITIES["PET"], 50 * MATERIAL_DENSITIES["LDPE"]
+    assert compiled.total_film_gsm == pytest.approx(pet_gsm + ctx.adhesive_gsm + ldpe_gsm)
+    assert compiled.total_material_cost_per_sqm == pytest.approx(
+        pet_gsm / 1000 * ctx.rates["PET"] + ctx.adhesive_gsm / 1000 * ctx.adhesive_rate + ldpe_gsm / 1000 * ctx.rates["LDPE"]
+    )
+    assert compiled.ink_cost_per_sqm == 0
+    assert (compiled.total_thickness, compiled.num_layers) == (62, 2)
+
+def test_sizes_and_quantities_share_one_compiled_structure(store, registry):
+    ctx = store.get_pricing_context()
+    small = CostCalculator.calculate_cost(ProductRequirements(**SPEC), context=ctx)
+    large = CostCalculator.calculate_cost(
+        ProductRequirements(**{**SPEC, "width_mm": 300, "height_mm": 400, "quantity_pieces": 5000}), context=ctx
+    )
+    assert registry.stats()["misses"] == 1 and registry.stats()["hits"] == 1
+    assert small.total_gsm == large.total_gsm
+    assert small.material_cost_per_kg == large.material_cost_per_kg
+    assert large.weight_per_1000_pouches_kg > small.weight_per_1000_pouches_kg
+
+def test_cached_price_is_the_uncached_price(store, registry):
+    ctx = store.get_pricing_context()
+    req = ProductRequirements(**SPEC)
+    first = CostCalculator.calculate_cost(req, context=ctx)
+    registry.clear()
+    assert CostCalculator.calculate_cost(req, context=ctx) == first
+
+def test_colour_count_is_part_of_the_key(store, registry):
+    ctx = store.get_pricing_context()
+    structure = FilmStructure(**SPEC["film_structure"])
+    printed = registry.get(structure, 5, ctx)
+    plain = registry.get(structure, 0, ctx)
+    assert registry.stats()["size"] == 2
+    assert plain.ink_cost_per_sqm == 0 < printed.ink_cost_per_sqm
+
+def test_rate_update_invalidates_compiled_structures(store, registry):
+    structure = FilmStructure(**SPEC["film_structure"])
+    before = registry.get(structure, 5, store.get_pricing_context())
+
+    store.update_rates({"AL_FOIL": store.get_rates()["AL_FOIL"] * 2})
+    after = registry.get(structure, 5, store.get_pricing_context())
+    # The newer version dropped the old entry instead of keeping both
+    assert registry.stats()["size"] == 1
+    assert after.total_material_cost_per_sqm > before.total_material_cost_per_sqm
+    assert after.total_film_gsm == before.total_film_gsm
+
+def test_hypothetical_rates_never_share_entries(store, registry):
+    ctx = store.get_pricing_context()
+    shocked = ctx.model_copy(update={"rates": {**ctx.rates, "PET": ctx.rates["PET"] * 1.5}})
+    assert shocked.version == ctx.version
+    structure = FilmStructure(**SPEC["film_structure"])
+
+    live = registry.get(structure, 5, ctx)
+    what_if = registry.get(structure, 5, shocked)
+    assert what_if.total_material_cost_per_sqm > live.total_material_cost_per_sqm
+    assert registry.get(structure, 5, ctx) == live
@@ -85,4 +85,5 @@ export interface CostBreakdown {
   selling_price_per_pouch: number;
   selling_price_per_kg: number;
   margin_percent: number;
+  pricing_version?: number;
 }